@@ -0,0 +1,241 @@
+import asyncio
+import ipaddress
+import math
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from config import (
+    RENDER_MAX_CONCURRENCY, RENDER_MAX_QUEUE, RENDER_MAX_QUEUE_WAIT, RENDER_RATE_PER_MINUTE,
+    LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_MAX_QUEUE_WAIT, LLM_RATE_PER_MINUTE,
+    LIGHT_MAX_CONCURRENCY, LIGHT_MAX_QUEUE, LIGHT_MAX_QUEUE_WAIT, LIGHT_RATE_PER_MINUTE,
+    TRUSTED_PROXIES,
+)
+from deadlines import remaining
+
+# Which pool each endpoint draws from. Cheap endpoints get their own pool so
+# render pressure can never starve them.
+ENDPOINT_POOLS = {
+    "/render-video": "render",
+    "/render-video-from-image": "render",
+    "/render-lesson": "render",
+    "/render-video-live": "render",
+    "/generate-code": "llm",
+    "/tutor-response": "llm",
+    "/analyze-image": "llm",
+    "/generate-mind-map": "llm",
+    "/text-to-speech": "llm",
+    "/generate-subtopics": "light",
+    "/generate-summary": "light",
+}
+
+# Endpoints with path parameters
+ENDPOINT_POOL_PATTERNS = [
+    (re.compile(r"^/mind-maps/[^/]+/expand$"), "light"),
+]
+
+_TRUSTED_PROXY_NETWORKS = [ipaddress.ip_network(proxy, strict=False) for proxy in TRUSTED_PROXIES]
+
+
+def _is_trusted_proxy(address: str, networks: List) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_id(peer: Optional[str], forwarded_for: Optional[str], networks: List = _TRUSTED_PROXY_NETWORKS) -> str:
+    """
+    Who to rate limit: the connecting address, unless that is a trusted proxy.
+    Then X-Forwarded-For is read from the right, skipping trusted hops, since
+    entries to the left of the last untrusted one are whatever the client sent.
+    """
+    if not peer:
+        return "unknown"
+    if not forwarded_for or not _is_trusted_proxy(peer, networks):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop, networks):
+            return hop
+    # Every hop is one of ours; the first is the closest thing to a client
+    return hops[0] if hops else peer
+
+
+class AdmissionRejected(HTTPException):
+    """HTTP error raised when a request is shed or rate limited"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity` banked"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_take(self, tokens: float = 1.0) -> float:
+        """Take tokens if available. Returns 0 on success, else seconds until enough accrue."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+
+class ConcurrencyPool:
+    """
+    Bounded concurrency with a bounded, queue-time-aware waiting room.
+
+    A request is shed up front when the queue is full or when the expected wait
+    (based on a moving average of service time) already exceeds max_queue_wait,
+    instead of letting it sit in line only to time out later.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, max_queue_wait: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.avg_service_time = 1.0
+        self.shed_count = 0
+
+    def estimated_wait(self) -> float:
+        """Rough seconds a newly queued request would wait for a slot"""
+        if self.active < self.max_concurrency and self.waiting == 0:
+            return 0.0
+        return (self.waiting + 1) / self.max_concurrency * self.avg_service_time
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one concurrency slot for the duration of the block"""
+        if self._semaphore is None:
+            # Created lazily so it binds to the server's running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.shed_count += 1
+                raise AdmissionRejected(503, f"{self.name} queue is full", self.estimated_wait())
+
+            # Never queue past the request's own deadline
+            max_wait = self.max_queue_wait
+            left = remaining()
+            if left is not None:
+                max_wait = max(0.0, min(max_wait, left))
+
+            expected_wait = self.estimated_wait()
+            if expected_wait > max_wait:
+                self.shed_count += 1
+                raise AdmissionRejected(503, f"{self.name} is overloaded", expected_wait)
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=max_wait)
+            except asyncio.TimeoutError:
+                self.shed_count += 1
+                raise AdmissionRejected(503, f"Timed out waiting for a {self.name} slot", self.estimated_wait())
+            finally:
+                self.waiting -= 1
+
+        self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            # Exponential moving average keeps the estimate responsive
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * elapsed
+            self.active -= 1
+            self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "avg_service_time": round(self.avg_service_time, 3),
+            "shed": self.shed_count,
+        }
+
+
+class AdmissionController:
+    """Per-pool concurrency limits plus per-client, per-pool rate limits"""
+
+    def __init__(self):
+        self.pools: Dict[str, ConcurrencyPool] = {
+            "render": ConcurrencyPool("render", RENDER_MAX_CONCURRENCY, RENDER_MAX_QUEUE, RENDER_MAX_QUEUE_WAIT),
+            "llm": ConcurrencyPool("llm", LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_MAX_QUEUE_WAIT),
+            "light": ConcurrencyPool("light", LIGHT_MAX_CONCURRENCY, LIGHT_MAX_QUEUE, LIGHT_MAX_QUEUE_WAIT),
+        }
+        self.rates_per_minute = {
+            "render": RENDER_RATE_PER_MINUTE,
+            "llm": LLM_RATE_PER_MINUTE,
+            "light": LIGHT_RATE_PER_MINUTE,
+        }
+        self._buckets: Dict[tuple, TokenBucket] = {}
+
+    def pool_for_path(self, path: str) -> Optional[str]:
+        pool = ENDPOINT_POOLS.get(path)
+        if pool is None:
+            for pattern, pattern_pool in ENDPOINT_POOL_PATTERNS:
+                if pattern.match(path):
+                    return pattern_pool
+        return pool
+
+    def check_rate(self, client_id: str, pool: str):
+        """Raise a 429 if this client has exhausted its budget for the pool"""
+        per_minute = self.rates_per_minute.get(pool, 0)
+        if per_minute <= 0:
+            return
+
+        bucket = self._buckets.get((client_id, pool))
+        if bucket is None:
+            if len(self._buckets) >= 10000:
+                self._prune_buckets()
+            # Allow a burst of up to half the per-minute budget
+            bucket = TokenBucket(rate=per_minute / 60.0, capacity=max(1.0, per_minute / 2.0))
+            self._buckets[(client_id, pool)] = bucket
+
+        retry_after = bucket.try_take()
+        if retry_after > 0:
+            raise AdmissionRejected(429, f"Rate limit exceeded for {pool} endpoints", retry_after)
+
+    def _prune_buckets(self):
+        """Forget clients whose buckets have had time to refill completely"""
+        now = time.monotonic()
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.updated) * bucket.rate < bucket.capacity
+        }
+
+    def slot(self, pool: str):
+        return self.pools[pool].slot()
+
+    def snapshot(self) -> dict:
+        return {name: pool.snapshot() for name, pool in self.pools.items()}
+
+
+# Global instance
+admission_controller = AdmissionController()
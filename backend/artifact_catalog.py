@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from config import ARTIFACT_DB_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source_hash TEXT,
+    scene_name TEXT,
+    narration TEXT,
+    audio_path TEXT,
+    duration REAL,
+    file_size INTEGER,
+    created_at REAL NOT NULL,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS artifacts_kind_source ON artifacts (kind, source_hash);
+CREATE INDEX IF NOT EXISTS artifacts_kind_created ON artifacts (kind, created_at);
+"""
+
+_COLUMNS = ("kind", "source_hash", "scene_name", "narration", "audio_path", "duration", "file_size", "metadata")
+
+
+def content_hash(*parts: Optional[str]) -> str:
+    """Stable key for the inputs an artifact was produced from"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def _key(path) -> str:
+    # abspath is pure string work; resolve() would stat every path component
+    return os.path.abspath(str(path))
+
+
+class ArtifactCatalog:
+    """
+    Index of generated videos and audio with their provenance and metadata.
+
+    Backed by SQLite in WAL mode, so readers never block the writer and
+    several worker processes can share one catalog. Connections are opened
+    lazily, one per thread.
+    """
+
+    def __init__(self, db_path: str = ARTIFACT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def record(self, kind: str, path, **fields) -> dict:
+        """Insert or update the artifact at `path`; unspecified fields keep their values"""
+        if "metadata" in fields and fields["metadata"] is not None:
+            fields["metadata"] = json.dumps(fields["metadata"])
+        unknown = set(fields) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown artifact fields: {sorted(unknown)}")
+
+        values = {"kind": kind, **fields}
+        columns = list(values)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns)
+        self._connection().execute(
+            f"INSERT INTO artifacts (path, created_at, {', '.join(columns)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(path) DO UPDATE SET {updates}",
+            [_key(path), time.time(), *values.values()]
+        )
+        return self.get(path)
+
+    def get(self, path) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT * FROM artifacts WHERE path = ?", (_key(path),)
+        ).fetchone()
+        return _to_dict(row)
+
+    def find(self, kind: str, source_hash: str) -> Optional[dict]:
+        """Newest artifact of `kind` produced from the given inputs"""
+        row = self._connection().execute(
+            "SELECT * FROM artifacts WHERE kind = ? AND source_hash = ? ORDER BY created_at DESC LIMIT 1",
+            (kind, source_hash)
+        ).fetchone()
+        return _to_dict(row)
+
+    def older_than(self, cutoff: float, kinds: Optional[List[str]] = None) -> List[dict]:
+        query = "SELECT * FROM artifacts WHERE created_at < ?"
+        params: list = [cutoff]
+        if kinds:
+            query += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        return [_to_dict(row) for row in self._connection().execute(query, params)]
+
+    def remove(self, path):
+        self._connection().execute("DELETE FROM artifacts WHERE path = ?", (_key(path),))
+
+    def stats(self) -> dict:
+        rows = self._connection().execute(
+            "SELECT kind, COUNT(*) AS count, COALESCE(SUM(file_size), 0) AS bytes FROM artifacts GROUP BY kind"
+        ).fetchall()
+        return {row["kind"]: {"count": row["count"], "bytes": row["bytes"]} for row in rows}
+
+
+def _to_dict(row: Optional[sqlite3.Row]) -> Optional[dict]:
+    if row is None:
+        return None
+    data = dict(row)
+    if data.get("metadata"):
+        data["metadata"] = json.loads(data["metadata"])
+    return data
+
+
+# Global instance
+artifact_catalog = ArtifactCatalog()
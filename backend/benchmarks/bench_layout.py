@@ -0,0 +1,66 @@
+"""
+Benchmark the mind map layout engine on random trees.
+
+Usage (from the backend directory):
+    python benchmarks/bench_layout.py --sizes 10 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mind_map_layout import layout_mind_map
+
+
+def random_tree(size: int, max_children: int, seed: int) -> list:
+    """Random tree with a main topic root and bounded fan-out"""
+    rng = random.Random(seed)
+    nodes = [{"id": "main_topic", "title": "Topic", "content": "", "parent_id": None, "is_main_topic": True}]
+    open_parents = ["main_topic"]
+    child_counts = {"main_topic": 0}
+    for i in range(1, size):
+        parent_id = rng.choice(open_parents)
+        node_id = f"node_{i}"
+        nodes.append({"id": node_id, "title": f"Node {i}", "content": "", "parent_id": parent_id,
+                      "is_suggestion": True})
+        child_counts[parent_id] += 1
+        if child_counts[parent_id] >= max_children:
+            open_parents.remove(parent_id)
+        child_counts[node_id] = 0
+        open_parents.append(node_id)
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mind map layout benchmark")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 1000, 10000])
+    parser.add_argument("--max-children", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        nodes = random_tree(size, args.max_children, seed=size)
+        for mode in ("tidy", "radial"):
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                layout_mind_map(nodes, mode=mode)
+                timings.append(time.perf_counter() - started)
+            best = min(timings) * 1000
+            results.append({"nodes": size, "mode": mode, "best_ms": round(best, 3),
+                            "us_per_node": round(best * 1000 / size, 3)})
+            print(f"{size:>7} nodes  {mode:<7} {best:>9.2f} ms  ({best * 1000 / size:.2f} us/node)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
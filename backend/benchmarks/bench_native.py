@@ -0,0 +1,98 @@
+"""
+Compare the native renderer against the Manim CLI on the recorded corpus.
+Each entry is rendered with its narration both ways: native (frames drawn
+in-process, one ffmpeg encode that also muxes the audio) and Manim (CLI
+render, then the separate mux step). Scenes the native renderer doesn't
+support are reported and only timed through Manim.
+
+Needs Manim, FFmpeg and pycairo. Usage (from the backend directory):
+    python benchmarks/bench_native.py --format spec --output native.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def scene_code(entry: dict, scene_format: str) -> str:
+    if scene_format == "code":
+        return entry["code"]
+    from models import SceneSpec
+    from scene_spec import compile_scene
+    return compile_scene(SceneSpec.model_validate(entry["scene"]), fallback_text=entry["question"])
+
+
+def timed_render(renderer, code: str, scene_name: str, audio_path: str) -> dict:
+    started = time.perf_counter()
+    video_path = renderer.render_with_narration(code, scene_name, audio_path)
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "video_duration": renderer._get_video_duration(Path(video_path)),
+        "output_bytes": Path(video_path).stat().st_size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Native renderer vs Manim CLI render times")
+    parser.add_argument("--format", choices=("spec", "code"), default="spec",
+                        help="Render the compiled scene specs or the recorded Manim code")
+    parser.add_argument("--iterations", type=int, default=1, help="Renders per entry and path")
+    parser.add_argument("--output", help="Optional JSON results file")
+    parser.add_argument("--keep-media", action="store_true", help="Keep rendered videos for inspection")
+    args = parser.parse_args()
+
+    # Render into a scratch media dir so runs never touch real output
+    work_dir = tempfile.mkdtemp(prefix="native_bench_")
+    os.environ["MANIM_OUTPUT_DIR"] = work_dir
+
+    from benchmarks.fakes import load_corpus
+    from manim_renderer import ManimRenderer
+
+    native = ManimRenderer()
+    manim = ManimRenderer()
+    # Without a native renderer everything goes through the Manim CLI
+    manim.native = None
+
+    results = []
+    for entry in load_corpus():
+        code = scene_code(entry, args.format)
+        row = {"id": entry["id"], "native_supported": native.native_supported(code), "native": [], "manim": []}
+        for iteration in range(args.iterations):
+            if row["native_supported"]:
+                row["native"].append(timed_render(native, code, f"native_{entry['id']}_{iteration}", entry["audio"]))
+            row["manim"].append(timed_render(manim, code, f"manim_{entry['id']}_{iteration}", entry["audio"]))
+        results.append(row)
+
+        manim_seconds = min(run["seconds"] for run in row["manim"])
+        if row["native"]:
+            native_seconds = min(run["seconds"] for run in row["native"])
+            print(f"{row['id']:<18} native {native_seconds:>6.2f}s  manim {manim_seconds:>6.2f}s  "
+                  f"({manim_seconds / native_seconds:.1f}x)")
+        else:
+            print(f"{row['id']:<18} native    n/a   manim {manim_seconds:>6.2f}s  (unsupported scene)")
+
+    timed = [row for row in results if row["native"]]
+    if timed:
+        native_total = sum(min(run["seconds"] for run in row["native"]) for row in timed)
+        manim_total = sum(min(run["seconds"] for run in row["manim"]) for row in timed)
+        print(f"{'total':<18} native {native_total:>6.2f}s  manim {manim_total:>6.2f}s  "
+              f"({manim_total / native_total:.1f}x) over {len(timed)}/{len(results)} supported scenes")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"format": args.format, "items": results}, f, indent=2)
+
+    if args.keep_media:
+        print(f"Rendered media kept in {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Offline benchmark for the render pipeline.
+
+Replays the recorded corpus through parsing, validation, Manim render,
+duration probing and muxing with Gemini and ElevenLabs replaced by local
+fakes, then writes per-stage p50/p95 timings, throughput at 1..N parallel
+renders, peak RSS and output sizes as JSON.
+
+Usage (from the backend directory):
+    python benchmarks/bench_pipeline.py --parallel 4 --output bench.json
+    python benchmarks/bench_pipeline.py --compare bench.json --output new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile, pct in [0, 100]"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "mean": round(sum(values) / len(values), 4) if values else 0.0,
+    }
+
+
+def run_item(entry: dict, index: int, gemini, tts, renderer, speculate: bool = False) -> dict:
+    """Run one corpus entry through the same steps as /render-video"""
+    from artifact_catalog import artifact_catalog
+    from metrics import start_request_timings
+    from pipeline_speculation import SpeculativeStart
+
+    timings = start_request_timings()
+    started = time.perf_counter()
+
+    # As in /render-video, TTS and render can start from the streamed reply
+    speculation = SpeculativeStart(tts, renderer)
+    manim_code, narration = gemini.generate_manim_code_with_narration(
+        entry["question"], on_field=speculation.on_field if speculate else None
+    )
+    is_valid, error_msg = renderer.validate_manim_code(manim_code)
+    if not is_valid:
+        raise Exception(f"Invalid Manim code in corpus entry {entry['id']}: {error_msg}")
+
+    audio_path = speculation.narration_audio(narration)
+    video_path = speculation.render(manim_code, audio_path)
+    duration = artifact_catalog.get(video_path)["duration"]
+
+    stages: Dict[str, float] = {}
+    for name, elapsed in timings:
+        stages[name] = stages.get(name, 0.0) + elapsed
+
+    return {
+        "id": entry["id"],
+        "total": time.perf_counter() - started,
+        "stages": stages,
+        "video_duration": duration,
+        "output_bytes": Path(video_path).stat().st_size,
+    }
+
+
+def run_batch(entries: List[dict], parallel: int, gemini, tts, renderer, offset: int,
+              speculate: bool = False) -> tuple:
+    started = time.perf_counter()
+    results, failures = [], []
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        futures = [
+            (entry["id"], pool.submit(run_item, entry, offset + i, gemini, tts, renderer, speculate))
+            for i, entry in enumerate(entries)
+        ]
+        for entry_id, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append({"id": entry_id, "error": str(e)[:500]})
+    return results, failures, time.perf_counter() - started
+
+
+def peak_rss_kb() -> dict:
+    """Peak resident set size of this process and of the largest child (manim/ffmpeg)"""
+    # ru_maxrss is KiB on Linux but bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def compare(baseline: dict, current: dict):
+    """Print per-stage p50/p95 changes against a previous results file"""
+    print(f"\n{'stage':<16}{'p50 base':>10}{'p50 new':>10}{'Δ%':>8}{'p95 base':>10}{'p95 new':>10}{'Δ%':>8}")
+    for stage, new in sorted(current["stages"].items()):
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        row = f"{stage:<16}"
+        for key in ("p50", "p95"):
+            delta = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            row += f"{old[key]:>10.3f}{new[key]:>10.3f}{delta:>+8.1f}"
+        print(row)
+
+    old_tp = {t["parallel"]: t for t in baseline.get("throughput", [])}
+    for tp in current["throughput"]:
+        old = old_tp.get(tp["parallel"])
+        if old and old["videos_per_minute"]:
+            delta = (tp["videos_per_minute"] - old["videos_per_minute"]) / old["videos_per_minute"] * 100
+            print(f"throughput x{tp['parallel']}: {old['videos_per_minute']:.2f} -> "
+                  f"{tp['videos_per_minute']:.2f} videos/min ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline render pipeline benchmark")
+    parser.add_argument("--iterations", type=int, default=1, help="Passes over the corpus at parallelism 1")
+    parser.add_argument("--parallel", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Measure throughput at 1..N parallel renders")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated Gemini latency (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.0, help="Simulated TTS latency (s)")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write JSON results")
+    parser.add_argument("--compare", help="Previous results file to diff against")
+    parser.add_argument("--keep-media", action="store_true", help="Keep rendered videos for inspection")
+    parser.add_argument("--speculate", action="store_true",
+                        help="Stream the Gemini reply and start TTS/render per field, as the API does")
+    args = parser.parse_args()
+
+    # Render into a scratch media dir so runs never touch real output
+    work_dir = tempfile.mkdtemp(prefix="manim_bench_")
+    os.environ["MANIM_OUTPUT_DIR"] = work_dir
+
+    from manim_renderer import ManimRenderer
+    from benchmarks.fakes import load_corpus, FakeGeminiModel, FakeTTSClient, make_gemini_client
+
+    corpus = load_corpus()
+    gemini = make_gemini_client(FakeGeminiModel(corpus, latency=args.llm_latency))
+    tts = FakeTTSClient(corpus, latency=args.tts_latency)
+    renderer = ManimRenderer()
+
+    all_results, all_failures, throughput = [], [], []
+    offset = 0
+
+    # Latency pass: serial, so stage timings aren't skewed by contention
+    for _ in range(args.iterations):
+        results, failures, _ = run_batch(corpus, 1, gemini, tts, renderer, offset, args.speculate)
+        offset += len(corpus)
+        all_results.extend(results)
+        all_failures.extend(failures)
+
+    # Throughput pass: enough work at each level to keep every worker busy
+    for parallel in range(1, args.parallel + 1):
+        batch = [corpus[i % len(corpus)] for i in range(max(len(corpus), parallel * 2))]
+        results, failures, wall = run_batch(batch, parallel, gemini, tts, renderer, offset, args.speculate)
+        offset += len(batch)
+        all_failures.extend(failures)
+        throughput.append({
+            "parallel": parallel,
+            "items": len(results),
+            "failures": len(failures),
+            "wall_seconds": round(wall, 3),
+            "videos_per_minute": round(len(results) / wall * 60, 3) if wall else 0.0,
+        })
+        print(f"parallel={parallel}: {len(results)} videos in {wall:.1f}s")
+
+    stage_samples: Dict[str, List[float]] = {}
+    for result in all_results:
+        for stage, elapsed in result["stages"].items():
+            stage_samples.setdefault(stage, []).append(elapsed)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus_size": len(corpus),
+            "iterations": args.iterations,
+            "llm_latency": args.llm_latency,
+            "tts_latency": args.tts_latency,
+            "speculate": args.speculate,
+        },
+        "stages": {stage: summarize(samples) for stage, samples in sorted(stage_samples.items())},
+        "end_to_end": summarize([r["total"] for r in all_results]),
+        "throughput": throughput,
+        "peak_rss_kb": peak_rss_kb(),
+        "output_bytes": {r["id"]: r["output_bytes"] for r in all_results},
+        "failures": all_failures,
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.keep_media:
+        print(f"Rendered media kept in {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<16} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s (n={stats['count']})")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
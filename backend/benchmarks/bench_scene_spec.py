@@ -0,0 +1,66 @@
+"""
+Compare reply sizes of the two scene formats on the recorded corpus: Manim
+code written by the model ("code") vs the compact scene spec compiled
+locally ("spec"). Also checks every spec compiles to valid, splittable code.
+
+Usage (from the backend directory):
+    python benchmarks/bench_scene_spec.py --output spec.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fakes import load_corpus
+from models import SceneSpec
+from prompts import estimate_tokens, prompts
+from scene_segments import animation_timeline
+from scene_spec import compile_scene
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scene spec vs Manim code reply sizes")
+    parser.add_argument("--output", help="Optional JSON results file")
+    args = parser.parse_args()
+
+    results = []
+    for entry in load_corpus():
+        # JSON mode replies carry no insignificant whitespace
+        code_reply = json.dumps({"code": entry["code"], "narration": entry["narration"]}, separators=(",", ":"))
+        spec_reply = json.dumps({"scene": entry["scene"], "narration": entry["narration"]}, separators=(",", ":"))
+        started = time.perf_counter()
+        compiled = compile_scene(SceneSpec.model_validate(entry["scene"]), fallback_text=entry["question"])
+        compile_ms = (time.perf_counter() - started) * 1000
+        compile(compiled, "<spec>", "exec")
+        results.append({
+            "id": entry["id"],
+            "code_tokens": estimate_tokens(code_reply),
+            "spec_tokens": estimate_tokens(spec_reply),
+            "compile_ms": round(compile_ms, 3),
+            "animations": len(animation_timeline(compiled, "Explanation") or []),
+        })
+        row = results[-1]
+        print(f"{row['id']:<18} code {row['code_tokens']:>5} tok  spec {row['spec_tokens']:>5} tok  "
+              f"({row['spec_tokens'] / row['code_tokens']:.0%})  compile {row['compile_ms']:.2f} ms  "
+              f"{row['animations']} animations")
+
+    code_total = sum(row["code_tokens"] for row in results)
+    spec_total = sum(row["spec_tokens"] for row in results)
+    prompt_tokens = {
+        name: estimate_tokens(prompts.get(name).render(topic="Solve 5x = 25"))
+        for name in ("manim_code_with_narration", "scene_spec_with_narration")
+    }
+    print(f"{'total':<18} code {code_total:>5} tok  spec {spec_total:>5} tok  ({spec_total / code_total:.0%})")
+    print("prompt tokens (full): " + ", ".join(f"{name} {tokens}" for name, tokens in prompt_tokens.items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"items": results, "code_tokens": code_total, "spec_tokens": spec_total,
+                       "prompt_tokens": prompt_tokens}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Local stand-in servers for the Gemini and ElevenLabs HTTP APIs.
+
+They speak just enough of each interface for GeminiClient (REST transport)
+and ElevenLabsClient to work unchanged, with configurable latency, streaming
+and error injection, so the FastAPI app can be load tested without spending
+API quota.
+
+Usage (from the backend directory):
+    python benchmarks/fake_servers.py --latency-median 1.5 --latency-sigma 0.6 --error-rate 0.02
+
+Then start the app pointed at them:
+    GEMINI_API_ENDPOINT=http://127.0.0.1:9101 \\
+    ELEVENLABS_BASE_URL=http://127.0.0.1:9102/v1 python main.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import sys
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fakes import load_corpus, recorded_reply
+
+
+class LatencyModel:
+    """Log-normal latency around a median, the usual shape of LLM/TTS response times"""
+
+    def __init__(self, median: float, sigma: float, error_rate: float, seed: int = None):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.median
+        return self.random.lognormvariate(math.log(self.median), self.sigma)
+
+    def should_fail(self) -> bool:
+        return self.random.random() < self.error_rate
+
+
+def _canned_gemini_text(prompt: str, schema: dict, corpus: list) -> str:
+    """Pick a plausible response for whichever GeminiClient method sent the prompt"""
+    if schema:
+        # JSON mode: answer in the shape the response schema asks for
+        if {"code", "scene"} & set(schema.get("properties", {})):
+            entry = next((e for e in corpus if e["question"] in prompt), None) \
+                or corpus[hash(prompt) % len(corpus)]
+            return recorded_reply(entry, schema)
+
+        if schema.get("items", {}).get("type", "").upper() == "OBJECT":
+            nodes = [{
+                "id": "main_topic", "title": "Topic", "content": "A concise introduction to the topic.",
+                "parent_id": None, "is_main_topic": True, "is_suggestion": False
+            }]
+            for i in range(1, 4):
+                nodes.append({
+                    "id": f"suggestion_{i}", "title": f"Related Topic {i}", "content": "",
+                    "parent_id": "main_topic", "is_main_topic": False, "is_suggestion": True
+                })
+            return json.dumps(nodes)
+
+        return json.dumps(["First Example", "Second Example", "Third Example"])
+
+    if "summar" in prompt.lower():
+        return "This topic is a core idea in its field. It explains how key parts interact. Understanding it builds a foundation for later concepts."
+
+    return "## Overview\n\n- **Key idea**: a short, clear explanation\n- *Example*: a simple analogy\n  - A supporting detail\n"
+
+
+def _gemini_payload(text: str) -> dict:
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }]
+    }
+
+
+def create_gemini_app(latency: LatencyModel, corpus: list, stream_chunks: int) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+
+    def _prompt_text(body: dict) -> str:
+        parts = []
+        for content in body.get("contents", []):
+            for part in content.get("parts", []):
+                if "text" in part:
+                    parts.append(part["text"])
+        return "\n".join(parts)
+
+    def _response_schema(body: dict) -> dict:
+        config = body.get("generationConfig") or body.get("generation_config") or {}
+        return config.get("responseSchema") or config.get("response_schema") or {}
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency.sample())
+        if latency.should_fail():
+            return JSONResponse(status_code=503, content={"error": {"code": 503, "message": "Injected failure", "status": "UNAVAILABLE"}})
+        return _gemini_payload(_canned_gemini_text(_prompt_text(body), _response_schema(body), corpus))
+
+    @app.post("/v1beta/models/{model}:streamGenerateContent")
+    async def stream_generate_content(model: str, request: Request):
+        body = await request.json()
+        text = _canned_gemini_text(_prompt_text(body), _response_schema(body), corpus)
+        total_delay = latency.sample()
+        if latency.should_fail():
+            return JSONResponse(status_code=503, content={"error": {"code": 503, "message": "Injected failure", "status": "UNAVAILABLE"}})
+
+        async def chunks():
+            # REST streaming is a JSON array whose elements arrive over time
+            size = max(1, math.ceil(len(text) / stream_chunks))
+            pieces = [text[i:i + size] for i in range(0, len(text), size)]
+            yield "["
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(total_delay / len(pieces))
+                yield ("," if i else "") + json.dumps(_gemini_payload(piece))
+            yield "]"
+
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    return app
+
+
+def create_elevenlabs_app(latency: LatencyModel, corpus: list) -> FastAPI:
+    app = FastAPI(title="Fake ElevenLabs")
+    audio_files = [Path(entry["audio"]).read_bytes() for entry in corpus]
+
+    def _audio_for(text: str) -> bytes:
+        index = int(hashlib.md5(text.encode()).hexdigest(), 16) % len(audio_files)
+        return audio_files[index]
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency.sample())
+        if latency.should_fail():
+            return JSONResponse(status_code=429, content={"detail": {"status": "too_many_concurrent_requests"}})
+        return Response(content=_audio_for(body.get("text", "")), media_type="audio/mpeg")
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech_stream(voice_id: str, request: Request):
+        body = await request.json()
+        audio = _audio_for(body.get("text", ""))
+        total_delay = latency.sample()
+        if latency.should_fail():
+            return JSONResponse(status_code=429, content={"detail": {"status": "too_many_concurrent_requests"}})
+
+        async def chunks():
+            chunk_size = 4096
+            count = max(1, math.ceil(len(audio) / chunk_size))
+            for i in range(0, len(audio), chunk_size):
+                await asyncio.sleep(total_delay / count)
+                yield audio[i:i + chunk_size]
+
+        return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+    @app.get("/v1/voices/{voice_id}")
+    async def get_voice(voice_id: str):
+        return {"voice_id": voice_id, "name": "Fake", "settings": {"stability": 0.5, "similarity_boost": 0.75}}
+
+    @app.get("/v1/voices/{voice_id}/settings")
+    async def get_voice_settings(voice_id: str):
+        return {"stability": 0.5, "similarity_boost": 0.75}
+
+    return app
+
+
+async def serve(args):
+    corpus = load_corpus()
+    gemini_latency = LatencyModel(args.latency_median, args.latency_sigma, args.error_rate, args.seed)
+    tts_latency = LatencyModel(args.tts_latency_median, args.latency_sigma, args.error_rate, args.seed)
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            create_gemini_app(gemini_latency, corpus, args.stream_chunks),
+            host=args.host, port=args.gemini_port, log_level="warning"
+        )),
+        uvicorn.Server(uvicorn.Config(
+            create_elevenlabs_app(tts_latency, corpus),
+            host=args.host, port=args.elevenlabs_port, log_level="warning"
+        )),
+    ]
+    print(f"Fake Gemini on http://{args.host}:{args.gemini_port}")
+    print(f"Fake ElevenLabs on http://{args.host}:{args.elevenlabs_port}/v1")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini and ElevenLabs servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--gemini-port", type=int, default=9101)
+    parser.add_argument("--elevenlabs-port", type=int, default=9102)
+    parser.add_argument("--latency-median", type=float, default=1.0, help="Median Gemini latency (s)")
+    parser.add_argument("--tts-latency-median", type=float, default=0.5, help="Median TTS latency (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread, 0 for fixed latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="Chunks per streamed Gemini response")
+    parser.add_argument("--seed", type=int, default=None)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
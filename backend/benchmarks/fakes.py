@@ -0,0 +1,98 @@
+"""
+Local stand-ins for the Gemini and ElevenLabs clients.
+
+They replay the recorded corpus so the render pipeline can be measured
+without network access or API quota.
+"""
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> List[dict]:
+    """Load every recorded response in the corpus directory"""
+    entries = []
+    for path in sorted(corpus_dir.glob("*.json")):
+        with open(path, 'r') as f:
+            entry = json.load(f)
+        entry["audio"] = str(corpus_dir / entry["audio"])
+        entries.append(entry)
+    return entries
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def recorded_reply(entry: dict, schema: dict) -> str:
+    """The corpus reply for `entry` in whichever shape the response schema asks for"""
+    if "scene" in schema.get("properties", {}):
+        return json.dumps({"scene": entry["scene"], "narration": entry["narration"]})
+    return json.dumps({"code": entry["code"], "narration": entry["narration"]})
+
+
+class FakeGeminiModel:
+    """Mimics GenerativeModel.generate_content by matching the question in the prompt"""
+
+    def __init__(self, corpus: List[dict], latency: float = 0.0):
+        self.entries: Dict[str, dict] = {entry["question"]: entry for entry in corpus}
+        self.latency = latency
+
+    def generate_content(self, contents, stream: bool = False, generation_config: dict = None, **kwargs):
+        prompt = contents if isinstance(contents, str) else str(contents[0])
+        schema = (generation_config or {}).get("response_schema") or {}
+        for question, entry in self.entries.items():
+            if question in prompt:
+                text = recorded_reply(entry, schema)
+                return self._stream(text) if stream else self._respond(text)
+        raise Exception("No recorded response for prompt")
+
+    def _respond(self, text: str) -> FakeResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(text)
+
+    def _stream(self, text: str, chunks: int = 8):
+        # Spread the latency over the chunks, as a streamed reply would arrive
+        size = max(1, -(-len(text) // chunks))
+        for start in range(0, len(text), size):
+            if self.latency:
+                time.sleep(self.latency / chunks)
+            yield FakeResponse(text[start:start + size])
+
+
+class FakeTTSClient:
+    """Mimics ElevenLabsClient by returning the corpus' pre-generated audio"""
+
+    def __init__(self, corpus: List[dict], latency: float = 0.0):
+        self.audio_by_text: Dict[str, str] = {entry["narration"]: entry["audio"] for entry in corpus}
+        self.latency = latency
+
+    def should_generate_audio(self, text: str) -> bool:
+        return len(text.strip()) >= 3
+
+    def generate_speech(self, text: str, voice_id: str = "21m00Tcm4TlvDq8ikWAM") -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        audio_path = self.audio_by_text.get(text.strip())
+        if not audio_path:
+            raise Exception("No recorded audio for narration")
+        return audio_path
+
+
+def make_gemini_client(model: FakeGeminiModel):
+    """Build a GeminiClient wired to a fake model, skipping API configuration"""
+    from config import SCENE_FORMAT
+    from gemini_client import GeminiClient
+    from model_router import model_router
+
+    client = GeminiClient.__new__(GeminiClient)
+    client.router = model_router
+    client._model_factory = lambda name: model
+    client._models = {}
+    client.scene_format = SCENE_FORMAT
+    return client
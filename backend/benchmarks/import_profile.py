@@ -0,0 +1,93 @@
+"""
+Profile how long `import main` takes in a fresh interpreter.
+
+Runs the import in subprocesses with `-X importtime`, reporting the best wall
+time over several runs and the modules with the largest cumulative import cost.
+
+Usage (from the backend directory):
+    python benchmarks/import_profile.py --output before.json
+    # ...make changes...
+    python benchmarks/import_profile.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def profile_once(module: str) -> tuple:
+    """Wall seconds for one cold import, plus `-X importtime` rows (module, self_us, cumulative_us, depth)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return wall, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time profile")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Heaviest modules to list")
+    parser.add_argument("--output", help="Optional JSON results file")
+    parser.add_argument("--compare", help="Previous results file to diff against")
+    args = parser.parse_args()
+
+    runs = [profile_once(args.module) for _ in range(args.repeat)]
+    wall, rows = min(runs, key=lambda run: run[0])
+
+    # Top-level packages (depth 1 under the profiled module) are what main actually pulls in
+    packages = {}
+    for name, _, cumulative_us, depth in rows:
+        if depth == 1:
+            root = name.split(".")[0]
+            packages[root] = max(packages.get(root, 0), cumulative_us)
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    report = {
+        "module": args.module,
+        "wall_ms": round(wall * 1000, 1),
+        "import_ms": round(sum(self_us for _, self_us, _, _ in rows) / 1000, 1),
+        "modules_loaded": len(rows),
+        "heaviest_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+    }
+
+    print(f"import {args.module}: {report['wall_ms']:.0f} ms wall, "
+          f"{report['import_ms']:.0f} ms importing {report['modules_loaded']} modules")
+    for name, ms in report["heaviest_ms"].items():
+        print(f"  {name:<32} {ms:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            before = json.load(f)
+        print(f"\nwall: {before['wall_ms']:.0f} -> {report['wall_ms']:.0f} ms, "
+              f"modules: {before['modules_loaded']} -> {report['modules_loaded']}")
+        for name in sorted(set(before["heaviest_ms"]) | set(report["heaviest_ms"]),
+                           key=lambda n: before["heaviest_ms"].get(n, 0), reverse=True):
+            old, new = before["heaviest_ms"].get(name), report["heaviest_ms"].get(name)
+            if old != new:
+                print(f"  {name:<32} {old if old is not None else '-':>8} -> {new if new is not None else '-'}")
+
+
+if __name__ == "__main__":
+    main()
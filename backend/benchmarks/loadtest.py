@@ -0,0 +1,161 @@
+"""
+HTTP load generator for the FastAPI app.
+
+Steps each endpoint through increasing concurrency levels and reports latency
+percentiles, error/shed rates, throughput and the saturation point (the first
+level where adding concurrency stops adding throughput or errors climb).
+
+Run the app against benchmarks/fake_servers.py so no API quota is spent, and
+disable per-client rate limits since every request comes from one address:
+
+    RENDER_RATE_PER_MINUTE=0 LLM_RATE_PER_MINUTE=0 LIGHT_RATE_PER_MINUTE=0 \\
+    GEMINI_API_ENDPOINT=http://127.0.0.1:9101 \\
+    ELEVENLABS_BASE_URL=http://127.0.0.1:9102/v1 python main.py
+
+    python benchmarks/loadtest.py --endpoints tutor-response generate-mind-map \\
+        --levels 1 2 4 8 16 --requests-per-level 40 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_pipeline import percentile
+from benchmarks.fakes import load_corpus
+
+TOPICS = ["Photosynthesis", "Newton's Laws", "Cell Division", "Supply and Demand", "The Water Cycle"]
+
+
+def build_payload(endpoint: str, corpus: List[dict], unique: bool) -> dict:
+    """A realistic request body; unique=True defeats caching and request coalescing"""
+    suffix = f" ({uuid.uuid4().hex[:6]})" if unique else ""
+    if endpoint == "render-video":
+        return {"question": random.choice(corpus)["question"] + suffix}
+    if endpoint == "tutor-response":
+        return {"question": f"Explain {random.choice(TOPICS)}{suffix}"}
+    if endpoint == "generate-mind-map":
+        return {"topic": random.choice(TOPICS) + suffix}
+    if endpoint == "generate-summary":
+        return {"title": random.choice(TOPICS) + suffix}
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int,
+                    total_requests: int, corpus: List[dict], unique: bool) -> dict:
+    """Issue total_requests with at most `concurrency` in flight"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = total_requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            payload = build_payload(endpoint, corpus, unique)
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"/{endpoint}", json=payload)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    ok = statuses.get("200", 0)
+    shed = statuses.get("429", 0) + statuses.get("503", 0)
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(ok / wall, 3) if wall else 0.0,
+        "p50": round(percentile(latencies, 50), 3),
+        "p90": round(percentile(latencies, 90), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "error_rate": round((total_requests - ok - shed) / total_requests, 4),
+        "shed_rate": round(shed / total_requests, 4),
+        "statuses": statuses,
+    }
+
+
+def find_saturation(levels: List[dict], min_gain: float, max_error_rate: float):
+    """First concurrency level where throughput stops scaling or failures climb"""
+    for previous, current in zip(levels, levels[1:]):
+        failing = current["error_rate"] + current["shed_rate"] > max_error_rate
+        gain = (current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"] \
+            if previous["throughput_rps"] else 0.0
+        if failing or gain < min_gain:
+            return previous["concurrency"]
+    return None
+
+
+async def run(args) -> dict:
+    corpus = load_corpus()
+    results = {}
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(args.levels) * 2)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        for endpoint in args.endpoints:
+            levels = []
+            for concurrency in args.levels:
+                level = await run_level(client, endpoint, concurrency, args.requests_per_level,
+                                        corpus, not args.repeat_payloads)
+                levels.append(level)
+                print(f"{endpoint:<18} c={concurrency:<4} {level['throughput_rps']:>7.2f} rps  "
+                      f"p50={level['p50']:.2f}s p99={level['p99']:.2f}s  "
+                      f"err={level['error_rate']:.1%} shed={level['shed_rate']:.1%}")
+            saturation = find_saturation(levels, args.min_gain, args.max_error_rate)
+            results[endpoint] = {"levels": levels, "saturation_concurrency": saturation}
+            print(f"{endpoint}: saturates at concurrency {saturation or 'beyond tested range'}\n")
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "base_url": args.base_url,
+            "requests_per_level": args.requests_per_level,
+            "unique_payloads": not args.repeat_payloads,
+        },
+        "endpoints": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI Tutor API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoints", nargs="+", default=["tutor-response", "generate-mind-map", "render-video"],
+                        choices=["render-video", "tutor-response", "generate-mind-map", "generate-summary"])
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-level", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request timeout (s)")
+    parser.add_argument("--repeat-payloads", action="store_true",
+                        help="Allow identical payloads so caching and coalescing kick in")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="Throughput gain below which a level counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.05)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,129 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "AIzaSyAUjVQ5_y8R7tynxqe9DBV9WqMLwm
 # ElevenLabs API Configuration
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "sk_c1a3a4144f186df1c8b35d1a664ddf083d3582010edea863")
 
+# Alternate API endpoints, e.g. the stand-in servers in benchmarks/fake_servers.py
+# GEMINI_API_ENDPOINT="http://127.0.0.1:9101", ELEVENLABS_BASE_URL="http://127.0.0.1:9102/v1"
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "")
+
 # Manim Configuration
 MANIM_OUTPUT_DIR = os.getenv("MANIM_OUTPUT_DIR", "./output")
+# SQLite catalog of generated videos and audio
+ARTIFACT_DB_PATH = os.getenv("ARTIFACT_DB_PATH", os.path.join(MANIM_OUTPUT_DIR, "artifacts.db"))
+# SQLite key/value cache shared by every worker process on the host
+SHARED_CACHE_DB_PATH = os.getenv("SHARED_CACHE_DB_PATH", os.path.join(MANIM_OUTPUT_DIR, "cache.db"))
 MAX_VIDEO_DURATION = int(os.getenv("MAX_VIDEO_DURATION", "300"))
+# Resource limits for each Manim process (0 disables a limit): CPU seconds,
+# address space, largest file it may write, and processes per user (RLIMIT_NPROC
+# counts every process of the user, so only set it with a dedicated render user).
+# Output kept for error reports is capped at RENDER_OUTPUT_BUFFER_KB.
+RENDER_CPU_SECONDS = int(os.getenv("RENDER_CPU_SECONDS", "600"))
+RENDER_MEMORY_MB = int(os.getenv("RENDER_MEMORY_MB", "4096"))
+RENDER_MAX_FILE_MB = int(os.getenv("RENDER_MAX_FILE_MB", "1024"))
+RENDER_MAX_PROCESSES = int(os.getenv("RENDER_MAX_PROCESSES", "0"))
+RENDER_OUTPUT_BUFFER_KB = int(os.getenv("RENDER_OUTPUT_BUFFER_KB", "64"))
+# Manim processes run at once across all renders, which is also the most one long
+# scene is split across (1 disables splitting), and the shortest stretch of
+# animation (seconds) worth its own process
+RENDER_SEGMENT_WORKERS = int(os.getenv("RENDER_SEGMENT_WORKERS", str(os.cpu_count() or 2)))
+RENDER_MIN_SEGMENT_SECONDS = float(os.getenv("RENDER_MIN_SEGMENT_SECONDS", "8"))
+# Live renders split finer so the first segment is playable sooner
+LIVE_MAX_SEGMENTS = int(os.getenv("LIVE_MAX_SEGMENTS", "12"))
+LIVE_MIN_SEGMENT_SECONDS = float(os.getenv("LIVE_MIN_SEGMENT_SECONDS", "3"))
+# Draw simple scenes (text and basic shapes, see native_renderer.py) directly
+# with cairo and one ffmpeg encode; anything else still goes through Manim
+RENDER_NATIVE = os.getenv("RENDER_NATIVE", "true").lower() == "true"
+# Render progress published to /progress: how long finished renders stay
+# queryable (seconds) and how many renders are tracked at once
+PROGRESS_TTL_SECONDS = float(os.getenv("PROGRESS_TTL_SECONDS", "600"))
+PROGRESS_MAX_ENTRIES = int(os.getenv("PROGRESS_MAX_ENTRIES", "1000"))
+# Adaptive-bitrate HLS packaging of finished videos and lessons. The ladder is
+# height:video-bitrate pairs; rungs taller than the render are skipped.
+HLS_ENABLED = os.getenv("HLS_ENABLED", "false").lower() == "true"
+HLS_LADDER = os.getenv("HLS_LADDER", "240:300k,360:600k,480:1000k,720:2000k")
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+# Stream the code+narration reply and start TTS and rendering as soon as each
+# field is complete, instead of after the whole reply (threads shared by all renders)
+PIPELINE_SPECULATION = os.getenv("PIPELINE_SPECULATION", "true").lower() == "true"
+PIPELINE_SPECULATION_WORKERS = int(os.getenv("PIPELINE_SPECULATION_WORKERS", "32"))
+# Batch lesson renders: questions per lesson, items rendered at once, total seconds allowed
+LESSON_MAX_ITEMS = int(os.getenv("LESSON_MAX_ITEMS", "20"))
+LESSON_MAX_PARALLEL = int(os.getenv("LESSON_MAX_PARALLEL", str(os.cpu_count() or 2)))
+LESSON_DEADLINE = float(os.getenv("LESSON_DEADLINE", "1800"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+# "spec" has Gemini describe each animation in a compact JSON scene format that
+# is compiled to Manim locally (fewer output tokens, always valid code);
+# "code" has it write the Manim Python itself
+SCENE_FORMAT = os.getenv("SCENE_FORMAT", "spec")
+# "full" sends the complete prompt wording, "compact" the terse variants (fewer input tokens)
+PROMPT_MODE = os.getenv("PROMPT_MODE", "full")
+
+# Model routing
+# Each tier is a comma-separated list: primary model first, then fallbacks.
+# A request fails over when the primary's rolling p95 exceeds the tier's
+# budget (seconds) or its error rate exceeds GEMINI_FAILOVER_ERROR_RATE.
+GEMINI_HEAVY_MODELS = os.getenv("GEMINI_HEAVY_MODELS", "gemini-2.0-flash,gemini-1.5-flash")
+GEMINI_HEAVY_TIMEOUT = float(os.getenv("GEMINI_HEAVY_TIMEOUT", "60"))
+GEMINI_HEAVY_P95_BUDGET = float(os.getenv("GEMINI_HEAVY_P95_BUDGET", "20"))
+GEMINI_LIGHT_MODELS = os.getenv("GEMINI_LIGHT_MODELS", "gemini-2.0-flash-lite,gemini-2.0-flash")
+GEMINI_LIGHT_TIMEOUT = float(os.getenv("GEMINI_LIGHT_TIMEOUT", "15"))
+GEMINI_LIGHT_P95_BUDGET = float(os.getenv("GEMINI_LIGHT_P95_BUDGET", "4"))
+# Per-method tier overrides, e.g. "generate_tutor_response=light,generate_mind_map=heavy"
+GEMINI_ROUTES = os.getenv("GEMINI_ROUTES", "")
+GEMINI_FAILOVER_ERROR_RATE = float(os.getenv("GEMINI_FAILOVER_ERROR_RATE", "0.25"))
+GEMINI_ROUTER_WINDOW_SECONDS = float(os.getenv("GEMINI_ROUTER_WINDOW_SECONDS", "300"))
+
+# Request hedging: when a call has run longer than the model's recent
+# GEMINI_HEDGE_PERCENTILE latency, send a duplicate and take the first answer.
+# At most GEMINI_HEDGE_MAX_RATE of calls are hedged.
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "False").lower() == "true"
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0.9"))
+GEMINI_HEDGE_MAX_RATE = float(os.getenv("GEMINI_HEDGE_MAX_RATE", "0.1"))
+
+# Admission Control
+# Concurrent requests per pool, how many may wait for a slot, how long (seconds)
+# they may wait, and the per-client request budget per minute (0 disables)
+RENDER_MAX_CONCURRENCY = int(os.getenv("RENDER_MAX_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", "8"))
+RENDER_MAX_QUEUE_WAIT = float(os.getenv("RENDER_MAX_QUEUE_WAIT", "120"))
+RENDER_RATE_PER_MINUTE = float(os.getenv("RENDER_RATE_PER_MINUTE", "10"))
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "30"))
+LLM_RATE_PER_MINUTE = float(os.getenv("LLM_RATE_PER_MINUTE", "30"))
+
+LIGHT_MAX_CONCURRENCY = int(os.getenv("LIGHT_MAX_CONCURRENCY", "16"))
+LIGHT_MAX_QUEUE = int(os.getenv("LIGHT_MAX_QUEUE", "64"))
+LIGHT_MAX_QUEUE_WAIT = float(os.getenv("LIGHT_MAX_QUEUE_WAIT", "10"))
+LIGHT_RATE_PER_MINUTE = float(os.getenv("LIGHT_RATE_PER_MINUTE", "120"))
+# Threads running hedged Gemini calls. A hedge's losing call can't be
+# interrupted and holds its thread until it answers or times out, so the
+# default leaves room for two calls per admitted request
+GEMINI_HEDGE_WORKERS = int(os.getenv(
+    "GEMINI_HEDGE_WORKERS", str(2 * (RENDER_MAX_CONCURRENCY + LLM_MAX_CONCURRENCY + LIGHT_MAX_CONCURRENCY))
+))
+# Reverse proxies (comma-separated addresses or CIDR ranges) whose
+# X-Forwarded-For is believed when identifying clients; empty trusts none
+TRUSTED_PROXIES = [proxy.strip() for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()]
+
+# End-to-end deadline (seconds) per pool. Clients may ask for less with an
+# X-Request-Timeout header; upstream calls are cut off when time runs out.
+RENDER_DEADLINE = float(os.getenv("RENDER_DEADLINE", "300"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))
+LIGHT_DEADLINE = float(os.getenv("LIGHT_DEADLINE", "20"))
+
+# Mind map layout: "radial" (main topic in the centre) or "tidy" (left-to-right tree)
+MIND_MAP_LAYOUT = os.getenv("MIND_MAP_LAYOUT", "radial")
+MIND_MAP_MAX_SESSIONS = int(os.getenv("MIND_MAP_MAX_SESSIONS", "1000"))
+MIND_MAP_SESSION_TTL_HOURS = float(os.getenv("MIND_MAP_SESSION_TTL_HOURS", "24"))
+# Node summaries and subtopics are cached (shared by all workers) for this long
+MIND_MAP_CACHE_TTL_HOURS = float(os.getenv("MIND_MAP_CACHE_TTL_HOURS", "24"))
+# Warm those caches for a new map's suggestion nodes in the background, using
+# only idle light-pool capacity and at most this many estimated tokens a minute
+MIND_MAP_PREFETCH = os.getenv("MIND_MAP_PREFETCH", "true").lower() == "true"
+MIND_MAP_PREFETCH_TOKENS_PER_MINUTE = float(os.getenv("MIND_MAP_PREFETCH_TOKENS_PER_MINUTE", "20000"))
+MIND_MAP_PREFETCH_MAX_NODES = int(os.getenv("MIND_MAP_PREFETCH_MAX_NODES", "6"))
 
 # Server Configuration
 HOST = "0.0.0.0"
@@ -0,0 +1,50 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+
+# Absolute time.monotonic() by which the current request must finish. Lives in
+# a contextvar so it follows the request into run_blocking threads.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    """The request ran out of time before an upstream call could finish"""
+
+    def __init__(self, detail: str = "Request deadline exceeded"):
+        super().__init__(status_code=504, detail=detail)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Bound the enclosed work to `seconds`; never extends an outer deadline"""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    current = _deadline.get()
+    candidate = time.monotonic() + seconds
+    token = _deadline.set(candidate if current is None else min(current, candidate))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def bounded_timeout(timeout: float, what: str = "request") -> float:
+    """`timeout` capped to the time left; raises if the deadline has already passed"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {what}")
+    return min(timeout, left)
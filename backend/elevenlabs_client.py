@@ -2,52 +2,75 @@ import os
 import tempfile
 import hashlib
 import json
+import threading
 from pathlib import Path
-from elevenlabs import generate, save, set_api_key
-from config import ELEVENLABS_API_KEY
+from typing import Optional
+from config import ELEVENLABS_API_KEY, ELEVENLABS_BASE_URL
 from difflib import SequenceMatcher
+from metrics import metrics
+from artifact_catalog import artifact_catalog, content_hash
+from shared_cache import atomic_path, shared_cache
+
+# Shared-cache namespace indexing generated audio by its text, for similarity reuse
+SIMILARITY_NAMESPACE = "tts_text"
+# Most recent entries compared against when looking for similar text
+SIMILARITY_SCAN_LIMIT = 1000
 
 class ElevenLabsClient:
     def __init__(self):
-        """Initialize ElevenLabs client"""
-        set_api_key(ELEVENLABS_API_KEY)
+        """Initialize ElevenLabs client (the SDK loads on first use)"""
         self.output_dir = Path("output/audio")
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.cache = {}  # Simple in-memory cache
-        self.similarity_cache = {}  # Cache for similar texts
-        self.cache_file = self.output_dir / "cache.json"
-        self.load_cache()
+        # Pre-shared-cache JSON file, imported once then renamed
+        self.legacy_cache_file = self.output_dir / "cache.json"
+        self._sdk = None
+        self._init_lock = threading.Lock()
     
-    def load_cache(self):
-        """Load cache from disk"""
-        try:
-            if self.cache_file.exists():
-                with open(self.cache_file, 'r') as f:
-                    data = json.load(f)
-                    self.cache = data.get('cache', {})
-                    self.similarity_cache = data.get('similarity_cache', {})
-        except Exception:
-            self.cache = {}
-            self.similarity_cache = {}
+    def warm_up(self):
+        """Import the SDK, set the API key and migrate the legacy cache; safe to call repeatedly"""
+        if self._sdk is not None:
+            return self._sdk
+        with self._init_lock:
+            if self._sdk is None:
+                if ELEVENLABS_BASE_URL:
+                    # The SDK reads its base URL from the environment when it is imported
+                    os.environ["ELEVEN_BASE_URL"] = ELEVENLABS_BASE_URL.rstrip("/")
+                import elevenlabs
+                elevenlabs.set_api_key(ELEVENLABS_API_KEY)
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                self.migrate_legacy_cache()
+                self._sdk = elevenlabs
+        return self._sdk
     
-    def save_cache(self):
-        """Save cache to disk"""
+    def migrate_legacy_cache(self):
+        """Import similarity entries from the old per-process cache.json into the shared cache"""
+        try:
+            with open(self.legacy_cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for text, audio_path in data.get('similarity_cache', {}).items():
+            self.remember_text(text, audio_path)
+        # Another worker may have migrated it first; either way it's done
         try:
-            data = {
-                'cache': self.cache,
-                'similarity_cache': self.similarity_cache
-            }
-            with open(self.cache_file, 'w') as f:
-                json.dump(data, f)
-        except Exception:
+            os.replace(self.legacy_cache_file, self.legacy_cache_file.with_suffix(".json.migrated"))
+        except OSError:
             pass
     
-    def find_similar_text(self, text: str, threshold: float = 0.8) -> str:
-        """Find similar text in cache to reuse audio"""
-        for cached_text, audio_path in self.similarity_cache.items():
-            similarity = SequenceMatcher(None, text.lower(), cached_text.lower()).ratio()
-            if similarity >= threshold and Path(audio_path).exists():
-                return audio_path
+    def remember_text(self, text: str, audio_path: str, voice_id: Optional[str] = None):
+        """Index generated audio by its text so similar requests (from any worker) can reuse it"""
+        shared_cache.set(SIMILARITY_NAMESPACE, content_hash(text, voice_id),
+                         {"text": text, "voice_id": voice_id, "path": str(audio_path)})
+    
+    def find_similar_text(self, text: str, threshold: float = 0.8,
+                          voice_id: Optional[str] = None) -> Optional[str]:
+        """Find similar text in the shared cache to reuse audio"""
+        text = text.lower()
+        for _, entry in shared_cache.recent(SIMILARITY_NAMESPACE, SIMILARITY_SCAN_LIMIT):
+            if entry["voice_id"] not in (None, voice_id):
+                continue
+            similarity = SequenceMatcher(None, text, entry["text"].lower()).ratio()
+            if similarity >= threshold and Path(entry["path"]).exists():
+                return entry["path"]
         return None
     
     def generate_speech(self, text: str, voice_id: str = "21m00Tcm4TlvDq8ikWAM") -> str:
@@ -66,20 +89,38 @@ class ElevenLabsClient:
             text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
             filename = f"speech_{text_hash}.mp3"
             output_path = self.output_dir / filename
+            source_hash = content_hash(text, voice_id)
             
-            # Check if file already exists
+            # Check the catalog, then the file itself for audio made before the catalog existed
+            cached = artifact_catalog.find("audio", source_hash)
+            if cached and Path(cached["path"]).exists():
+                metrics.cache_hit("tts")
+                return cached["path"]
+            if cached:
+                # Deleted behind the catalog's back; regenerate it
+                artifact_catalog.remove(cached["path"])
             if output_path.exists():
+                metrics.cache_hit("tts")
+                artifact_catalog.record("audio", output_path, source_hash=source_hash, narration=text,
+                                        file_size=output_path.stat().st_size)
                 return str(output_path)
+            metrics.cache_miss("tts")
+            sdk = self.warm_up()
             
             # Generate audio using ElevenLabs
-            audio = generate(
-                text=text,
-                voice=voice_id,
-                model="eleven_turbo_v2"  # Faster, cheaper model
-            )
+            with metrics.stage("tts"):
+                audio = sdk.generate(
+                    text=text,
+                    voice=voice_id,
+                    model="eleven_turbo_v2"  # Faster, cheaper model
+                )
             
-            # Save to output directory
-            save(audio, str(output_path))
+            # Save to output directory; the rename keeps other workers from seeing a partial file
+            with atomic_path(output_path) as temp_path:
+                sdk.save(audio, str(temp_path))
+            artifact_catalog.record("audio", output_path, source_hash=source_hash, narration=text,
+                                    file_size=output_path.stat().st_size)
+            self.remember_text(text, output_path, voice_id)
             
             return str(output_path)
                 
@@ -88,17 +129,19 @@ class ElevenLabsClient:
     
     def generate_speech_to_file(self, text: str, filename: str, voice_id: str = "21m00Tcm4TlvDq8ikWAM") -> str:
         try:
+            sdk = self.warm_up()
             # Check for similar text first
-            similar_path = self.find_similar_text(text)
+            similar_path = self.find_similar_text(text, voice_id=voice_id)
             if similar_path:
                 # Copy similar audio to new filename
                 output_path = self.output_dir / filename
                 import shutil
-                shutil.copy2(similar_path, output_path)
+                with atomic_path(output_path) as temp_path:
+                    shutil.copy2(similar_path, temp_path)
                 return str(output_path)
             
             # Generate audio (use faster model)
-            audio = generate(
+            audio = sdk.generate(
                 text=text,
                 voice=voice_id,
                 model="eleven_turbo_v2"  # Faster, cheaper model
@@ -106,7 +149,9 @@ class ElevenLabsClient:
             
             # Save to output directory
             output_path = self.output_dir / filename
-            save(audio, str(output_path))
+            with atomic_path(output_path) as temp_path:
+                sdk.save(audio, str(temp_path))
+            self.remember_text(text, output_path, voice_id)
             return str(output_path)
             
         except Exception as e:
@@ -117,8 +162,7 @@ class ElevenLabsClient:
         Get list of available voices
         """
         try:
-            from elevenlabs import voices
-            return voices()
+            return self.warm_up().voices()
         except Exception as e:
             raise Exception(f"Failed to get voices: {e}")
     
@@ -0,0 +1,97 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Callable, Optional, TypeVar
+
+from config import GEMINI_HEDGE_MAX_RATE, GEMINI_HEDGE_WORKERS
+from deadlines import DeadlineExceeded
+from metrics import metrics
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=GEMINI_HEDGE_WORKERS, thread_name_prefix="gemini-hedge")
+
+
+class HedgeBudget:
+    """
+    Caps hedging to a fraction of traffic: every request earns `max_rate`
+    credit (banked up to `burst`) and every hedge spends one, so a slow
+    upstream can never double our request volume.
+    """
+
+    def __init__(self, max_rate: float, burst: float = 5.0):
+        self.max_rate = max_rate
+        self.burst = burst
+        self.credit = burst if max_rate > 0 else 0.0
+        self._lock = threading.Lock()
+
+    def on_request(self):
+        with self._lock:
+            self.credit = min(self.burst, self.credit + self.max_rate)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.credit >= 1.0:
+                self.credit -= 1.0
+                return True
+            return False
+
+
+def hedged_call(fn: Callable[[], T], hedge_after: Optional[float], timeout: float,
+                budget: HedgeBudget) -> T:
+    """
+    Run `fn`; if it hasn't answered after `hedge_after` seconds, start a
+    duplicate and return whichever succeeds first. Without a hedge delay
+    this is a plain call.
+
+    The slower call is abandoned, not stopped: it is cancelled only if it
+    hasn't started yet. The Gemini SDK call blocks and can't be interrupted,
+    so a running loser keeps its worker until it answers or hits its own
+    request timeout, and is billed like any other call. GEMINI_HEDGE_WORKERS
+    is sized for that.
+    """
+    budget.on_request()
+    if hedge_after is None or hedge_after >= timeout:
+        return fn()
+
+    # Each attempt gets its own context copy so both see the request's deadline and timings
+    primary = _executor.submit(contextvars.copy_context().run, fn)
+    try:
+        return primary.result(timeout=hedge_after)
+    except FutureTimeout:
+        pass
+
+    if not budget.try_spend():
+        metrics.hedges.inc(outcome="skipped")
+        try:
+            return primary.result(timeout=timeout - hedge_after)
+        except FutureTimeout:
+            raise DeadlineExceeded("Upstream call timed out")
+
+    metrics.hedges.inc(outcome="sent")
+    backup = _executor.submit(contextvars.copy_context().run, fn)
+    pending = {primary, backup}
+    last_error: Optional[BaseException] = None
+    give_up_at = time.monotonic() + timeout - hedge_after
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, give_up_at - time.monotonic()),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    # Only a call still queued can be cancelled; a running one finishes unobserved
+                    loser.cancel()
+                if future is backup:
+                    metrics.hedges.inc(outcome="won")
+                return future.result()
+            last_error = future.exception()
+    if last_error is not None and not pending:
+        raise last_error
+    raise DeadlineExceeded("Upstream call timed out")
+
+
+# Global instance
+hedge_budget = HedgeBudget(GEMINI_HEDGE_MAX_RATE)
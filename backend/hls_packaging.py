@@ -0,0 +1,154 @@
+import os
+import shutil
+import subprocess
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from config import MANIM_OUTPUT_DIR, MAX_VIDEO_DURATION, HLS_LADDER, HLS_SEGMENT_SECONDS
+from artifact_catalog import artifact_catalog
+from metrics import metrics
+from shared_cache import shared_cache
+
+HLS_DIR = Path(MANIM_OUTPUT_DIR) / "hls"
+MASTER_NAME = "master.m3u8"
+
+# Claims on in-progress packaging, so concurrent workers don't repeat it
+_CLAIM_NAMESPACE = "hls_packaging"
+_CLAIM_TTL = MAX_VIDEO_DURATION * 2 + 120
+
+
+def parse_ladder(spec: str) -> List[Tuple[int, str]]:
+    """'240:300k,480:1000k' -> [(240, '300k'), (480, '1000k')], shortest first"""
+    rungs = []
+    for rung in spec.split(","):
+        if rung.strip():
+            height, bitrate = rung.strip().split(":")
+            rungs.append((int(height), bitrate))
+    return sorted(rungs)
+
+
+def _bits(bitrate: str) -> int:
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(bitrate[-1].lower(), 1)
+    return int(float(bitrate.rstrip("kKmM")) * multiplier)
+
+
+class HLSPackager:
+    """
+    Packages finished videos as an HLS rendition ladder (CMAF/fMP4 segments
+    plus a master playlist) so players can pick a bitrate to suit the
+    connection. Each source is packaged once: the master playlist is
+    catalogued under the video's source hash and reused from then on.
+    """
+
+    def __init__(self, renderer, ladder: str = HLS_LADDER, segment_seconds: float = HLS_SEGMENT_SECONDS):
+        self.renderer = renderer
+        self.ladder = parse_ladder(ladder)
+        self.segment_seconds = segment_seconds
+
+    def url_for(self, source_hash: Optional[str]) -> Optional[str]:
+        """Master playlist URL for an already packaged source"""
+        if not source_hash:
+            return None
+        artifact = artifact_catalog.find("hls", source_hash)
+        if artifact and Path(artifact["path"]).exists():
+            return f"/hls/{source_hash}/{MASTER_NAME}"
+        return None
+
+    def package(self, video_path: str, source_hash: str) -> Optional[str]:
+        """
+        Package `video_path` unless it already is (or another worker is at it).
+        Returns the master playlist URL, or None if packaging was skipped.
+        """
+        url = self.url_for(source_hash)
+        if url:
+            metrics.cache_hit("hls")
+            return url
+        if not shared_cache.add(_CLAIM_NAMESPACE, source_hash, os.getpid(), ttl=_CLAIM_TTL):
+            return None
+        metrics.cache_miss("hls")
+        try:
+            return self._package(Path(video_path), source_hash)
+        finally:
+            shared_cache.delete(_CLAIM_NAMESPACE, source_hash)
+
+    def _renditions(self, video_path: Path) -> List[Tuple[int, str]]:
+        # Upscaling spends bits without adding detail, so the ladder stops at the source
+        signature = self.renderer._probe_streams(video_path) or ()
+        heights = [dict(stream).get("height") for stream in signature if ("codec_type", "video") in stream]
+        source_height = next((height for height in heights if height), None)
+        if source_height is None:
+            return self.ladder[:1]
+        return [rung for rung in self.ladder if rung[0] <= source_height] or self.ladder[:1]
+
+    def _package(self, video_path: Path, source_hash: str) -> str:
+        renditions = self._renditions(video_path)
+        has_audio = self.renderer._has_audio(video_path)
+        names = [f"{height}p" for height, _ in renditions]
+
+        # Build beside the final directory and rename it into place when complete
+        final_dir = HLS_DIR / source_hash
+        build_dir = HLS_DIR / f".{source_hash}.{uuid.uuid4().hex[:8]}"
+        for name in names:
+            (build_dir / name).mkdir(parents=True, exist_ok=True)
+
+        split = f"[0:v]split={len(renditions)}" + "".join(f"[s{i}]" for i in range(len(renditions)))
+        scales = [f"[s{i}]scale=-2:{height}[v{i}]" for i, (height, _) in enumerate(renditions)]
+        cmd = ['ffmpeg', '-i', str(video_path), '-filter_complex', ";".join([split] + scales)]
+        for i, (_, bitrate) in enumerate(renditions):
+            cmd += ['-map', f'[v{i}]']
+            if has_audio:
+                cmd += ['-map', '0:a']
+            cmd += [f'-b:v:{i}', bitrate, f'-maxrate:v:{i}', bitrate, f'-bufsize:v:{i}', str(_bits(bitrate) * 2)]
+        cmd += [
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            # Keyframes on the segment grid keep renditions switchable at every boundary
+            '-force_key_frames', f'expr:gte(t,n_forced*{self.segment_seconds})', '-sc_threshold', '0',
+        ]
+        if has_audio:
+            cmd += ['-c:a', 'aac', '-b:a', '64k', '-ac', '1']
+        stream_map = [
+            f"v:{i},a:{i},name:{name}" if has_audio else f"v:{i},name:{name}"
+            for i, name in enumerate(names)
+        ]
+        cmd += [
+            '-f', 'hls',
+            '-hls_time', str(self.segment_seconds),
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_type', 'fmp4',
+            '-hls_flags', 'independent_segments',
+            '-hls_fmp4_init_filename', 'init.mp4',
+            '-hls_segment_filename', str(build_dir / '%v' / 'segment_%05d.m4s'),
+            '-master_pl_name', MASTER_NAME,
+            '-var_stream_map', " ".join(stream_map),
+            '-y', str(build_dir / '%v' / 'index.m3u8')
+        ]
+
+        try:
+            with metrics.stage("hls_package"):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=MAX_VIDEO_DURATION * 2 + 60)
+            if result.returncode != 0 or not (build_dir / MASTER_NAME).exists():
+                raise Exception(f"Failed to package HLS: {result.stderr}")
+            shutil.rmtree(final_dir, ignore_errors=True)
+            os.replace(build_dir, final_dir)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+        master_path = final_dir / MASTER_NAME
+        artifact_catalog.record(
+            "hls", master_path,
+            source_hash=source_hash,
+            duration=self.renderer._get_video_duration(video_path),
+            file_size=sum(path.stat().st_size for path in final_dir.rglob("*") if path.is_file()),
+            metadata={"renditions": [{"name": name, "height": height, "bitrate": bitrate}
+                                     for name, (height, bitrate) in zip(names, renditions)]}
+        )
+        return f"/hls/{source_hash}/{MASTER_NAME}"
+
+    def cleanup(self, max_age_hours: int = 24):
+        """Delete packaged ladders older than `max_age_hours`"""
+        cutoff = time.time() - max_age_hours * 3600
+        for artifact in artifact_catalog.older_than(cutoff, kinds=["hls"]):
+            shutil.rmtree(Path(artifact["path"]).parent, ignore_errors=True)
+            artifact_catalog.remove(artifact["path"])
@@ -0,0 +1,155 @@
+import json
+import math
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import MANIM_OUTPUT_DIR
+from shared_cache import atomic_path
+
+LIVE_DIR = Path(MANIM_OUTPUT_DIR) / "live"
+PLAYLIST_NAME = "index.m3u8"
+STATUS_NAME = "status.json"
+
+_STREAM_ID = set("0123456789abcdef")
+
+
+class LiveStream:
+    """
+    HLS event stream of a video that is still rendering.
+
+    The renderer hands over parts as they finish, in any order. Each part
+    that extends the contiguous prefix is packaged into an MPEG-TS segment
+    with its slice of the narration and appended to an EVENT playlist, so
+    playback can start while later parts render. The playlist and a status
+    file are rewritten atomically on disk, which lets any worker serve the
+    stream. The finished mp4 (built as usual) is announced in the status.
+    """
+
+    def __init__(self, renderer, stream_id: Optional[str] = None):
+        self.renderer = renderer
+        self.id = stream_id or uuid.uuid4().hex[:16]
+        self.directory = LIVE_DIR / self.id
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.narration_audio: Optional[str] = None
+        self.audio_duration = 0.0
+        self.segments: List[dict] = []
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.video_url: Optional[str] = None
+        self.created_at = time.time()
+        self._parts: Dict[int, Path] = {}
+        self._next_part = 0
+        self._offset = 0.0
+        self._lock = threading.Lock()
+        self._write()
+
+    def set_narration(self, audio_path: str):
+        """Narration to slice across segments; must be set before the first part arrives"""
+        self.narration_audio = audio_path
+        self.audio_duration = self.renderer._get_audio_duration(Path(audio_path))
+
+    def add_part(self, index: int, total: int, path: Path):
+        """Renderer callback: package every part that is now next in line"""
+        with self._lock:
+            if self.status in ("done", "failed"):
+                # A render the pipeline no longer needs (e.g. a cache hit) finished late
+                return
+            if self.status == "pending":
+                self.status = "rendering"
+            self._parts[index] = path
+            # A failed segment stops the live playlist; the final video still gets built
+            while self.error is None and self._next_part in self._parts:
+                part = self._parts.pop(self._next_part)
+                name = f"segment_{self._next_part:05d}.ts"
+                try:
+                    duration = self.renderer.package_live_segment(
+                        part, self.directory / name, self._offset,
+                        self.narration_audio, self.audio_duration,
+                        last=self._next_part == total - 1
+                    )
+                except Exception as e:
+                    self.error = str(e)
+                    break
+                self.segments.append({"name": name, "duration": round(duration, 3)})
+                self._offset += duration
+                self._next_part += 1
+            self._write()
+
+    def stop_segments(self, reason: str):
+        """Publish no further segments; the finished video is still announced"""
+        with self._lock:
+            self.error = reason
+            self._write()
+
+    def finish(self, video_url: str):
+        with self._lock:
+            self.status = "done"
+            self.video_url = video_url
+            self._write()
+
+    def fail(self, error: str):
+        with self._lock:
+            self.status = "failed"
+            self.error = error
+            self._write()
+
+    def _write(self):
+        finished = self.status in ("done", "failed")
+        with atomic_path(self.directory / PLAYLIST_NAME) as temp:
+            temp.write_text(_playlist(self.segments, ended=finished))
+        with atomic_path(self.directory / STATUS_NAME) as temp:
+            temp.write_text(json.dumps({
+                "stream_id": self.id,
+                "status": self.status,
+                "segments": self.segments,
+                "duration": round(self._offset, 3),
+                "video_url": self.video_url,
+                "error": self.error,
+                "created_at": self.created_at,
+            }))
+
+
+def _playlist(segments: List[dict], ended: bool) -> str:
+    # Target duration can't be known before every part is packaged; players
+    # only use it to pace playlist reloads, so the running maximum is enough
+    target = max([math.ceil(segment["duration"]) for segment in segments] + [1])
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+        f"#EXT-X-TARGETDURATION:{target}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+    for segment in segments:
+        lines.append(f"#EXTINF:{segment['duration']:.3f},")
+        lines.append(segment["name"])
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def stream_dir(stream_id: str) -> Optional[Path]:
+    """Directory of an existing live stream, or None for unknown or malformed ids"""
+    if not stream_id or not set(stream_id) <= _STREAM_ID:
+        return None
+    directory = LIVE_DIR / stream_id
+    return directory if (directory / STATUS_NAME).exists() else None
+
+
+def read_status(directory: Path) -> dict:
+    with open(directory / STATUS_NAME, 'r') as f:
+        return json.load(f)
+
+
+def cleanup_live_streams(max_age_hours: int = 24):
+    """Delete live segment directories untouched for `max_age_hours`"""
+    if not LIVE_DIR.exists():
+        return
+    cutoff = time.time() - max_age_hours * 3600
+    for directory in LIVE_DIR.iterdir():
+        if directory.is_dir() and directory.stat().st_mtime < cutoff:
+            shutil.rmtree(directory, ignore_errors=True)
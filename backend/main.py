@@ -1,17 +1,41 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 from datetime import datetime
+import asyncio
+import contextvars
+import json
 import os
+import stat
+import time
 from pathlib import Path
+from typing import Optional
 
-from models import QuestionRequest, VideoResponse, ErrorResponse, ManimCodeResponse, ImageAnalysisRequest, ImageAnalysisResponse, TextToSpeechRequest, TextToSpeechResponse, MindMapRequest, MindMapResponse
+from models import QuestionRequest, VideoResponse, ErrorResponse, ManimCodeResponse, ImageAnalysisRequest, ImageAnalysisResponse, TextToSpeechRequest, TextToSpeechResponse, MindMapRequest, MindMapResponse, ExpandNodeRequest, MindMapDeltaResponse, LessonRequest, LessonResponse, LessonItemResult, LiveStreamResponse
 from gemini_client import GeminiClient
 from manim_renderer import ManimRenderer
 from elevenlabs_client import elevenlabs_client
-from config import HOST, PORT, DEBUG
+from single_flight import single_flight, normalize_request_key
+from admission import admission_controller, AdmissionRejected, client_id
+from deadlines import deadline_scope
+from metrics import metrics, start_request_timings, format_server_timing
+from mind_map_sessions import mind_map_sessions
+from artifact_catalog import artifact_catalog, content_hash
+from shared_cache import shared_cache
+from live_streams import LiveStream, stream_dir, read_status, cleanup_live_streams, PLAYLIST_NAME
+from hls_packaging import HLSPackager, HLS_DIR
+from pipeline_speculation import SpeculativeStart
+from render_sandbox import RenderLimitExceeded
+from render_progress import progress_bus, track, current as current_progress
+from mind_map_prefetch import SuggestionPrefetcher
+from prompts import prompts
+from model_router import model_router
+from config import (
+    HOST, PORT, DEBUG, HLS_ENABLED, PIPELINE_SPECULATION, RENDER_DEADLINE, LLM_DEADLINE, LIGHT_DEADLINE,
+    LESSON_MAX_ITEMS, LESSON_MAX_PARALLEL, LESSON_DEADLINE, MIND_MAP_PREFETCH,
+)
 
 app = FastAPI(
     title="AI Tutor Backend",
@@ -28,14 +52,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    """Apply per-client token-bucket rate limits before any work is done"""
+    pool = admission_controller.pool_for_path(request.url.path)
+    if pool:
+        client = client_id(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+        try:
+            admission_controller.check_rate(client, pool)
+        except AdmissionRejected as e:
+            return JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers=e.headers)
+    return await call_next(request)
+
+POOL_DEADLINES = {"render": RENDER_DEADLINE, "llm": LLM_DEADLINE, "light": LIGHT_DEADLINE}
+# Endpoints whose budget differs from their pool's
+PATH_DEADLINES = {"/render-lesson": LESSON_DEADLINE}
+
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    """Give each request a deadline that bounds queueing and upstream calls"""
+    seconds = PATH_DEADLINES.get(request.url.path) \
+        or POOL_DEADLINES.get(admission_controller.pool_for_path(request.url.path))
+    requested = request.headers.get("x-request-timeout")
+    if requested:
+        try:
+            seconds = min(seconds, float(requested)) if seconds else float(requested)
+        except ValueError:
+            pass
+    with deadline_scope(seconds):
+        return await call_next(request)
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Record request latency and echo per-stage timings as Server-Timing"""
+    timings = start_request_timings()
+    started = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - started
+    
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", None) or "other"
+    metrics.request_seconds.observe(total, endpoint=endpoint, status=str(response.status_code))
+    response.headers["Server-Timing"] = format_server_timing(timings, total)
+    return response
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call in the threadpool, keeping the request context (stage timings) visible"""
+    ctx = contextvars.copy_context()
+    return await run_in_threadpool(ctx.run, fn, *args, **kwargs)
+
 # Initialize clients
 gemini_client = GeminiClient()
 manim_renderer = ManimRenderer()
+hls_packager = HLSPackager(manim_renderer)
+mind_map_prefetcher = SuggestionPrefetcher(gemini_client, admission_controller.pools["light"])
 
-# Mount static files for serving videos
-output_dir = Path("output")
-output_dir.mkdir(exist_ok=True)
-app.mount("/videos", StaticFiles(directory=str(output_dir)), name="videos")
+# Clients import their SDKs and touch disk lazily; warm_up() does that work in
+# the background after startup so the first real request doesn't pay for it
+WARM_UP_STEPS = {
+    "gemini": gemini_client.warm_up,
+    "tts": elevenlabs_client.warm_up,
+    "renderer": manim_renderer.warm_up,
+    "catalog": artifact_catalog.stats,
+    "shared_cache": shared_cache.purge_expired,
+}
+warm_up_status = {name: "pending" for name in WARM_UP_STEPS}
+
+async def warm_up():
+    for name, step in WARM_UP_STEPS.items():
+        try:
+            with metrics.stage(f"warm_up_{name}"):
+                await run_in_threadpool(step)
+            warm_up_status[name] = "ok"
+        except Exception as e:
+            warm_up_status[name] = f"error: {e}"
+
+@app.on_event("startup")
+async def schedule_warm_up():
+    app.state.warm_up_task = asyncio.create_task(warm_up())
 
 @app.get("/")
 async def root():
@@ -45,87 +139,408 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready once every client has finished warming up; 503 until then"""
+    ready = all(status == "ok" for status in warm_up_status.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "components": warm_up_status}
+    )
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms and counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admission")
+async def admission_status():
+    """Current load on each admission pool"""
+    return admission_controller.snapshot()
+
+@app.get("/models")
+async def model_routes():
+    """Model tier per method and rolling latency/error stats per model"""
+    return model_router.snapshot()
+
+@app.get("/prompts")
+async def prompt_sizes():
+    """Version and estimated token size of each prompt template, per mode"""
+    return prompts.report()
+
 @app.post("/generate-code", response_model=ManimCodeResponse)
 async def generate_manim_code(request: QuestionRequest):
     """
     Generate Manim code and narration from a user question
     """
     try:
-        response = gemini_client.generate_manim_code(
-            question=request.question,
-            subject=request.subject
-        )
+        async with admission_controller.slot("llm"):
+            response = await run_blocking(
+                gemini_client.generate_manim_code,
+                question=request.question,
+                subject=request.subject
+            )
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/render-video", response_model=VideoResponse)
-async def render_video(request: QuestionRequest, background_tasks: BackgroundTasks):
+def _video_response(artifact: dict) -> VideoResponse:
+    """Build the API response for a catalogued video"""
+    relative_path = os.path.relpath(artifact["path"], os.path.abspath(manim_renderer.output_dir))
+    return VideoResponse(
+        video_url=f"/videos/{Path(relative_path).as_posix()}",
+        duration=artifact["duration"],
+        file_size=artifact["file_size"],
+        created_at=datetime.fromtimestamp(artifact["created_at"]),
+        scene_metadata=[{
+            "scene_name": artifact["scene_name"],
+            "source_hash": artifact["source_hash"],
+            "narration": artifact["narration"],
+            "duration": artifact["duration"],
+        }],
+        narration_audio_url=None,  # Audio is embedded in video
+        hls_url=hls_packager.url_for(artifact["source_hash"]) if HLS_ENABLED else None
+    )
+
+def _schedule_hls(background_tasks: BackgroundTasks, video_url: str, source_hash: Optional[str]):
+    """Package a finished video as an HLS ladder after the response is sent, if not done already"""
+    if HLS_ENABLED and source_hash:
+        video_path = manim_renderer.output_dir / video_url[len("/videos/"):]
+        background_tasks.add_task(hls_packager.package, str(video_path), source_hash)
+
+def _cached_video(manim_code: str, narration: str) -> Optional[VideoResponse]:
+    """A finished video already rendered from this exact code and narration"""
+    artifact = artifact_catalog.find("video", content_hash(manim_code, narration))
+    if artifact and Path(artifact["path"]).exists():
+        metrics.cache_hit("render")
+        return _video_response(artifact)
+    metrics.cache_miss("render")
+    return None
+
+def _render_video_pipeline(request: QuestionRequest, live: Optional[LiveStream] = None) -> VideoResponse:
     """
-    Generate Manim code and render video in one step
+    Run the full question -> code -> narration -> render -> mux pipeline.
+    With `live`, rendered parts are also published as HLS segments as they finish.
     """
+    # Generate Manim code and narration; TTS and rendering start from the
+    # streamed reply as soon as their field is complete
+    progress = current_progress()
+    if progress:
+        progress.set_stage("generating")
+    speculation = SpeculativeStart(elevenlabs_client, manim_renderer, live)
     try:
-        # Generate Manim code and narration
-        manim_code, narration = gemini_client.generate_manim_code_with_narration(request.question)
+        manim_code, narration = gemini_client.generate_manim_code_with_narration(
+            request.question,
+            on_field=speculation.on_field if PIPELINE_SPECULATION else None
+        )
         
         # Validate code before rendering
         is_valid, error_msg = manim_renderer.validate_manim_code(manim_code)
         if not is_valid:
             raise HTTPException(status_code=400, detail=f"Invalid Manim code: {error_msg}")
         
-        # Extract scene name from code
-        scene_name = manim_renderer.extract_scene_name(manim_code)
+        cached = _cached_video(manim_code, narration)
+        if cached:
+            if live:
+                live.finish(cached.video_url)
+            return cached
         
         # Generate narration audio (only if narration is substantial)
-        narration_audio_path = None
-        if elevenlabs_client.should_generate_audio(narration):
-            narration_audio_path = elevenlabs_client.generate_speech(narration)
-        
-        # Render animation
-        video_path, duration, file_size = manim_renderer.render_animation(
-            manim_code=manim_code,
-            scene_name=scene_name
-        )
+        narration_audio_path = speculation.narration_audio(narration)
+        if narration_audio_path and not Path(narration_audio_path).exists():
+            narration_audio_path = None
         
-        # Combine video with narration audio
-        if narration_audio_path and Path(narration_audio_path).exists():
-            video_path = manim_renderer.combine_video_audio(video_path, narration_audio_path)
+        # Render animation with the narration muxed in
+        video_path = speculation.render(manim_code, narration_audio_path)
+    finally:
+        speculation.release()
+    
+    # Key the finished video on everything that went into it
+    artifact = artifact_catalog.record(
+        "video", video_path,
+        source_hash=content_hash(manim_code, narration),
+        narration=narration
+    )
+    response = _video_response(artifact)
+    if live:
+        live.finish(response.video_url)
+    return response
+
+@app.post("/render-video", response_model=VideoResponse)
+async def render_video(request: QuestionRequest, background_tasks: BackgroundTasks):
+    """
+    Generate Manim code and render video in one step
+    """
+    try:
+        # Identical questions that arrive while a render is in flight share it
+        key = normalize_request_key(
+            "render-video",
+            question=request.question,
+            subject=request.subject,
+            difficulty=request.difficulty
+        )
+        async def run():
+            # Only the leader of a coalesced burst takes a render slot and tracks progress,
+            # under the flight's key; every caller's render_id is an alias for it
+            with track(key):
+                async with admission_controller.slot("render"):
+                    return await run_blocking(_render_video_pipeline, request)
         
-        # Generate video URL - use relative path from output directory
-        video_path_obj = Path(video_path)
-        video_relative_path = video_path_obj.relative_to(manim_renderer.output_dir)
-        video_url = f"/videos/{video_relative_path}"
+        if request.render_id:
+            progress_bus.alias(request.render_id, key)
+        response = await single_flight.do(key, run)
         
+        if not response.hls_url:
+            _schedule_hls(background_tasks, response.video_url, response.scene_metadata[0]["source_hash"])
         # Schedule cleanup task
         background_tasks.add_task(manim_renderer.cleanup_old_videos)
         
-        return VideoResponse(
+        return response
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to render video: {str(e)}")
+
+# Live renders outlive their request; hold references so the tasks aren't collected
+_live_tasks = set()
+
+@app.post("/render-video-live", response_model=LiveStreamResponse)
+async def render_video_live(request: QuestionRequest, background_tasks: BackgroundTasks):
+    """
+    Start a render and return at once with URLs to follow it. Parts of the
+    scene are published as HLS segments while the rest renders; the status
+    gives the finished video's URL when the full render completes.
+    """
+    stream = LiveStream(manim_renderer)
+    
+    async def run():
+        try:
+            with track(stream.id):
+                async with admission_controller.slot("render"):
+                    await run_blocking(_render_video_pipeline, request, stream)
+        except Exception as e:
+            stream.fail(e.detail if isinstance(e, HTTPException) else str(e))
+    
+    task = asyncio.create_task(run())
+    _live_tasks.add(task)
+    task.add_done_callback(_live_tasks.discard)
+    background_tasks.add_task(cleanup_live_streams)
+    
+    base = f"/live/{stream.id}"
+    return LiveStreamResponse(
+        stream_id=stream.id,
+        status_url=base,
+        playlist_url=f"{base}/{PLAYLIST_NAME}",
+        stream_url=f"{base}/stream.ts",
+        progress_url=f"/progress/{stream.id}"
+    )
+
+def _live_dir(stream_id: str) -> Path:
+    directory = stream_dir(stream_id)
+    if directory is None:
+        raise HTTPException(status_code=404, detail="Live stream not found")
+    return directory
+
+@app.get("/live/{stream_id}")
+async def live_status(stream_id: str):
+    """Progress of a live render: status, published segments and, once done, the video URL"""
+    return read_status(_live_dir(stream_id))
+
+@app.get("/live/{stream_id}/stream.ts")
+async def live_stream(stream_id: str):
+    """
+    The live render as one growing MPEG-TS file: segments are sent as they
+    are published and the response ends when the render does
+    """
+    directory = _live_dir(stream_id)
+    
+    async def tail():
+        sent = 0
+        give_up_at = time.monotonic() + RENDER_DEADLINE
+        while True:
+            status = read_status(directory)
+            for segment in status["segments"][sent:]:
+                yield await run_in_threadpool((directory / segment["name"]).read_bytes)
+                sent += 1
+            # A packaging error ends the live segments even though the render goes on
+            if status["status"] in ("done", "failed") or status["error"] or time.monotonic() > give_up_at:
+                break
+            await asyncio.sleep(0.25)
+    
+    return StreamingResponse(tail(), media_type="video/mp2t")
+
+@app.get("/live/{stream_id}/{name}")
+async def live_file(stream_id: str, name: str):
+    """The HLS playlist and segments of a live render"""
+    with metrics.stage("file_serve"):
+        directory = _live_dir(stream_id)
+        if name == PLAYLIST_NAME:
+            # Event playlists grow; players must re-fetch them
+            return FileResponse(directory / name, media_type="application/vnd.apple.mpegurl",
+                                headers={"Cache-Control": "no-cache"})
+        if name.startswith("segment_") and name.endswith(".ts") and (directory / name).exists():
+            return FileResponse(directory / name, media_type="video/mp2t")
+        raise HTTPException(status_code=404, detail="Live stream file not found")
+
+def _progress(render_id: str):
+    progress = progress_bus.get(render_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No progress for this render")
+    return progress
+
+@app.get("/progress/{render_id}")
+async def render_progress(render_id: str):
+    """
+    How far a render has got: stage, animations done out of the total,
+    fraction complete (weighted by animation length) and estimated seconds left
+    """
+    return _progress(render_id).snapshot(render_id)
+
+@app.get("/progress/{render_id}/events")
+async def render_progress_events(render_id: str):
+    """The same progress as server-sent events, one per change, ending when the render does"""
+    progress = _progress(render_id)
+    
+    async def events():
+        seen = -1
+        give_up_at = time.monotonic() + RENDER_DEADLINE
+        while True:
+            if progress.version != seen:
+                seen = progress.version
+                yield f"data: {json.dumps(progress.snapshot(render_id))}\n\n"
+            if progress.finished or time.monotonic() > give_up_at:
+                break
+            await asyncio.sleep(0.25)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/render-lesson", response_model=LessonResponse)
+async def render_lesson(request: LessonRequest, background_tasks: BackgroundTasks):
+    """
+    Render an ordered list of questions as one lesson video with a chapter per question.
+    Items that fail are reported individually; the lesson is built from the rest.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(request.questions) > LESSON_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A lesson can have at most {LESSON_MAX_ITEMS} questions")
+    
+    try:
+        # Each item takes its own render slot, so a lesson never runs more renders
+        # than admission control allows; LESSON_MAX_PARALLEL only caps its own share
+        parallel = asyncio.Semaphore(max(1, min(len(request.questions), LESSON_MAX_PARALLEL)))
+        
+        async def render_item(index: int, question: str) -> LessonItemResult:
+            async with parallel:
+                try:
+                    async with admission_controller.slot("render"):
+                        video = await run_blocking(
+                            _render_video_pipeline,
+                            QuestionRequest(question=question, subject=request.subject)
+                        )
+                    return LessonItemResult(
+                        index=index, question=question, status="ok",
+                        video_url=video.video_url, duration=video.duration
+                    )
+                except RenderLimitExceeded as e:
+                    return LessonItemResult(
+                        index=index, question=question, status="failed",
+                        error=e.detail["message"], error_code=e.limit
+                    )
+                except Exception as e:
+                    error = e.detail if isinstance(e, HTTPException) else str(e)
+                    return LessonItemResult(index=index, question=question, status="failed", error=error)
+        
+        items = await asyncio.gather(*(render_item(i, q) for i, q in enumerate(request.questions)))
+        rendered = [item for item in items if item.status == "ok"]
+        if not rendered:
+            raise HTTPException(
+                status_code=500,
+                detail={"error": "No lesson items rendered", "items": [item.model_dump() for item in items]}
+            )
+        
+        clip_paths = [str(manim_renderer.output_dir / item.video_url[len("/videos/"):]) for item in rendered]
+        titles = [item.question for item in rendered]
+        # Keyed by what the clips were rendered from, so lessons that only share
+        # their questions' wording never share an HLS ladder
+        source_hash = manim_renderer.clips_hash(clip_paths, titles, request.subject)
+        output_path = manim_renderer.output_dir / "lessons" / f"lesson_{int(time.time() * 1000)}.mp4"
+        async with admission_controller.slot("render"):
+            video_path, duration, file_size, chapters = await run_blocking(
+                manim_renderer.concat_videos,
+                clip_paths,
+                titles,
+                output_path,
+                source_hash
+            )
+        
+        video_url = f"/videos/{Path(video_path).relative_to(manim_renderer.output_dir)}"
+        _schedule_hls(background_tasks, video_url, source_hash)
+        return LessonResponse(
             video_url=video_url,
             duration=duration,
             file_size=file_size,
             created_at=datetime.now(),
-            narration_audio_url=None  # Audio is now embedded in video
+            title=request.title,
+            chapters=chapters,
+            items=items,
+            hls_url=hls_packager.url_for(source_hash) if HLS_ENABLED else None
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to render video: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to render lesson: {str(e)}")
 
 @app.get("/videos/{file_path:path}")
 async def serve_video(file_path: str):
     """
     Serve video files from the output directory
     """
-    video_path = manim_renderer.output_dir / file_path
-    if not video_path.exists():
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    return FileResponse(
-        path=str(video_path),
-        media_type="video/mp4",
-        filename=Path(file_path).name
-    )
+    with metrics.stage("file_serve"):
+        video_path = manim_renderer.output_dir / file_path
+        # No longer behind StaticFiles, so keep requests inside the output directory
+        if not video_path.resolve().is_relative_to(manim_renderer.output_dir.resolve()):
+            raise HTTPException(status_code=404, detail="Video not found")
+        # One stat, handed to FileResponse so it doesn't stat again (and fail with a 500)
+        try:
+            stat_result = os.stat(video_path)
+        except (FileNotFoundError, NotADirectoryError):
+            # Deleted outside cleanup_old_videos (by hand, or a restored catalog)
+            artifact_catalog.remove(video_path)
+            raise HTTPException(status_code=404, detail="Video not found")
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404, detail="Video not found")
+        
+        return FileResponse(
+            path=str(video_path),
+            media_type="video/mp4",
+            filename=Path(file_path).name,
+            stat_result=stat_result
+        )
+
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+@app.get("/hls/{source_hash}/{file_path:path}")
+async def serve_hls(source_hash: str, file_path: str):
+    """Master playlist, rendition playlists and CMAF segments of a packaged video"""
+    with metrics.stage("file_serve"):
+        if not source_hash.isalnum():
+            raise HTTPException(status_code=404, detail="HLS file not found")
+        root = (HLS_DIR / source_hash).resolve()
+        path = (root / file_path).resolve()
+        media_type = HLS_MEDIA_TYPES.get(path.suffix)
+        if media_type is None or not path.is_relative_to(root) or not path.is_file():
+            raise HTTPException(status_code=404, detail="HLS file not found")
+        # Packaged ladders never change once published
+        return FileResponse(path, media_type=media_type, headers={"Cache-Control": "public, max-age=86400"})
 
 @app.post("/tutor-response")
 async def tutor_response(request: QuestionRequest):
@@ -133,11 +548,23 @@ async def tutor_response(request: QuestionRequest):
     Generate AI tutor response with friendly, simple explanations
     """
     try:
-        response = gemini_client.generate_tutor_response(
+        key = normalize_request_key(
+            "tutor-response",
             question=request.question,
             subject=request.subject
         )
+        async def run():
+            async with admission_controller.slot("llm"):
+                return await run_blocking(
+                    gemini_client.generate_tutor_response,
+                    question=request.question,
+                    subject=request.subject
+                )
+        
+        response = await single_flight.do(key, run)
         return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate tutor response: {e}")
 
@@ -163,13 +590,52 @@ async def analyze_image(request: ImageAnalysisRequest):
     Analyze an image (equation, diagram, etc.) and return AI explanation
     """
     try:
-        result = gemini_client.analyze_image(request.image_data, request.question)
+        async with admission_controller.slot("llm"):
+            result = await run_blocking(gemini_client.analyze_image, request.image_data, request.question)
         return ImageAnalysisResponse(**result)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _render_video_from_image_pipeline(image_data: str, question: str = None) -> VideoResponse:
+    """Run the image -> code -> render -> narration -> mux pipeline"""
+    # Generate Manim code and narration
+    manim_code, narration = gemini_client.generate_manim_code_with_narration_from_image(image_data, question)
+    cached = _cached_video(manim_code, narration)
+    if cached:
+        return cached
+    scene_name = manim_renderer.extract_scene_name(manim_code)
+    
+    # Render video first
+    video_path_str, duration, file_size = manim_renderer.render_animation(manim_code, scene_name)
+    
+    # Always generate audio and combine with video
+    try:
+        print(f"Generating audio for: {narration}")
+        audio_path = elevenlabs_client.generate_speech(narration)
+        
+        if Path(audio_path).exists():
+            print(f"Audio generated: {audio_path}")
+            # Combine video and audio
+            final_video_path = manim_renderer.combine_video_audio(video_path_str, audio_path)
+            video_path_str = final_video_path
+            print(f"Video with audio: {video_path_str}")
+        else:
+            print("Audio file not found, using video without audio")
+            
+    except Exception as e:
+        print(f"Audio generation failed: {e}, using video without audio")
+    
+    artifact = artifact_catalog.record(
+        "video", video_path_str,
+        source_hash=content_hash(manim_code, narration),
+        narration=narration
+    )
+    return _video_response(artifact)
+
 @app.post("/render-video-from-image", response_model=VideoResponse)
-async def render_video_from_image(request: ImageAnalysisRequest):
+async def render_video_from_image(request: ImageAnalysisRequest, background_tasks: BackgroundTasks):
     """Generate and render a Manim video from an image"""
     try:
         # Validate and clean image data
@@ -186,38 +652,14 @@ async def render_video_from_image(request: ImageAnalysisRequest):
         if missing_padding:
             image_data += '=' * (4 - missing_padding)
         
-        # Generate Manim code and narration
-        manim_code, narration = gemini_client.generate_manim_code_with_narration_from_image(image_data, request.question)
-        scene_name = manim_renderer.extract_scene_name(manim_code)
-        
-        # Render video first
-        video_path_str, duration, file_size = manim_renderer.render_animation(manim_code, scene_name)
-        
-        # Always generate audio and combine with video
-        try:
-            print(f"Generating audio for: {narration}")
-            audio_path = elevenlabs_client.generate_speech(narration)
-            
-            if Path(audio_path).exists():
-                print(f"Audio generated: {audio_path}")
-                # Combine video and audio
-                final_video_path = manim_renderer.combine_video_audio(video_path_str, audio_path)
-                video_path_str = final_video_path
-                print(f"Video with audio: {video_path_str}")
-            else:
-                print("Audio file not found, using video without audio")
-                
-        except Exception as e:
-            print(f"Audio generation failed: {e}, using video without audio")
-        
-        return VideoResponse(
-            video_url=f"/videos/{Path(video_path_str).relative_to(manim_renderer.output_dir)}",
-            duration=duration,
-            file_size=file_size,
-            created_at=datetime.now(),
-            narration_audio_url=None
-        )
+        async with admission_controller.slot("render"):
+            response = await run_blocking(_render_video_from_image_pipeline, image_data, request.question)
+        if not response.hls_url:
+            _schedule_hls(background_tasks, response.video_url, response.scene_metadata[0]["source_hash"])
+        return response
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
 
@@ -232,7 +674,8 @@ async def text_to_speech(request: TextToSpeechRequest):
             raise HTTPException(status_code=400, detail="Text too short for audio generation")
         
         # Generate audio file
-        audio_path = elevenlabs_client.generate_speech(request.text, request.voice_id)
+        async with admission_controller.slot("llm"):
+            audio_path = await run_blocking(elevenlabs_client.generate_speech, request.text, request.voice_id)
         
         # Create URL for the audio file
         audio_url = f"/audio/{Path(audio_path).name}"
@@ -242,6 +685,8 @@ async def text_to_speech(request: TextToSpeechRequest):
             duration=None  # Could be calculated if needed
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate speech: {e}")
 
@@ -250,11 +695,16 @@ async def serve_audio(filename: str):
     """
     Serve audio files
     """
-    audio_path = Path("output/audio") / filename
-    if audio_path.exists():
-        return FileResponse(audio_path, media_type="audio/mpeg")
-    else:
-        raise HTTPException(status_code=404, detail="Audio file not found")
+    with metrics.stage("file_serve"):
+        audio_path = Path("output/audio") / filename
+        try:
+            stat_result = os.stat(audio_path)
+        except (FileNotFoundError, NotADirectoryError):
+            artifact_catalog.remove(audio_path)
+            raise HTTPException(status_code=404, detail="Audio file not found")
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404, detail="Audio file not found")
+        return FileResponse(audio_path, media_type="audio/mpeg", stat_result=stat_result)
 
 @app.get("/cleanup")
 async def cleanup_videos(background_tasks: BackgroundTasks):
@@ -262,6 +712,8 @@ async def cleanup_videos(background_tasks: BackgroundTasks):
     Manually trigger video cleanup
     """
     background_tasks.add_task(manim_renderer.cleanup_old_videos)
+    background_tasks.add_task(cleanup_live_streams)
+    background_tasks.add_task(hls_packager.cleanup)
     return {"message": "Cleanup task scheduled"}
 
 @app.post("/generate-mind-map", response_model=MindMapResponse)
@@ -271,24 +723,80 @@ async def generate_mind_map(request: MindMapRequest):
     """
     try:
         # Generate mind map nodes using Gemini
-        nodes = gemini_client.generate_mind_map(
-            topic=request.topic,
-            depth=request.depth,
-            max_branches=request.max_branches
-        )
+        async with admission_controller.slot("llm"):
+            nodes = await run_blocking(
+                gemini_client.generate_mind_map,
+                topic=request.topic,
+                depth=request.depth,
+                max_branches=request.max_branches
+            )
+        
+        # Keep the map server-side so nodes can be expanded incrementally
+        session = mind_map_sessions.create(request.topic, nodes)
+        # Suggestions are the likely next clicks; warm their summaries and subtopics
+        if MIND_MAP_PREFETCH:
+            mind_map_prefetcher.schedule(nodes)
         
         return MindMapResponse(
             nodes=nodes,
             topic=request.topic,
-            created_at=datetime.now()
+            created_at=datetime.now(),
+            map_id=session.map_id
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate mind map: {str(e)}"
         )
 
+@app.get("/mind-maps/{map_id}", response_model=MindMapResponse)
+async def get_mind_map(map_id: str):
+    """Return the full current state of a mind map session"""
+    session = mind_map_sessions.get(map_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Mind map not found")
+    
+    return MindMapResponse(
+        nodes=list(session.nodes.values()),
+        topic=session.topic,
+        created_at=session.created_at,
+        map_id=session.map_id
+    )
+
+@app.post("/mind-maps/{map_id}/expand", response_model=MindMapDeltaResponse)
+async def expand_mind_map_node(map_id: str, request: ExpandNodeRequest):
+    """
+    Generate children for a single node and return only what changed
+    """
+    try:
+        session = mind_map_sessions.get(map_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Mind map not found")
+        if request.node_id not in session.nodes:
+            raise HTTPException(status_code=404, detail="Node not found")
+        
+        async def expand():
+            # Already expanded: nothing new to send
+            if session.nodes[request.node_id].children:
+                return MindMapDeltaResponse(map_id=map_id, parent_id=request.node_id, added_nodes=[], updated_nodes=[])
+            
+            async with admission_controller.slot("light"):
+                titles = await run_blocking(gemini_client.generate_subtopics, session.nodes[request.node_id].title)
+            
+            added, parent = session.add_children(request.node_id, titles[:max(1, request.max_children or 3)])
+            return MindMapDeltaResponse(map_id=map_id, parent_id=request.node_id, added_nodes=added, updated_nodes=[parent])
+        
+        # Double clicks on the same node share one generation
+        return await single_flight.do(f"expand:{map_id}:{request.node_id}", expand)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to expand node: {str(e)}")
+
 @app.post("/generate-subtopics")
 async def generate_subtopics(request: dict):
     """Generate 2-4 related subtopic titles for a given topic"""
@@ -297,13 +805,16 @@ async def generate_subtopics(request: dict):
         if not topic:
             raise HTTPException(status_code=400, detail="Topic is required")
         
-        subtopics = gemini_client.generate_subtopics(topic)
+        async with admission_controller.slot("light"):
+            subtopics = await run_blocking(gemini_client.generate_subtopics, topic)
         
         return {
             "subtopics": subtopics,
             "topic": topic,
             "created_at": datetime.now()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate subtopics: {str(e)}")
 
@@ -315,13 +826,16 @@ async def generate_summary(request: dict):
         if not title:
             raise HTTPException(status_code=400, detail="Title is required")
         
-        summary = gemini_client.generate_summary(title)
+        async with admission_controller.slot("light"):
+            summary = await run_blocking(gemini_client.generate_summary, title)
         
         return {
             "summary": summary,
             "title": title,
             "created_at": datetime.now()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
 
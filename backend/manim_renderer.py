@@ -1,30 +1,76 @@
+import contextvars
+import json
 import os
 import subprocess
 import tempfile
 import shutil
-from typing import Optional, Tuple
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
 from pathlib import Path
 import time
-from config import MANIM_OUTPUT_DIR, MAX_VIDEO_DURATION
+from config import (
+    MANIM_OUTPUT_DIR, MAX_VIDEO_DURATION, RENDER_SEGMENT_WORKERS, RENDER_MIN_SEGMENT_SECONDS,
+    LIVE_MAX_SEGMENTS, LIVE_MIN_SEGMENT_SECONDS, RENDER_NATIVE,
+)
+from metrics import metrics
+from native_renderer import NativeRenderer
+from artifact_catalog import artifact_catalog, content_hash
+from shared_cache import atomic_path
+from render_sandbox import RenderLimitExceeded, SandboxResult, run_sandboxed
+from render_progress import current as current_progress
+from scene_segments import animation_timeline, plan_segments
+
+# Caps Manim processes across all concurrent renders (single-process and segment
+# renders alike) so they can't oversubscribe the cores
+_manim_slots = threading.BoundedSemaphore(max(1, RENDER_SEGMENT_WORKERS))
 # from moviepy.editor import VideoFileClip, AudioFileClip  # Removed - using ffmpeg directly
 
 class ManimRenderer:
     def __init__(self):
         self.output_dir = Path(MANIM_OUTPUT_DIR)
-        # Ensure output directory exists and is writable
+        self._output_checked = False
+        self.native = NativeRenderer() if RENDER_NATIVE else None
+
+    def warm_up(self):
+        """Ensure the output directory exists and is writable; checked once"""
+        if self._output_checked:
+            return
         try:
             self.output_dir.mkdir(parents=True, exist_ok=True)
             # Test write permissions
-            test_file = self.output_dir / "test_write.tmp"
+            test_file = self.output_dir / f"test_write_{uuid.uuid4().hex[:8]}.tmp"
             test_file.touch()
             test_file.unlink()
         except Exception as e:
             raise Exception(f"Cannot create or write to output directory {self.output_dir}: {e}")
+        self._output_checked = True
         
-    def render_animation(self, manim_code: str, scene_name: str = "Explanation") -> Tuple[str, float, int]:
+    def render_animation(self, manim_code: str, scene_name: str = "Explanation",
+                         on_part: Optional[Callable[[int, int, Path], None]] = None) -> Tuple[str, float, int]:
         """
-        Render Manim animation and return video path, duration, and file size
+        Render Manim animation and return video path, duration, and file size.
+
+        With `on_part`, the scene is split finely for live playback and
+        on_part(index, total, path) is called from the render threads as each
+        part finishes (in any order).
+
+        Scenes the native renderer supports are drawn without Manim (as one
+        part), falling back to Manim if that fails.
         """
+        self.warm_up()
+        if self.native_supported(manim_code):
+            rendered = self._render_native(manim_code, scene_name)
+            if rendered:
+                if on_part:
+                    on_part(0, 1, Path(rendered[0]))
+                return rendered
+        return self._render_with_manim(manim_code, scene_name, on_part)
+
+    def _render_with_manim(self, manim_code: str, scene_name: str,
+                           on_part: Optional[Callable[[int, int, Path], None]] = None) -> Tuple[str, float, int]:
+        """render_animation through the Manim CLI only"""
         # Create temporary directory for this render
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
@@ -37,90 +83,219 @@ class ManimRenderer:
             with open(script_path, 'w') as f:
                 f.write(updated_code)
             
+            progress = current_progress()
+            if progress:
+                progress.begin_render(animation_timeline(updated_code, scene_name))
+            
             try:
-                # Run Manim command with Windows compatibility
-                cmd = [
-                    "manim",
-                    str(script_path),
-                    scene_name,
-                    "--format", "mp4",
-                    "--media_dir", str(self.output_dir),
-                    "--quality", "l",  # Low quality for speed
-                    "--disable_caching"  # Ensure fresh render
-                ]
-                
-                # Windows-specific: Use shell=True if needed
-                use_shell = os.name == 'nt'
-                
-                # On Windows, ensure we use the correct command format
-                if use_shell:
-                    # Join command for Windows shell
-                    cmd_str = ' '.join(f'"{arg}"' if ' ' in arg else arg for arg in cmd)
-                    result = subprocess.run(
-                        cmd_str,
-                        capture_output=True,
-                        text=True,
-                        timeout=MAX_VIDEO_DURATION + 60,
-                        shell=True
-                    )
+                # Long scenes render as parallel animation ranges, then get stitched
+                segments = self._plan_segments(updated_code, scene_name, live=on_part is not None)
+                if len(segments) > 1:
+                    video_path = self._render_segments(script_path, scene_name, segments, temp_path, on_part)
                 else:
-                    result = subprocess.run(
-                        cmd,
-                        capture_output=True,
-                        text=True,
-                        timeout=MAX_VIDEO_DURATION + 60,
-                        shell=False
-                    )
-                
-                if result.returncode != 0:
-                    error_msg = f"Manim rendering failed (exit code {result.returncode}):\n"
-                    error_msg += f"STDOUT: {result.stdout}\n"
-                    error_msg += f"STDERR: {result.stderr}\n"
-                    error_msg += f"Platform: {os.name}\n"
-                    error_msg += f"Command: {' '.join(cmd)}\n"
+                    # Run Manim command with Windows compatibility
+                    cmd = [
+                        "manim",
+                        str(script_path),
+                        scene_name,
+                        "--format", "mp4",
+                        "--media_dir", str(self.output_dir),
+                        "--quality", "l",  # Low quality for speed
+                        "--disable_caching"  # Ensure fresh render
+                    ]
                     
-                    # Windows-specific troubleshooting hints
-                    if os.name == 'nt':
-                        error_msg += "\nWindows troubleshooting:\n"
-                        error_msg += "- Make sure FFmpeg is installed and in PATH\n"
-                        error_msg += "- Install LaTeX (MiKTeX recommended)\n"
-                        error_msg += "- Check if antivirus is blocking subprocess calls\n"
-                        error_msg += "- Try running as administrator if permission issues\n"
+                    with metrics.stage("manim_render"):
+                        self._run_manim(cmd)
                     
-                    raise Exception(error_msg)
-                
-                # Find the generated video file
-                video_path = self._find_video_file(scene_name)
-                if not video_path:
-                    raise Exception("Video file not found after rendering")
+                    # Find the generated video file
+                    video_path = self._find_video_file(scene_name)
+                    if not video_path:
+                        raise Exception("Video file not found after rendering")
+                    if on_part:
+                        on_part(0, 1, video_path)
                 
                 # Get video metadata
                 duration = self._get_video_duration(video_path)
                 file_size = video_path.stat().st_size
+                artifact_catalog.record(
+                    "video", video_path,
+                    source_hash=content_hash(manim_code),
+                    scene_name=scene_name,
+                    duration=duration,
+                    file_size=file_size
+                )
                 
                 return str(video_path), duration, file_size
                 
+            except RenderLimitExceeded:
+                # Keeps its classification for the error response
+                raise
             except subprocess.TimeoutExpired:
                 raise Exception("Manim rendering timed out")
             except Exception as e:
                 raise Exception(f"Failed to render animation: {str(e)}")
     
-    def _find_video_file(self, scene_name: str) -> Optional[Path]:
+    def render_with_narration(self, manim_code: str, scene_name: str, audio_path: Optional[str] = None,
+                              on_part: Optional[Callable[[int, int, Path], None]] = None) -> str:
+        """
+        Render the scene with its narration and return the video path. Natively
+        rendered scenes get the audio muxed in the same encode; others are
+        rendered (with `on_part` as in render_animation) and then combined.
+        """
+        if audio_path and on_part is None and self.native_supported(manim_code):
+            self.warm_up()
+            mux_audio_path, audio_duration = self.mux_ready_audio(audio_path)
+            rendered = self._render_native(manim_code, scene_name, mux_audio_path, audio_duration)
+            if rendered:
+                return rendered[0]
+            # Native already failed for this code; don't let render_animation try it again
+            video_path, _, _ = self._render_with_manim(manim_code, scene_name, on_part)
+        else:
+            video_path, _, _ = self.render_animation(manim_code, scene_name, on_part)
+        if audio_path:
+            video_path = self.combine_video_audio(video_path, audio_path)
+        return video_path
+
+    def native_supported(self, manim_code: str) -> bool:
+        """Whether render_animation will try the native renderer for this code"""
+        return self.native is not None and self.native.supports(manim_code)
+
+    def _render_native(self, manim_code: str, scene_name: str, audio_path: Optional[str] = None,
+                       audio_duration: float = 0.0) -> Optional[Tuple[str, float, int]]:
+        """
+        Draw the scene with the native renderer, muxing `audio_path` if given.
+        Returns None if that fails, so the caller can fall back to Manim.
+        """
+        output_path = self.output_dir / "videos" / "animation" / "480p15" / f"{scene_name}.mp4"
+        progress = current_progress()
+        if progress:
+            # Under its render name, as render_animation does, so the timeline finds the class
+            updated_code = self._update_scene_name_in_code(manim_code, scene_name)
+            progress.begin_render(animation_timeline(updated_code, scene_name))
+        try:
+            with metrics.stage("native_render"):
+                with atomic_path(output_path) as temp_path:
+                    duration = self.native.render(
+                        manim_code, temp_path, audio_path, audio_duration,
+                        on_animation=progress.complete_animation if progress else None
+                    )
+        except Exception as e:
+            print(f"Native render failed, falling back to Manim: {e}")
+            return None
+        file_size = output_path.stat().st_size
+        artifact_catalog.record(
+            "video", output_path,
+            source_hash=content_hash(manim_code),
+            scene_name=scene_name,
+            audio_path=os.path.abspath(audio_path) if audio_path else None,
+            duration=duration,
+            file_size=file_size
+        )
+        return str(output_path), duration, file_size
+
+    def _run_manim(self, cmd: List[str]) -> SandboxResult:
+        """
+        Run a manim command in the render sandbox, raising with diagnostics if
+        it fails. Its output feeds the current render's progress, if tracked.
+        """
+        progress = current_progress()
+        with _manim_slots:
+            result = run_sandboxed(cmd, timeout=MAX_VIDEO_DURATION + 60,
+                                   on_line=progress.observe if progress else None)
+
+        if result.limit:
+            metrics.failures.inc(stage="manim_render")
+            raise RenderLimitExceeded(result.limit, result.output)
+
+        if result.returncode != 0:
+            metrics.failures.inc(stage="manim_render")
+            error_msg = f"Manim rendering failed (exit code {result.returncode}):\n"
+            error_msg += f"OUTPUT: {result.output}\n"
+            error_msg += f"Platform: {os.name}\n"
+            error_msg += f"Command: {' '.join(cmd)}\n"
+            
+            # Windows-specific troubleshooting hints
+            if os.name == 'nt':
+                error_msg += "\nWindows troubleshooting:\n"
+                error_msg += "- Make sure FFmpeg is installed and in PATH\n"
+                error_msg += "- Install LaTeX (MiKTeX recommended)\n"
+                error_msg += "- Check if antivirus is blocking subprocess calls\n"
+                error_msg += "- Try running as administrator if permission issues\n"
+            
+            raise Exception(error_msg)
+        return result
+
+    def _plan_segments(self, code: str, scene_name: str, live: bool = False) -> List[Tuple[int, Optional[int]]]:
+        """
+        Animation-number ranges to render in parallel; a single open range means
+        render serially. Live renders split even without spare workers, since
+        a short first part is what lets playback start early.
+        """
+        if RENDER_SEGMENT_WORKERS < 2 and not live:
+            return [(0, None)]
+        timeline = animation_timeline(code, scene_name)
+        if not timeline:
+            return [(0, None)]
+        if live:
+            return plan_segments(timeline, LIVE_MAX_SEGMENTS, LIVE_MIN_SEGMENT_SECONDS)
+        return plan_segments(timeline, RENDER_SEGMENT_WORKERS, RENDER_MIN_SEGMENT_SECONDS)
+
+    def _render_segments(self, script_path: Path, scene_name: str,
+                         segments: List[Tuple[int, Optional[int]]], temp_path: Path,
+                         on_part: Optional[Callable[[int, int, Path], None]] = None) -> Path:
+        """
+        Render each animation range in its own Manim process and stitch the
+        parts with a stream-copy concat. Every process runs construct() in
+        full, so objects built by earlier animations exist in later segments;
+        Manim just skips writing frames outside the requested range (-n).
+        """
+        def render_segment(index: int, start: int, end: Optional[int]) -> Path:
+            media_dir = temp_path / f"segment_{index}"
+            cmd = [
+                "manim",
+                str(script_path),
+                scene_name,
+                "--format", "mp4",
+                "--media_dir", str(media_dir),
+                "--quality", "l",
+                "--disable_caching",
+                # Manim's upper bound is inclusive
+                "-n", f"{start},{end - 1}" if end is not None else str(start)
+            ]
+            self._run_manim(cmd)
+            part = self._find_video_file(scene_name, media_dir)
+            if not part:
+                raise Exception(f"Video file not found for segment {index}")
+            if on_part:
+                on_part(index, len(segments), part)
+            return part
+
+        with metrics.stage("manim_render"):
+            with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+                # Each part runs in the caller's context so it reports to the same render progress
+                futures = [pool.submit(contextvars.copy_context().run, render_segment, i, start, end)
+                           for i, (start, end) in enumerate(segments)]
+                parts = [future.result() for future in futures]
+
+        output_path = self.output_dir / "videos" / "animation" / "480p15" / f"{scene_name}.mp4"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with metrics.stage("concat"):
+            self._concat_files(parts, output_path, stream_copy=True)
+        return output_path
+
+    def _find_video_file(self, scene_name: str, media_root: Optional[Path] = None) -> Optional[Path]:
         """Find the generated video file"""
         # Manim creates files in output/videos/script_name/quality/
-        media_dir = self.output_dir / "videos" / "animation"
+        media_dir = (media_root or self.output_dir) / "videos" / "animation"
         
-        if not media_dir.exists():
-            return None
-            
-        # Look for the video file in different quality directories
+        # Renders use --quality l, so the file is almost always in 480p15;
+        # check exact paths rather than globbing directories
         quality_dirs = ["480p15", "720p30", "1080p60"]
         
         for quality in quality_dirs:
-            quality_dir = media_dir / quality
-            if quality_dir.exists():
-                for file in quality_dir.glob(f"{scene_name}.mp4"):
-                    return file
+            candidate = media_dir / quality / f"{scene_name}.mp4"
+            if candidate.exists():
+                return candidate
                     
         return None
     
@@ -135,7 +310,8 @@ class ManimRenderer:
                 str(video_path)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            with metrics.stage("ffprobe"):
+                result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode == 0:
                 return float(result.stdout.strip())
             else:
@@ -148,15 +324,11 @@ class ManimRenderer:
     def cleanup_old_videos(self, max_age_hours: int = 24):
         """Clean up old video files to save disk space"""
         try:
-            media_dir = self.output_dir / "media"
-            if not media_dir.exists():
-                return
-                
             cutoff_time = time.time() - (max_age_hours * 3600)
             
-            for video_file in media_dir.rglob("*.mp4"):
-                if video_file.stat().st_mtime < cutoff_time:
-                    video_file.unlink()
+            for artifact in artifact_catalog.older_than(cutoff_time, kinds=["video", "lesson"]):
+                Path(artifact["path"]).unlink(missing_ok=True)
+                artifact_catalog.remove(artifact["path"])
                     
         except Exception as e:
             print(f"Warning: Failed to cleanup old videos: {e}")
@@ -167,12 +339,12 @@ class ManimRenderer:
         import time
         
         match = re.search(r'class\s+(\w+)\s*\([^)]*Scene[^)]*\)', code)
+        # Timestamp plus a random suffix so concurrent renders never share output files
+        suffix = f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}"
         if match:
             base_name = match.group(1)
-            # Add timestamp to make it unique
-            unique_name = f"{base_name}_{int(time.time() * 1000)}"
-            return unique_name
-        return f"Explanation_{int(time.time() * 1000)}"  # Default fallback with timestamp
+            return f"{base_name}_{suffix}"
+        return f"Explanation_{suffix}"  # Default fallback
     
     def _update_scene_name_in_code(self, code: str, new_scene_name: str) -> str:
         """Update the scene class name in the code"""
@@ -185,7 +357,8 @@ class ManimRenderer:
     def validate_manim_code(self, code: str) -> Tuple[bool, str]:
         """Validate Manim code syntax before rendering"""
         try:
-            compile(code, '<string>', 'exec')
+            with metrics.stage("validate"):
+                compile(code, '<string>', 'exec')
             return True, "Code is valid"
         except SyntaxError as e:
             return False, f"Syntax error: {str(e)}"
@@ -204,10 +377,16 @@ class ManimRenderer:
         Returns:
             Path to the combined video file
         """
+        progress = current_progress()
+        if progress:
+            progress.set_stage("muxing")
         try:
+            # Mux from the cached AAC rendition so the audio is stream copied
+            audio_path, audio_duration = self.mux_ready_audio(audio_path)
+            audio_codec = ['-c:a', 'copy'] if Path(audio_path).suffix == ".m4a" else ['-c:a', 'aac']
+            
             # Get durations
             video_duration = self._get_video_duration(Path(video_path))
-            audio_duration = self._get_audio_duration(Path(audio_path))
             
             print(f"Video duration: {video_duration}s, Audio duration: {audio_duration}s")
             
@@ -222,7 +401,7 @@ class ManimRenderer:
                     '-i', video_path,
                     '-i', audio_path,
                     '-c:v', 'libx264',
-                    '-c:a', 'aac',
+                    *audio_codec,
                     '-filter_complex', f'[0:v]tpad=stop_mode=clone:stop_duration={audio_duration - video_duration}[v]',
                     '-map', '[v]',
                     '-map', '1:a',
@@ -236,21 +415,30 @@ class ManimRenderer:
                     '-i', video_path,
                     '-i', audio_path,
                     '-c:v', 'copy',
-                    '-c:a', 'aac',
+                    *audio_codec,
                     '-shortest',
                     '-y',
                     str(output_path)
                 ]
             
             print(f"Combining video and audio: {video_path} + {audio_path}")
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            with metrics.stage("mux"):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
             
             if result.returncode == 0 and output_path.exists():
                 print(f"Successfully combined video and audio")
                 # Replace original video with the one that has audio
                 shutil.move(str(output_path), video_path)
+                artifact_catalog.record(
+                    "video", video_path,
+                    audio_path=os.path.abspath(audio_path),
+                    # Padded out to the audio, or cut to it by -shortest
+                    duration=audio_duration,
+                    file_size=Path(video_path).stat().st_size
+                )
                 return video_path
             else:
+                metrics.failures.inc(stage="mux")
                 print(f"FFmpeg failed: {result.stderr}")
                 return video_path  # Return original video if combination fails
                 
@@ -258,6 +446,55 @@ class ManimRenderer:
             print(f"Error combining video and audio: {e}")
             return video_path  # Return original video if combination fails
     
+    def mux_ready_audio(self, audio_path: str) -> Tuple[str, float]:
+        """
+        AAC (.m4a) rendition of a narration clip and its duration.
+
+        ElevenLabs returns MP3, which every mux would otherwise transcode
+        again. The rendition is made once per clip and recorded on the clip's
+        catalog entry with its duration, so later muxes stream copy the audio
+        and skip the duration probe. If transcoding fails, the original clip
+        is returned.
+        """
+        artifact = artifact_catalog.get(audio_path) or {}
+        metadata = artifact.get("metadata") or {}
+        aac_path = metadata.get("aac_path")
+        if aac_path and artifact.get("duration") and Path(aac_path).exists():
+            metrics.cache_hit("audio_aac")
+            return aac_path, artifact["duration"]
+        metrics.cache_miss("audio_aac")
+
+        aac_path = str(Path(audio_path).with_suffix(".m4a"))
+        try:
+            with atomic_path(aac_path) as temp_path:
+                cmd = [
+                    'ffmpeg',
+                    '-i', audio_path,
+                    '-vn',
+                    '-c:a', 'aac',
+                    '-b:a', '128k',
+                    '-movflags', '+faststart',
+                    '-y',
+                    str(temp_path)
+                ]
+                with metrics.stage("audio_transcode"):
+                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+                # Raising here makes atomic_path discard a partial file instead of publishing it
+                if result.returncode != 0 or not temp_path.exists():
+                    raise RuntimeError(f"ffmpeg exited with {result.returncode}: {result.stderr[-500:]}")
+        except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+            metrics.failures.inc(stage="audio_transcode")
+            print(f"AAC transcode failed, muxing the original clip: {e}")
+            return audio_path, self._get_audio_duration(Path(audio_path))
+
+        duration = self._get_audio_duration(Path(aac_path))
+        artifact_catalog.record(
+            "audio", audio_path,
+            duration=duration,
+            metadata={**metadata, "aac_path": os.path.abspath(aac_path)}
+        )
+        return aac_path, duration
+
     def _get_audio_duration(self, audio_path: Path) -> float:
         """Get audio duration using ffprobe"""
         try:
@@ -269,7 +506,8 @@ class ManimRenderer:
                 str(audio_path)
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            with metrics.stage("ffprobe"):
+                result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode == 0:
                 return float(result.stdout.strip())
             else:
@@ -277,3 +515,187 @@ class ManimRenderer:
                 
         except Exception:
             return 5.0  # Default fallback
+
+    def _probe_streams(self, path: Path) -> Optional[tuple]:
+        """Stream parameters that must match across clips for a stream-copy concat"""
+        cmd = [
+            "ffprobe",
+            "-v", "quiet",
+            "-show_entries", "stream=codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,sample_rate,channels",
+            "-of", "json",
+            str(path)
+        ]
+        try:
+            with metrics.stage("ffprobe"):
+                result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                return None
+            streams = json.loads(result.stdout).get("streams", [])
+            return tuple(sorted(tuple(sorted(stream.items())) for stream in streams))
+        except Exception:
+            return None
+
+    def _has_audio(self, path: Path) -> bool:
+        signature = self._probe_streams(path)
+        return bool(signature) and any(("codec_type", "audio") in stream for stream in signature)
+
+    def add_silent_audio(self, video_path: str, output_path: Path) -> str:
+        """
+        Copy of a video without narration with a silent AAC track added, so it
+        concatenates with narrated clips. The source is left untouched, since
+        rendered clips are shared through the catalog.
+        """
+        with atomic_path(output_path) as temp_path:
+            cmd = [
+                'ffmpeg',
+                '-i', video_path,
+                '-f', 'lavfi', '-i', 'anullsrc=channel_layout=mono:sample_rate=44100',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-shortest',
+                '-y',
+                str(temp_path)
+            ]
+            with metrics.stage("mux"):
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            if result.returncode != 0 or not temp_path.exists():
+                metrics.failures.inc(stage="mux")
+                raise Exception(f"Failed to add silent audio: {result.stderr}")
+        return str(output_path)
+
+    def clips_hash(self, video_paths: List[str], titles: List[str], *extra: Optional[str]) -> str:
+        """Source hash of a video joined from `video_paths`, from what each clip was rendered from"""
+        clip_hashes = []
+        for path in video_paths:
+            artifact = artifact_catalog.get(path) or {}
+            # An uncatalogued clip is identified by its path
+            clip_hashes.append(artifact.get("source_hash") or os.path.abspath(path))
+        return content_hash(*extra, *clip_hashes, *titles)
+
+    def concat_videos(self, video_paths: List[str], titles: List[str],
+                      output_path: Path, source_hash: Optional[str] = None) -> Tuple[str, float, int, List[dict]]:
+        """
+        Join clips into one video with a chapter per clip.
+
+        Clips rendered by this pipeline share codec parameters, so they are
+        joined with a stream copy (no re-encode). If any clip differs, the
+        join falls back to re-encoding. The result is catalogued under
+        `source_hash`, by default a hash of the clips' own source hashes
+        and the titles.
+
+        Returns path, duration, file size and the chapter list.
+        """
+        # Hashed before any clip is swapped for a temporary copy
+        source_hash = source_hash or self.clips_hash(video_paths, titles)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Clips without narration are joined from a silent-audio copy
+            video_paths = [
+                path if self._has_audio(Path(path))
+                else self.add_silent_audio(path, Path(temp_dir) / f"silent_{index}{Path(path).suffix}")
+                for index, path in enumerate(video_paths)
+            ]
+
+            durations = [self._get_video_duration(Path(path)) for path in video_paths]
+            signatures = {self._probe_streams(Path(path)) for path in video_paths}
+            stream_copy = len(signatures) == 1 and None not in signatures
+
+            chapters = []
+            start = 0.0
+            for index, (title, duration) in enumerate(zip(titles, durations)):
+                chapters.append({
+                    "index": index,
+                    "title": title,
+                    "start_time": round(start, 3),
+                    "end_time": round(start + duration, 3),
+                })
+                start += duration
+
+            metadata_path = Path(temp_dir) / "chapters.txt"
+            with open(metadata_path, 'w') as f:
+                f.write(";FFMETADATA1\n")
+                for chapter in chapters:
+                    f.write("[CHAPTER]\nTIMEBASE=1/1000\n")
+                    f.write(f"START={int(chapter['start_time'] * 1000)}\n")
+                    f.write(f"END={int(chapter['end_time'] * 1000)}\n")
+                    f.write(f"title={_escape_ffmetadata(chapter['title'])}\n")
+
+            with metrics.stage("concat"):
+                self._concat_files([Path(p) for p in video_paths], output_path, stream_copy, metadata_path)
+
+        file_size = output_path.stat().st_size
+        artifact_catalog.record(
+            "lesson", output_path,
+            source_hash=source_hash,
+            duration=start,
+            file_size=file_size,
+            metadata={"chapters": chapters}
+        )
+        return str(output_path), start, file_size, chapters
+
+    def _concat_files(self, video_paths: List[Path], output_path: Path, stream_copy: bool = True,
+                      metadata_path: Optional[Path] = None):
+        """Join videos with the ffmpeg concat demuxer, optionally taking chapters from an FFMETADATA file"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            list_path = Path(temp_dir) / "clips.txt"
+            with open(list_path, 'w') as f:
+                for path in video_paths:
+                    escaped = str(Path(path).resolve()).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+
+            cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', str(list_path)]
+            if metadata_path:
+                cmd += ['-i', str(metadata_path), '-map', '0', '-map_metadata', '1', '-map_chapters', '1']
+            cmd += ['-c', 'copy'] if stream_copy else ['-c:v', 'libx264', '-c:a', 'aac']
+            cmd += ['-movflags', '+faststart', '-y', str(output_path)]
+
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=MAX_VIDEO_DURATION + 60)
+            if result.returncode != 0 or not output_path.exists():
+                metrics.failures.inc(stage="concat")
+                raise Exception(f"Failed to join video clips: {result.stderr}")
+
+    def package_live_segment(self, part_path: Path, output_path: Path, offset: float,
+                             audio_path: Optional[str] = None, audio_duration: float = 0.0,
+                             last: bool = False) -> float:
+        """
+        Remux a rendered part into an MPEG-TS segment timed from `offset`
+        seconds, carrying the matching slice of the narration (or silence once
+        the narration has ended). Video is stream copied, except that the last
+        part is re-encoded when it has to hold its final frame until the
+        narration finishes, as combine_video_audio does for the full video.
+
+        Returns the segment duration.
+        """
+        duration = self._get_video_duration(part_path)
+        pad = 0.0
+        cmd = ['ffmpeg', '-i', str(part_path)]
+        if audio_path:
+            if offset < audio_duration:
+                cmd += ['-ss', f'{offset:.3f}']
+                if last:
+                    pad = max(0.0, audio_duration - offset - duration)
+                else:
+                    cmd += ['-t', f'{duration:.3f}']
+                cmd += ['-i', audio_path]
+            else:
+                cmd += ['-f', 'lavfi', '-t', f'{duration:.3f}', '-i', 'anullsrc=channel_layout=mono:sample_rate=44100']
+            # Every segment gets the same audio layout so players can switch between them
+            cmd += ['-map', '0:v', '-map', '1:a', '-c:a', 'aac', '-ac', '1', '-ar', '44100']
+        if pad:
+            cmd += ['-vf', f'tpad=stop_mode=clone:stop_duration={pad:.3f}', '-c:v', 'libx264']
+        else:
+            cmd += ['-c:v', 'copy']
+        cmd += ['-output_ts_offset', f'{offset:.3f}', '-f', 'mpegts', '-y', str(output_path)]
+
+        with metrics.stage("live_segment"):
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0 or not output_path.exists():
+            raise Exception(f"Failed to package live segment: {result.stderr}")
+        return duration + pad
+
+
+def _escape_ffmetadata(value: str) -> str:
+    """Escape the characters FFMETADATA treats specially"""
+    for ch in ("\\", "=", ";", "#", "\n"):
+        value = value.replace(ch, "\\" + ch)
+    return value
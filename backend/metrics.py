@@ -0,0 +1,161 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds. Spans quick parses (ms) through long Manim renders (minutes).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# Estimated input tokens per prompt
+TOKEN_BUCKETS = (64, 128, 256, 384, 512, 768, 1024, 1536, 2048, 4096)
+
+# Stage timings collected for the current request, echoed as Server-Timing
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: Optional[dict] = None) -> str:
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> (per-bucket counts, sum, count)
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Metrics:
+    """Process-wide stage latency histograms and event counters"""
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "ai_tutor_stage_seconds", "Time spent in each pipeline stage"
+        )
+        self.request_seconds = Histogram(
+            "ai_tutor_request_seconds", "End-to-end request latency by endpoint"
+        )
+        self.cache_hits = Counter("ai_tutor_cache_hits_total", "Cache hits by cache name")
+        self.cache_misses = Counter("ai_tutor_cache_misses_total", "Cache misses by cache name")
+        self.retries = Counter("ai_tutor_retries_total", "Retried operations by stage")
+        self.failures = Counter("ai_tutor_failures_total", "Failed operations by stage")
+        self.hedges = Counter("ai_tutor_hedges_total", "Hedged LLM requests by outcome (sent, won, skipped)")
+        self.prefetches = Counter(
+            "ai_tutor_prefetches_total", "Background mind map prefetches by outcome (fetched, dropped, failed)"
+        )
+        self.prompt_tokens = Histogram(
+            "ai_tutor_prompt_tokens", "Estimated input tokens per rendered prompt template", TOKEN_BUCKETS
+        )
+        self.parse_failures = Counter(
+            "ai_tutor_parse_failures_total", "Model replies that failed structured parsing, by method"
+        )
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage, count it as failed if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failures.inc(stage=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stage_seconds.observe(elapsed, stage=name)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((name, elapsed))
+
+    def cache_hit(self, cache: str):
+        self.cache_hits.inc(cache=cache)
+
+    def cache_miss(self, cache: str):
+        self.cache_misses.inc(cache=cache)
+
+    def retry(self, stage: str):
+        self.retries.inc(stage=stage)
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for metric in (self.stage_seconds, self.request_seconds, self.cache_hits,
+                       self.cache_misses, self.retries, self.failures, self.parse_failures,
+                       self.prompt_tokens, self.hedges, self.prefetches):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    """Begin collecting stage timings for the current request context"""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    """Format collected timings as a Server-Timing header value (ms)"""
+    merged: Dict[str, float] = {}
+    for name, elapsed in timings:
+        merged[name] = merged.get(name, 0.0) + elapsed
+    parts = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in merged.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# Global instance
+metrics = Metrics()
@@ -0,0 +1,346 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from config import MIND_MAP_LAYOUT
+
+# Canvas placement, matching where the frontend has always put the main topic
+ROOT_X = 400.0
+ROOT_Y = 300.0
+LEVEL_GAP = 320.0      # horizontal distance between levels in the tidy layout
+NODE_SPACING = 150.0   # minimum distance between neighbouring nodes
+RADIAL_GAP = 180.0     # radius step per level in the radial layout
+
+
+class _LayoutNode:
+    """Working state for one node in Buchheim's tidy tree algorithm"""
+    __slots__ = ("id", "parent", "children", "index", "depth", "x", "mod",
+                 "thread", "ancestor", "change", "shift")
+
+    def __init__(self, node_id: str, parent: Optional["_LayoutNode"], index: int, depth: int):
+        self.id = node_id
+        self.parent = parent
+        self.children: List["_LayoutNode"] = []
+        self.index = index  # position among siblings
+        self.depth = depth
+        self.x = 0.0
+        self.mod = 0.0
+        self.thread: Optional["_LayoutNode"] = None
+        self.ancestor = self
+        self.change = 0.0
+        self.shift = 0.0
+
+    def left(self) -> Optional["_LayoutNode"]:
+        return self.thread or (self.children[0] if self.children else None)
+
+    def right(self) -> Optional["_LayoutNode"]:
+        return self.thread or (self.children[-1] if self.children else None)
+
+    def left_brother(self) -> Optional["_LayoutNode"]:
+        return self.parent.children[self.index - 1] if self.parent and self.index > 0 else None
+
+    def leftmost_sibling(self) -> Optional["_LayoutNode"]:
+        if self.parent and self.index > 0:
+            return self.parent.children[0]
+        return None
+
+
+def build_tree(nodes: List[dict], max_depth: Optional[int] = None,
+               max_branches: Optional[int] = None) -> Tuple[Optional[_LayoutNode], List[_LayoutNode]]:
+    """
+    Build the layout tree from flat node dicts in O(n).
+
+    The main topic (or the first node) is the root; nodes with a missing or
+    unknown parent hang off the root. Children beyond max_branches and nodes
+    deeper than max_depth are dropped. Returns the root and the kept nodes in
+    breadth-first order.
+    """
+    if not nodes:
+        return None, []
+
+    root_data = next((n for n in nodes if n.get('is_main_topic')), nodes[0])
+    known_ids = {n['id'] for n in nodes}
+    children_of: Dict[str, List[str]] = {}
+    for n in nodes:
+        if n is root_data:
+            continue
+        parent_id = n.get('parent_id')
+        if parent_id not in known_ids or parent_id == n['id']:
+            parent_id = root_data['id']
+        children_of.setdefault(parent_id, []).append(n['id'])
+
+    root = _LayoutNode(root_data['id'], None, 0, 0)
+    ordered = [root]
+    seen = {root.id}
+    head = 0
+    while head < len(ordered):
+        parent = ordered[head]
+        head += 1
+        if max_depth is not None and parent.depth >= max_depth:
+            continue
+        child_ids = [c for c in children_of.get(parent.id, []) if c not in seen]
+        if max_branches is not None:
+            child_ids = child_ids[:max_branches]
+        for i, child_id in enumerate(child_ids):
+            seen.add(child_id)
+            child = _LayoutNode(child_id, parent, i, parent.depth + 1)
+            parent.children.append(child)
+            ordered.append(child)
+
+    return root, ordered
+
+
+def _move_subtree(wl: _LayoutNode, wr: _LayoutNode, shift: float):
+    subtrees = wr.index - wl.index
+    wr.change -= shift / subtrees
+    wr.shift += shift
+    wl.change += shift / subtrees
+    wr.x += shift
+    wr.mod += shift
+
+
+def _execute_shifts(v: _LayoutNode):
+    shift = change = 0.0
+    for w in reversed(v.children):
+        w.x += shift
+        w.mod += shift
+        change += w.change
+        shift += w.shift + change
+
+
+def _ancestor(vil: _LayoutNode, v: _LayoutNode, default_ancestor: _LayoutNode) -> _LayoutNode:
+    return vil.ancestor if vil.ancestor.parent is v.parent else default_ancestor
+
+
+def _apportion(v: _LayoutNode, default_ancestor: _LayoutNode, distance: float) -> _LayoutNode:
+    """Push v's subtree right until its left contour clears its left siblings"""
+    w = v.left_brother()
+    if w is None:
+        return default_ancestor
+
+    vir = vor = v
+    vil = w
+    vol = v.leftmost_sibling()
+    sir = sor = v.mod
+    sil = vil.mod
+    sol = vol.mod
+    while vil.right() and vir.left():
+        vil = vil.right()
+        vir = vir.left()
+        vol = vol.left()
+        vor = vor.right()
+        vor.ancestor = v
+        shift = (vil.x + sil) - (vir.x + sir) + distance
+        if shift > 0:
+            _move_subtree(_ancestor(vil, v, default_ancestor), v, shift)
+            sir += shift
+            sor += shift
+        sil += vil.mod
+        sir += vir.mod
+        sol += vol.mod
+        sor += vor.mod
+
+    if vil.right() and not vor.right():
+        vor.thread = vil.right()
+        vor.mod += sil - sor
+    else:
+        if vir.left() and not vol.left():
+            vol.thread = vir.left()
+            vol.mod += sir - sol
+        default_ancestor = v
+    return default_ancestor
+
+
+def _place(v: _LayoutNode, distance: float):
+    """Position v relative to its children and left sibling (children already placed)"""
+    brother = v.left_brother()
+    if not v.children:
+        v.x = brother.x + distance if brother else 0.0
+        return
+
+    _execute_shifts(v)
+    midpoint = (v.children[0].x + v.children[-1].x) / 2
+    if brother:
+        v.x = brother.x + distance
+        v.mod = v.x - midpoint
+    else:
+        v.x = midpoint
+
+
+def tidy_positions(root: _LayoutNode, distance: float = 1.0) -> Dict[str, Tuple[float, int]]:
+    """
+    Buchheim et al.'s linear-time Reingold-Tilford layout.
+
+    Returns node id -> (breadth offset, depth). Siblings are at least
+    `distance` apart and no two subtrees overlap. Both walks are iterative so
+    very deep trees don't hit the recursion limit.
+    """
+    # First walk: post-order, apportioning each child as soon as it is placed
+    stack = [(root, 0)]
+    default_ancestors: Dict[int, _LayoutNode] = {}
+    while stack:
+        v, i = stack.pop()
+        if i < len(v.children):
+            stack.append((v, i + 1))
+            stack.append((v.children[i], 0))
+            continue
+        _place(v, distance)
+        if v.parent is not None:
+            parent_key = id(v.parent)
+            default_ancestor = default_ancestors.get(parent_key, v.parent.children[0])
+            default_ancestors[parent_key] = _apportion(v, default_ancestor, distance)
+            if v.index == len(v.parent.children) - 1:
+                default_ancestors.pop(parent_key, None)
+
+    # Second walk: pre-order, accumulating modifiers into final offsets
+    positions: Dict[str, Tuple[float, int]] = {}
+    walk = [(root, 0.0)]
+    while walk:
+        v, m = walk.pop()
+        positions[v.id] = (v.x + m, v.depth)
+        for w in v.children:
+            walk.append((w, m + v.mod))
+    return positions
+
+
+def radial_positions(root: _LayoutNode, ordered: List[_LayoutNode]) -> Dict[str, Tuple[float, float]]:
+    """
+    Radial layout: each subtree gets an angular wedge proportional to its leaf
+    count, and each level sits on a ring. The rings are pushed out far enough
+    that neighbouring nodes on the same ring are at least NODE_SPACING apart.
+    """
+    leaves: Dict[int, int] = {}
+    for v in reversed(ordered):
+        leaves[id(v)] = sum(leaves[id(c)] for c in v.children) or 1
+    total_leaves = leaves[id(root)]
+
+    # Neighbours on a ring are at least 2π/total_leaves radians apart
+    min_radius = total_leaves * NODE_SPACING / (2 * math.pi)
+    max_depth = ordered[-1].depth
+    radii = [0.0]
+    for depth in range(1, max_depth + 1):
+        radii.append(max(radii[-1] + RADIAL_GAP, min_radius if depth == 1 else 0.0))
+
+    positions = {root.id: (ROOT_X, ROOT_Y)}
+    wedges = {id(root): (0.0, 2 * math.pi)}
+    for v in ordered:
+        start, span = wedges[id(v)]
+        for child in v.children:
+            child_span = span * leaves[id(child)] / leaves[id(v)]
+            wedges[id(child)] = (start, child_span)
+            angle = start + child_span / 2
+            radius = radii[child.depth]
+            positions[child.id] = (ROOT_X + radius * math.cos(angle), ROOT_Y + radius * math.sin(angle))
+            start += child_span
+    return positions
+
+
+def layout_mind_map(nodes: List[dict], max_depth: Optional[int] = None,
+                    max_branches: Optional[int] = None, mode: str = MIND_MAP_LAYOUT) -> List[dict]:
+    """
+    Lay out a mind map in O(n).
+
+    Returns the kept nodes (see build_tree) in breadth-first order as copies
+    with x, y, level and children filled in. mode is "radial" (main topic in
+    the centre) or "tidy" (left-to-right tree).
+    """
+    root, ordered = build_tree(nodes, max_depth, max_branches)
+    if root is None:
+        return []
+
+    if mode == "tidy":
+        offsets = tidy_positions(root)
+        root_offset = offsets[root.id][0]
+        positions = {
+            node_id: (ROOT_X + depth * LEVEL_GAP, ROOT_Y + (offset - root_offset) * NODE_SPACING)
+            for node_id, (offset, depth) in offsets.items()
+        }
+    else:
+        positions = radial_positions(root, ordered)
+
+    by_id = {n['id']: n for n in nodes}
+    result = []
+    for v in ordered:
+        node = dict(by_id[v.id])
+        node['x'], node['y'] = positions[v.id]
+        node['level'] = v.depth
+        node['parent_id'] = v.parent.id if v.parent else None
+        node['children'] = [c.id for c in v.children]
+        result.append(node)
+    return result
+
+
+class SpatialIndex:
+    """Uniform grid over node positions for constant-time overlap checks"""
+
+    def __init__(self, min_distance: float = NODE_SPACING * 0.75):
+        self.min_distance = min_distance
+        self.cell = min_distance
+        self._grid: Dict[Tuple[int, int], List[Tuple[float, float]]] = {}
+
+    def _key(self, x: float, y: float) -> Tuple[int, int]:
+        return (int(math.floor(x / self.cell)), int(math.floor(y / self.cell)))
+
+    def add(self, x: float, y: float):
+        self._grid.setdefault(self._key(x, y), []).append((x, y))
+
+    def is_free(self, x: float, y: float) -> bool:
+        cx, cy = self._key(x, y)
+        limit = self.min_distance * self.min_distance
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for px, py in self._grid.get((gx, gy), ()):
+                    if (px - x) ** 2 + (py - y) ** 2 < limit:
+                        return False
+        return True
+
+
+def place_children(parent_xy: Tuple[float, float], origin_xy: Tuple[float, float], count: int,
+                   index: SpatialIndex, mode: str = MIND_MAP_LAYOUT,
+                   max_attempts: int = 48) -> List[Tuple[float, float]]:
+    """
+    Position `count` new children of an existing node without touching the rest of the map.
+
+    Children fan out away from origin_xy (the parent's own parent, or the
+    root) and the fan is rotated or pushed outward until it clears every
+    node already in `index`. Cost is O(count) per attempt, independent of
+    map size. Placed positions are added to the index.
+    """
+    if count <= 0:
+        return []
+
+    px, py = parent_xy
+    ox, oy = origin_xy
+
+    if mode == "tidy":
+        # Vertical stack one level to the right, slid up/down until it fits
+        x = px + LEVEL_GAP
+        base = [py + (i - (count - 1) / 2) * NODE_SPACING for i in range(count)]
+        for attempt in range(max_attempts):
+            offset = ((attempt + 1) // 2) * NODE_SPACING * (1 if attempt % 2 else -1)
+            candidate = [(x, y + offset) for y in base]
+            if all(index.is_free(cx, cy) for cx, cy in candidate):
+                break
+    else:
+        outward = math.atan2(py - oy, px - ox) if (px, py) != (ox, oy) else 0.0
+        radius = RADIAL_GAP
+        for attempt in range(max_attempts):
+            # Every 8 failed rotations, move the fan one ring further out
+            ring, turn = divmod(attempt, 8)
+            r = radius + ring * RADIAL_GAP / 2
+            step = 2 * math.asin(min(1.0, NODE_SPACING / (2 * r)))
+            if step * count > 2 * math.pi:
+                step = 2 * math.pi / count
+            rotation = ((turn + 1) // 2) * step * (1 if turn % 2 else -1)
+            centre = outward + rotation
+            candidate = [
+                (px + r * math.cos(centre + (i - (count - 1) / 2) * step),
+                 py + r * math.sin(centre + (i - (count - 1) / 2) * step))
+                for i in range(count)
+            ]
+            if all(index.is_free(cx, cy) for cx, cy in candidate):
+                break
+
+    # Even if every attempt collided, use the last candidate rather than fail
+    for cx, cy in candidate:
+        index.add(cx, cy)
+    return candidate
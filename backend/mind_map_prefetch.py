@@ -0,0 +1,106 @@
+import asyncio
+import contextvars
+import os
+from typing import List
+
+from starlette.concurrency import run_in_threadpool
+
+from config import (
+    MIND_MAP_PREFETCH_TOKENS_PER_MINUTE, MIND_MAP_PREFETCH_MAX_NODES, LIGHT_DEADLINE,
+)
+from admission import TokenBucket
+from deadlines import deadline_scope
+from gemini_client import SUMMARY_NAMESPACE, SUBTOPICS_NAMESPACE, node_cache_key
+from metrics import metrics
+from models import MindMapNode
+from prompts import prompts, estimate_tokens
+from shared_cache import shared_cache
+
+# Rough reply sizes, added to the prompt estimate when charging the budget
+_REPLY_TOKENS = {"summary": 120, "subtopics": 40}
+# Claims on in-flight prefetches, so workers don't fetch the same node twice
+_CLAIM_NAMESPACE = "mind_map_prefetch"
+# How long a prefetch may wait for the light pool to go idle before it is dropped
+_IDLE_WAIT_SECONDS = 30.0
+
+
+class SuggestionPrefetcher:
+    """
+    Warms the summary and subtopic caches for a new mind map's suggestion
+    nodes, which are nearly always what gets clicked next. Purely
+    opportunistic: it only takes a light-pool slot when no user request is
+    waiting and at least half the pool is free, spends at most
+    MIND_MAP_PREFETCH_TOKENS_PER_MINUTE estimated tokens, and drops whatever
+    doesn't fit rather than queueing behind real traffic.
+    """
+
+    def __init__(self, gemini, pool, tokens_per_minute: float = MIND_MAP_PREFETCH_TOKENS_PER_MINUTE,
+                 max_nodes: int = MIND_MAP_PREFETCH_MAX_NODES):
+        self.gemini = gemini
+        self.pool = pool
+        self.max_nodes = max_nodes
+        # Up to a minute's budget can be spent in one burst
+        self.budget = TokenBucket(rate=tokens_per_minute / 60.0, capacity=tokens_per_minute)
+        self._tasks = set()
+
+    def schedule(self, nodes: List[MindMapNode]):
+        """Start prefetching for the suggestion nodes among `nodes`; returns at once"""
+        titles = [node.title for node in nodes if node.is_suggestion and node.title][:self.max_nodes]
+        if not titles:
+            return
+        # A fresh context, so the map request's deadline and stage timings don't follow it
+        task = contextvars.Context().run(asyncio.create_task, self._prefetch(titles))
+        # Hold a reference so the task isn't collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _prefetch(self, titles: List[str]):
+        jobs = [(kind, title) for title in titles for kind in ("summary", "subtopics")]
+        for kind, title in jobs:
+            namespace = SUMMARY_NAMESPACE if kind == "summary" else SUBTOPICS_NAMESPACE
+            key = node_cache_key(title)
+            if shared_cache.get(namespace, key) is not None:
+                continue
+            if not await self._wait_for_idle():
+                metrics.prefetches.inc(outcome="dropped")
+                return
+            if self.budget.try_take(self._cost(kind, title)) > 0:
+                metrics.prefetches.inc(outcome="dropped")
+                return
+            if not shared_cache.add(_CLAIM_NAMESPACE, f"{kind}:{key}", os.getpid(), ttl=LIGHT_DEADLINE * 2):
+                continue
+            try:
+                async with self.pool.slot():
+                    await run_in_threadpool(self._fetch, kind, title)
+                metrics.prefetches.inc(outcome="fetched")
+            except Exception as e:
+                metrics.prefetches.inc(outcome="failed")
+                print(f"Warning: prefetching {kind} for {title!r} failed: {e}")
+            finally:
+                shared_cache.delete(_CLAIM_NAMESPACE, f"{kind}:{key}")
+
+    def _fetch(self, kind: str, title: str):
+        with deadline_scope(LIGHT_DEADLINE):
+            if kind == "summary":
+                self.gemini.generate_summary(title)
+            else:
+                self.gemini.generate_subtopics(title)
+
+    def _idle(self) -> bool:
+        return self.pool.waiting == 0 and self.pool.active * 2 < self.pool.max_concurrency
+
+    async def _wait_for_idle(self) -> bool:
+        waited = 0.0
+        while not self._idle():
+            if waited >= _IDLE_WAIT_SECONDS:
+                return False
+            await asyncio.sleep(0.5)
+            waited += 0.5
+        return True
+
+    @staticmethod
+    def _cost(kind: str, title: str) -> int:
+        # Rendered straight from the template so the estimate isn't counted as a sent prompt
+        values = {"title": title} if kind == "summary" else {"topic": title}
+        prompt = prompts.get(kind).render(prompts.compact, **values)
+        return estimate_tokens(prompt) + _REPLY_TOKENS[kind]
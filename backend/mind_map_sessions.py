@@ -0,0 +1,103 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import MIND_MAP_MAX_SESSIONS, MIND_MAP_SESSION_TTL_HOURS
+from mind_map_layout import ROOT_X, ROOT_Y, SpatialIndex, place_children
+from models import MindMapNode
+
+
+class MindMapSession:
+    """One user's growing mind map, kept server-side so it can be extended in place"""
+
+    def __init__(self, topic: str, nodes: List[MindMapNode]):
+        self.map_id = uuid.uuid4().hex
+        self.topic = topic
+        self.nodes: Dict[str, MindMapNode] = {node.id: node for node in nodes}
+        self.index = SpatialIndex()
+        for node in nodes:
+            self.index.add(node.x, node.y)
+        self.root_id = next((n.id for n in nodes if n.is_main_topic), nodes[0].id if nodes else None)
+        self.created_at = datetime.now()
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def add_children(self, parent_id: str, titles: List[str]) -> Tuple[List[MindMapNode], MindMapNode]:
+        """
+        Attach new child nodes under parent_id and position only them.
+
+        Returns the new nodes and the updated parent (its children list grew).
+        """
+        with self._lock:
+            parent = self.nodes[parent_id]
+            grandparent = self.nodes.get(parent.parent_id) if parent.parent_id else None
+            origin = (grandparent.x, grandparent.y) if grandparent else (ROOT_X, ROOT_Y)
+
+            positions = place_children((parent.x, parent.y), origin, len(titles), self.index)
+            added = []
+            for title, (x, y) in zip(titles, positions):
+                node = MindMapNode(
+                    id=f"node_{uuid.uuid4().hex[:8]}",
+                    title=title,
+                    content="",
+                    x=x,
+                    y=y,
+                    level=parent.level + 1,
+                    parent_id=parent.id,
+                    children=[],
+                    is_suggestion=True
+                )
+                self.nodes[node.id] = node
+                parent.children.append(node.id)
+                added.append(node)
+
+            self.updated_at = time.time()
+            return added, parent
+
+    def children_of(self, node_id: str) -> List[MindMapNode]:
+        return [self.nodes[c] for c in self.nodes[node_id].children if c in self.nodes]
+
+
+class MindMapSessionStore:
+    """In-memory sessions keyed by map ID, evicted by age and LRU"""
+
+    def __init__(self, max_sessions: int = MIND_MAP_MAX_SESSIONS,
+                 ttl_seconds: float = MIND_MAP_SESSION_TTL_HOURS * 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, MindMapSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, topic: str, nodes: List[MindMapNode]) -> MindMapSession:
+        session = MindMapSession(topic, nodes)
+        with self._lock:
+            self._sessions[session.map_id] = session
+            self._evict()
+        return session
+
+    def get(self, map_id: str) -> Optional[MindMapSession]:
+        with self._lock:
+            session = self._sessions.get(map_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl_seconds:
+                del self._sessions[map_id]
+                return None
+            self._sessions.move_to_end(map_id)
+            return session
+
+    def _evict(self):
+        # Least recently used sessions sit at the front
+        cutoff = time.time() - self.ttl_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.updated_at >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+
+# Global instance
+mind_map_sessions = MindMapSessionStore()
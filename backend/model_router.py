@@ -0,0 +1,176 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import (
+    GEMINI_HEAVY_MODELS, GEMINI_HEAVY_TIMEOUT, GEMINI_HEAVY_P95_BUDGET,
+    GEMINI_LIGHT_MODELS, GEMINI_LIGHT_TIMEOUT, GEMINI_LIGHT_P95_BUDGET,
+    GEMINI_ROUTES, GEMINI_FAILOVER_ERROR_RATE, GEMINI_ROUTER_WINDOW_SECONDS,
+)
+
+# Which tier each GeminiClient method uses. Heavy covers code generation and
+# long-form answers; light covers the short, latency-sensitive calls.
+METHOD_TIERS = {
+    "generate_manim_code": "heavy",
+    "generate_manim_code_with_narration": "heavy",
+    "generate_manim_code_with_narration_from_image": "heavy",
+    "generate_manim_code_from_image": "heavy",
+    "analyze_image": "heavy",
+    "generate_tutor_response": "heavy",
+    "generate_mind_map": "light",
+    "generate_subtopics": "light",
+    "generate_summary": "light",
+}
+
+# Samples needed before a model's health is judged
+MIN_SAMPLES = 5
+# Share of traffic still sent to a degraded primary so recovery is noticed
+PROBE_RATE = 0.05
+
+
+class ModelTier:
+    def __init__(self, name: str, models: List[str], timeout: float, p95_budget: float):
+        if not models:
+            raise ValueError(f"Tier {name} has no models")
+        self.name = name
+        self.models = models
+        self.timeout = timeout
+        self.p95_budget = p95_budget
+
+
+class ModelStats:
+    """Rolling latency and error rate for one model over a time window"""
+
+    def __init__(self, window_seconds: float, max_samples: int = 500):
+        self.window_seconds = window_seconds
+        # (timestamp, latency seconds, succeeded)
+        self.samples: Deque[Tuple[float, float, bool]] = deque(maxlen=max_samples)
+
+    def record(self, latency: float, ok: bool):
+        self.samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self) -> List[Tuple[float, float, bool]]:
+        cutoff = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency below which a fraction q of recent successful calls finished"""
+        latencies = sorted(latency for _, latency, ok in self._recent() if ok)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def summary(self) -> dict:
+        recent = self._recent()
+        latencies = sorted(latency for _, latency, ok in recent if ok)
+        errors = sum(1 for _, _, ok in recent if not ok)
+        p50 = latencies[len(latencies) // 2] if latencies else None
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return {
+            "samples": len(recent),
+            "p50": p50,
+            "p95": p95,
+            "error_rate": errors / len(recent) if recent else 0.0,
+        }
+
+
+class ModelRouter:
+    """
+    Maps GeminiClient methods to model tiers and orders each tier's models by
+    health: a primary whose rolling p95 or error rate is over budget is moved
+    behind its fallbacks until it recovers.
+    """
+
+    def __init__(self, tiers: Dict[str, ModelTier], routes: Dict[str, str],
+                 error_rate_limit: float = GEMINI_FAILOVER_ERROR_RATE,
+                 window_seconds: float = GEMINI_ROUTER_WINDOW_SECONDS):
+        self.tiers = tiers
+        self.routes = routes
+        self.error_rate_limit = error_rate_limit
+        self.window_seconds = window_seconds
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def tier_for(self, method: str) -> ModelTier:
+        return self.tiers[self.routes.get(method, "heavy")]
+
+    def _stats_for(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats(self.window_seconds)
+        return stats
+
+    def degraded(self, model: str, tier: ModelTier) -> bool:
+        with self._lock:
+            summary = self._stats_for(model).summary()
+        if summary["samples"] < MIN_SAMPLES:
+            return False
+        if summary["error_rate"] > self.error_rate_limit:
+            return True
+        return summary["p95"] is not None and summary["p95"] > tier.p95_budget
+
+    def candidates(self, method: str) -> Tuple[ModelTier, List[str]]:
+        """The tier for `method` and its models in the order they should be tried"""
+        tier = self.tier_for(method)
+        healthy = [m for m in tier.models if not self.degraded(m, tier)]
+        if not healthy or random.random() < PROBE_RATE:
+            return tier, list(tier.models)
+        return tier, healthy + [m for m in tier.models if m not in healthy]
+
+    def latency_percentile(self, model: str, q: float) -> Optional[float]:
+        """Recent latency percentile for a model, None until enough samples exist"""
+        with self._lock:
+            return self._stats_for(model).percentile(q)
+
+    def record(self, model: str, latency: float, ok: bool):
+        with self._lock:
+            self._stats_for(model).record(latency, ok)
+
+    def snapshot(self) -> dict:
+        tiers = {}
+        for name, tier in self.tiers.items():
+            models = {}
+            for model in tier.models:
+                with self._lock:
+                    summary = self._stats_for(model).summary()
+                summary["degraded"] = self.degraded(model, tier)
+                models[model] = summary
+            tiers[name] = {
+                "timeout": tier.timeout,
+                "p95_budget": tier.p95_budget,
+                "models": models,
+            }
+        return {"routes": dict(self.routes), "tiers": tiers}
+
+
+def _parse_models(value: str) -> List[str]:
+    return [m.strip() for m in value.split(",") if m.strip()]
+
+
+def _parse_routes(value: str) -> Dict[str, str]:
+    routes = dict(METHOD_TIERS)
+    for item in value.split(","):
+        if "=" in item:
+            method, tier = item.split("=", 1)
+            routes[method.strip()] = tier.strip()
+    return routes
+
+
+def build_router() -> ModelRouter:
+    tiers = {
+        "heavy": ModelTier("heavy", _parse_models(GEMINI_HEAVY_MODELS), GEMINI_HEAVY_TIMEOUT, GEMINI_HEAVY_P95_BUDGET),
+        "light": ModelTier("light", _parse_models(GEMINI_LIGHT_MODELS), GEMINI_LIGHT_TIMEOUT, GEMINI_LIGHT_P95_BUDGET),
+    }
+    routes = _parse_routes(GEMINI_ROUTES)
+    for method, tier in routes.items():
+        if tier not in tiers:
+            raise ValueError(f"Unknown model tier {tier!r} for {method}")
+    return ModelRouter(tiers, routes)
+
+
+# Global instance
+model_router = build_router()
@@ -1,17 +1,63 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class QuestionRequest(BaseModel):
     question: str
     subject: Optional[str] = None
     difficulty: Optional[str] = "beginner"
+    # Client-chosen id to follow the render at /progress/{render_id} while the request runs
+    render_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$")
 
 class ManimCodeResponse(BaseModel):
     code: str
     narration: str
     estimated_duration: Optional[int] = None
 
+# Compact scene format the model writes instead of Manim code; compiled by scene_spec.py
+SceneColor = Literal["RED", "GREEN", "BLUE", "YELLOW", "WHITE", "BLACK", "GRAY", "ORANGE", "PURPLE", "PINK"]
+
+class SceneObject(BaseModel):
+    """
+    One object in a scene spec. `size` is the font size for text, the radius
+    for circles and the side for squares. Lines and arrows run from
+    (x, y) / from_id to (to_x, to_y) / to_id.
+    """
+    id: str
+    kind: Literal["text", "circle", "square", "dot", "line", "arrow"]
+    text: Optional[str] = None
+    color: Optional[SceneColor] = None
+    size: Optional[float] = None
+    fill: Optional[float] = None  # fill opacity, 0-1
+    x: float = 0.0
+    y: float = 0.0
+    from_id: Optional[str] = None
+    to_id: Optional[str] = None
+    to_x: Optional[float] = None
+    to_y: Optional[float] = None
+    around: Optional[str] = None  # circle/square drawn around this object
+
+class SceneStep(BaseModel):
+    """
+    One beat of a scene spec. `equation` writes `lines` one under another,
+    addressable afterwards as <ids[0]>_0, <ids[0]>_1, ...
+    """
+    do: Literal["create", "write", "fade_in", "fade_out", "transform", "move", "equation", "wait"]
+    ids: List[str] = []
+    into: Optional[str] = None  # transform target
+    lines: List[str] = []
+    x: Optional[float] = None
+    y: Optional[float] = None
+    seconds: Optional[float] = None
+
+class SceneSpec(BaseModel):
+    objects: List[SceneObject] = []
+    steps: List[SceneStep] = []
+
+class SceneSpecResponse(BaseModel):
+    scene: SceneSpec
+    narration: str
+
 class VideoGenerationRequest(BaseModel):
     question: str
     manim_code: str
@@ -24,6 +70,38 @@ class VideoResponse(BaseModel):
     created_at: datetime
     scene_metadata: Optional[List[dict]] = None
     narration_audio_url: Optional[str] = None
+    hls_url: Optional[str] = None  # Adaptive-bitrate master playlist, once packaged
+
+class LessonRequest(BaseModel):
+    questions: List[str]
+    subject: Optional[str] = None
+    title: Optional[str] = None
+
+class LessonChapter(BaseModel):
+    index: int
+    title: str
+    start_time: float
+    end_time: float
+
+class LessonItemResult(BaseModel):
+    index: int
+    question: str
+    status: str  # "ok" or "failed"
+    video_url: Optional[str] = None
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    # Which resource limit stopped the render, e.g. "cpu_time"
+    error_code: Optional[str] = None
+
+class LessonResponse(BaseModel):
+    video_url: str
+    duration: float
+    file_size: int
+    created_at: datetime
+    title: Optional[str] = None
+    chapters: List[LessonChapter]
+    items: List[LessonItemResult]
+    hls_url: Optional[str] = None
 
 class ErrorResponse(BaseModel):
     error: str
@@ -47,6 +125,14 @@ class ImageAnalysisResponse(BaseModel):
     solution: Optional[str] = None
     explanation: str
 
+class LiveStreamResponse(BaseModel):
+    """Where to follow a video that is still rendering"""
+    stream_id: str
+    status_url: str
+    playlist_url: str
+    stream_url: str
+    progress_url: str
+
 class TextToSpeechRequest(BaseModel):
     text: str
     voice_id: Optional[str] = "21m00Tcm4TlvDq8ikWAM"  # Default to Rachel voice
@@ -67,6 +153,15 @@ class MindMapNode(BaseModel):
     is_main_topic: bool = False
     is_suggestion: bool = False
 
+class MindMapNodeDraft(BaseModel):
+    """A mind map node as generated by the model, before layout"""
+    id: str
+    title: str
+    content: str = ""
+    parent_id: Optional[str] = None
+    is_main_topic: bool = False
+    is_suggestion: bool = False
+
 class MindMapRequest(BaseModel):
     topic: str
     depth: Optional[int] = 3
@@ -76,4 +171,15 @@ class MindMapResponse(BaseModel):
     nodes: List[MindMapNode]
     topic: str
     created_at: datetime
+    map_id: Optional[str] = None
+
+class ExpandNodeRequest(BaseModel):
+    node_id: str
+    max_children: Optional[int] = 3
+
+class MindMapDeltaResponse(BaseModel):
+    map_id: str
+    parent_id: str
+    added_nodes: List[MindMapNode]
+    updated_nodes: List[MindMapNode]
 
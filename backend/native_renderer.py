@@ -0,0 +1,1037 @@
+"""
+Native renderer for simple scenes.
+
+Most generated scenes are a few Text labels plus Circle/Square/Dot/Line/Arrow
+shown with Create/Write/FadeIn. For those, starting Manim costs far more than
+drawing the frames. NativeRenderer interprets that subset of a scene's
+construct() directly:
+
+- each object is rasterized once with cairo;
+- animation frames are composited with numpy, a batch of frames per array
+  operation;
+- raw frames are piped into a single ffmpeg encode, which can mux the
+  narration in the same pass.
+
+Scenes that use anything outside the subset are reported unsupported, so
+ManimRenderer falls back to the Manim CLI.
+
+Output matches Manim's -ql settings (854x480 at 15 fps) and its coordinate
+system, but not its exact look. Fonts come from cairo's toy text API rather
+than Pango, and Create/Write reveal objects with a wipe instead of tracing
+their outlines.
+"""
+import ast
+import copy
+import math
+import subprocess
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import MAX_VIDEO_DURATION
+
+WIDTH, HEIGHT, FPS = 854, 480, 15
+FRAME_HEIGHT = 8.0
+PIXELS_PER_UNIT = HEIGHT / FRAME_HEIGHT
+FRAME_WIDTH = WIDTH / PIXELS_PER_UNIT
+# Longest scene drawn natively; longer ones go to Manim and its limits
+MAX_FRAMES = MAX_VIDEO_DURATION * FPS
+# Wall-clock limit for one native encode, the same the Manim sandbox gets
+RENDER_TIMEOUT = MAX_VIDEO_DURATION + 60
+# Frames composited per numpy operation
+BATCH_FRAMES = 16
+# Width of the soft edge of a Create/Write wipe, as a fraction of the object
+WIPE_EDGE = 0.04
+
+# Manim's values for its color constants
+COLORS = {
+    "WHITE": "#FFFFFF", "BLACK": "#000000", "GRAY": "#888888", "GREY": "#888888",
+    "RED": "#FC6255", "GREEN": "#83C167", "BLUE": "#58C4DD", "YELLOW": "#FFFF00",
+    "ORANGE": "#FF862F", "PURPLE": "#9A72AC", "PINK": "#D147BD", "TEAL": "#5CD0B3", "GOLD": "#F0AC5F",
+}
+DIRECTIONS = {
+    "ORIGIN": (0.0, 0.0), "UP": (0.0, 1.0), "DOWN": (0.0, -1.0), "LEFT": (-1.0, 0.0), "RIGHT": (1.0, 0.0),
+    "UL": (-1.0, 1.0), "UR": (1.0, 1.0), "DL": (-1.0, -1.0), "DR": (1.0, -1.0),
+}
+BUFFS = {"SMALL_BUFF": 0.1, "MED_SMALL_BUFF": 0.25, "MED_LARGE_BUFF": 0.5, "LARGE_BUFF": 1.0}
+# Manim stroke widths are hundredths of a unit
+STROKE_UNITS = 0.01
+# Text em size in units per point of font_size (font_size 48 is about 0.75 units)
+TEXT_UNITS_PER_POINT = 0.75 / 48
+TEXT_LINE_GAP = 0.3
+
+Vec = Tuple[float, float]
+
+
+class NativeUnsupported(Exception):
+    """The scene uses something the native renderer doesn't draw"""
+
+
+def _add(a: Vec, b: Vec) -> Vec:
+    return (a[0] + b[0], a[1] + b[1])
+
+
+def _sub(a: Vec, b: Vec) -> Vec:
+    return (a[0] - b[0], a[1] - b[1])
+
+
+def _mul(a: Vec, k: float) -> Vec:
+    return (a[0] * k, a[1] * k)
+
+
+def _unit(a: Vec) -> Vec:
+    length = math.hypot(*a)
+    return (a[0] / length, a[1] / length) if length else (1.0, 0.0)
+
+
+def _rgb(color: str) -> Tuple[float, float, float]:
+    color = color.lstrip("#")
+    return tuple(int(color[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _cairo():
+    try:
+        import cairo
+    except ImportError:
+        raise NativeUnsupported("pycairo is not installed")
+    return cairo
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise NativeUnsupported("numpy is not installed")
+    return numpy
+
+
+@lru_cache(maxsize=4096)
+def _measure_line(text: str) -> Tuple[float, float, float, float]:
+    """Ink extents (x_bearing, y_bearing, width, height) of one line at an em of 1 unit"""
+    cairo = _cairo()
+    context = cairo.Context(cairo.ImageSurface(cairo.FORMAT_A8, 1, 1))
+    context.select_font_face("Sans")
+    context.set_font_size(100)
+    x_bearing, y_bearing, width, height, _, _ = context.text_extents(text)
+    return x_bearing / 100, y_bearing / 100, max(width, 1) / 100, max(height, 1) / 100
+
+
+class _Mob:
+    """Geometry of one Manim object, in scene units"""
+
+    def __init__(self, kind: str, color: str = COLORS["WHITE"]):
+        self.kind = kind
+        self.color = color
+        self.fill = 0.0
+        self.stroke = 4 * STROKE_UNITS
+        self.center: Vec = (0.0, 0.0)
+        self.radius = 0.0
+        self.side = 0.0
+        self.text = ""
+        self.em = 0.0
+        self.start: Vec = (0.0, 0.0)
+        self.end: Vec = (0.0, 0.0)
+        self.members: List["_Mob"] = []
+        # Bumped whenever the shape (not just the position) changes
+        self.version = 0
+
+    # Geometry
+
+    def lines(self) -> List[Tuple[float, float, float, float]]:
+        return [_measure_line(line) for line in self.text.split("\n")]
+
+    def size(self) -> Vec:
+        if self.kind == "text":
+            extents = self.lines()
+            width = max(extent[2] for extent in extents)
+            height = sum(extent[3] for extent in extents) + TEXT_LINE_GAP * (len(extents) - 1)
+            return (width * self.em, height * self.em)
+        if self.kind in ("circle", "dot"):
+            return (2 * self.radius, 2 * self.radius)
+        if self.kind == "square":
+            return (self.side, self.side)
+        if self.kind in ("line", "arrow"):
+            return (abs(self.end[0] - self.start[0]), abs(self.end[1] - self.start[1]))
+        left, bottom, right, top = self.bounds()
+        return (right - left, top - bottom)
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        if self.kind == "group":
+            if not self.members:
+                return (0.0, 0.0, 0.0, 0.0)
+            boxes = [member.bounds() for member in self.members]
+            return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                    max(b[2] for b in boxes), max(b[3] for b in boxes))
+        center = self.get_center()
+        width, height = self.size()
+        return (center[0] - width / 2, center[1] - height / 2, center[0] + width / 2, center[1] + height / 2)
+
+    def get_center(self) -> Vec:
+        if self.kind == "group":
+            left, bottom, right, top = self.bounds()
+            return ((left + right) / 2, (bottom + top) / 2)
+        if self.kind in ("line", "arrow"):
+            return _mul(_add(self.start, self.end), 0.5)
+        return self.center
+
+    def boundary_point(self, direction: Vec) -> Vec:
+        """Where a ray from the center in `direction` leaves the object"""
+        center = self.get_center()
+        direction = _unit(direction)
+        if self.kind in ("circle", "dot"):
+            return _add(center, _mul(direction, self.radius))
+        width, height = self.size()
+        scales = [half / abs(d) for half, d in ((width / 2, direction[0]), (height / 2, direction[1])) if d]
+        return _add(center, _mul(direction, min(scales) if scales else 0.0))
+
+    def leaves(self) -> List["_Mob"]:
+        if self.kind == "group":
+            return [leaf for member in self.members for leaf in member.leaves()]
+        return [self]
+
+    # Transformations (Manim's methods of the same names)
+
+    def shift(self, vector: Vec):
+        if self.kind == "group":
+            for member in self.members:
+                member.shift(vector)
+        elif self.kind in ("line", "arrow"):
+            self.start, self.end = _add(self.start, vector), _add(self.end, vector)
+        else:
+            self.center = _add(self.center, vector)
+        return self
+
+    def move_to(self, point: Vec):
+        return self.shift(_sub(point, self.get_center()))
+
+    def scale(self, factor: float, about: Optional[Vec] = None):
+        if factor <= 0:
+            raise NativeUnsupported("non-positive scale")
+        about = about if about is not None else self.get_center()
+        if self.kind == "group":
+            for member in self.members:
+                member.scale(factor, about)
+            return self
+        self.radius *= factor
+        self.side *= factor
+        self.em *= factor
+        self.start = _add(about, _mul(_sub(self.start, about), factor))
+        self.end = _add(about, _mul(_sub(self.end, about), factor))
+        self.center = _add(about, _mul(_sub(self.center, about), factor))
+        self.version += 1
+        return self
+
+    def set_color(self, color: str):
+        for leaf in self.leaves():
+            leaf.color = color
+            leaf.version += 1
+        return self
+
+    def set_fill(self, color: Optional[str], opacity: Optional[float]):
+        for leaf in self.leaves():
+            if color is not None:
+                leaf.color = color
+            if opacity is not None:
+                leaf.fill = opacity
+            leaf.version += 1
+        return self
+
+    def copy(self) -> "_Mob":
+        return copy.deepcopy(self)
+
+    def become(self, other: "_Mob"):
+        version = self.version
+        self.__dict__.update(other.copy().__dict__)
+        self.version = max(version, other.version) + 1
+
+
+class _Track:
+    """How one object is drawn during one animation: per-frame opacity, wipe and offset"""
+
+    def __init__(self, leaf: _Mob):
+        self.leaf = leaf
+        self.opacity = None  # array of frames, or None for fully opaque
+        self.reveal = None  # wipe progress per frame, or None for fully drawn
+        self.offset = None  # (frames, 2) units from the leaf's position, or None
+
+    @property
+    def static(self) -> bool:
+        return self.opacity is None and self.reveal is None and self.offset is None
+
+
+def _smooth(np, t, inflection: float = 10.0):
+    # Manim's default rate function
+    error = 1 / (1 + math.exp(inflection / 2))
+    return np.clip((1 / (1 + np.exp(-inflection * (t - 0.5))) - error) / (1 - 2 * error), 0, 1)
+
+
+class _Compositor:
+    """Rasterizes objects once and composites animation frames into the encoder"""
+
+    def __init__(self, writer: "_FrameWriter"):
+        self.np = _numpy()
+        self.cairo = _cairo()
+        self.writer = writer
+        self._sprites: Dict[tuple, Tuple[_Mob, tuple]] = {}
+
+    def play(self, tracks: List[_Track], frames: int):
+        np = self.np
+        first_dynamic = next((i for i, track in enumerate(tracks) if not track.static), len(tracks))
+        # Everything beneath the first animated object is the same in every frame
+        base = np.zeros((HEIGHT, WIDTH, 3), dtype=np.float32)
+        for track in tracks[:first_dynamic]:
+            self._draw(base[None], track, slice(0, 1))
+        for start in range(0, frames, BATCH_FRAMES):
+            count = min(BATCH_FRAMES, frames - start)
+            canvas = np.repeat(base[None], count, axis=0)
+            for track in tracks[first_dynamic:]:
+                self._draw(canvas, track, slice(start, start + count))
+            self.writer.write(self._to_bytes(canvas), count)
+
+    def hold(self, tracks: List[_Track], frames: int):
+        np = self.np
+        canvas = np.zeros((1, HEIGHT, WIDTH, 3), dtype=np.float32)
+        for track in tracks:
+            self._draw(canvas, track, slice(0, 1))
+        frame = self._to_bytes(canvas)
+        for _ in range(frames):
+            self.writer.write(frame, 1)
+
+    def _to_bytes(self, canvas) -> bytes:
+        return (self.np.clip(canvas, 0, 1) * 255 + 0.5).astype(self.np.uint8).tobytes()
+
+    def _draw(self, canvas, track: _Track, frames: slice):
+        np = self.np
+        rgb, alpha, reveal_map, (left, top), anchor = self._sprite(track.leaf)
+        count = canvas.shape[0]
+        # The sprite was drawn at `anchor`; the leaf may have moved since
+        moved = _sub(track.leaf.get_center(), anchor)
+        weight = np.ones((count, 1, 1), dtype=np.float32)
+        if track.opacity is not None:
+            weight = weight * track.opacity[frames][:, None, None]
+        if track.reveal is not None:
+            progress = track.reveal[frames][:, None, None] * (1 + WIPE_EDGE)
+            weight = weight * np.clip((progress - reveal_map[None]) / WIPE_EDGE, 0, 1)
+
+        if track.offset is None:
+            self._blend(canvas, rgb, alpha, weight, left + moved[0] * PIXELS_PER_UNIT, top - moved[1] * PIXELS_PER_UNIT)
+            return
+        # Moving objects land somewhere different in every frame
+        offsets = track.offset[frames]
+        for i in range(count):
+            dx, dy = moved[0] + offsets[i][0], moved[1] + offsets[i][1]
+            self._blend(canvas[i:i + 1], rgb, alpha, weight[i:i + 1] if weight.shape[0] > 1 else weight,
+                        left + dx * PIXELS_PER_UNIT, top - dy * PIXELS_PER_UNIT)
+
+    def _blend(self, canvas, rgb, alpha, weight, left: float, top: float):
+        x, y = int(round(left)), int(round(top))
+        height, width = alpha.shape
+        x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + width, WIDTH), min(y + height, HEIGHT)
+        if x0 >= x1 or y0 >= y1:
+            return
+        sx, sy = slice(x0 - x, x1 - x), slice(y0 - y, y1 - y)
+        if weight.shape[1] > 1:
+            weight = weight[:, sy, sx]
+        # Premultiplied "over"
+        coverage = (alpha[sy, sx][None] * weight)[..., None]
+        region = canvas[:, y0:y1, x0:x1]
+        region *= 1 - coverage
+        region += rgb[sy, sx][None] * weight[..., None]
+
+    def _sprite(self, leaf: _Mob):
+        key = (id(leaf), leaf.version)
+        if key not in self._sprites:
+            # Holding the leaf keeps its id from being reused by a later object
+            self._sprites[key] = (leaf, self._rasterize(leaf))
+        return self._sprites[key][1]
+
+    def _rasterize(self, leaf: _Mob):
+        np, cairo = self.np, self.cairo
+        left, bottom, right, top = leaf.bounds()
+        pad = leaf.stroke * PIXELS_PER_UNIT + 2
+        if leaf.kind == "arrow":
+            pad += 0.2 * PIXELS_PER_UNIT
+        # Sprite position on the canvas, in pixels
+        origin_x = WIDTH / 2 + left * PIXELS_PER_UNIT - pad
+        origin_y = HEIGHT / 2 - top * PIXELS_PER_UNIT - pad
+        width = max(1, int(math.ceil((right - left) * PIXELS_PER_UNIT + 2 * pad)))
+        height = max(1, int(math.ceil((top - bottom) * PIXELS_PER_UNIT + 2 * pad)))
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        context = cairo.Context(surface)
+        context.translate(WIDTH / 2 - origin_x, HEIGHT / 2 - origin_y)
+        context.scale(PIXELS_PER_UNIT, -PIXELS_PER_UNIT)
+        self._paint(context, leaf)
+        surface.flush()
+
+        data = np.ndarray((height, surface.get_stride() // 4, 4), dtype=np.uint8,
+                          buffer=surface.get_data())[:, :width]
+        # Cairo stores premultiplied BGRA
+        rgb = data[..., 2::-1].astype(np.float32) / 255
+        alpha = data[..., 3].astype(np.float32) / 255
+        return rgb, alpha, self._reveal_map(leaf, width, height, origin_x, origin_y), \
+            (origin_x, origin_y), leaf.get_center()
+
+    def _paint(self, context, leaf: _Mob):
+        red, green, blue = _rgb(leaf.color)
+        context.set_line_width(leaf.stroke)
+        context.set_line_cap(self.cairo.LINE_CAP_ROUND)
+        if leaf.kind == "text":
+            self._paint_text(context, leaf, (red, green, blue))
+            return
+        if leaf.kind in ("circle", "dot"):
+            context.arc(leaf.center[0], leaf.center[1], leaf.radius, 0, 2 * math.pi)
+        elif leaf.kind == "square":
+            half = leaf.side / 2
+            context.rectangle(leaf.center[0] - half, leaf.center[1] - half, leaf.side, leaf.side)
+        else:
+            direction = _unit(_sub(leaf.end, leaf.start))
+            length = math.hypot(*_sub(leaf.end, leaf.start))
+            tip = min(0.35, 0.25 * length) if leaf.kind == "arrow" else 0.0
+            shaft_end = _sub(leaf.end, _mul(direction, tip))
+            context.move_to(*leaf.start)
+            context.line_to(*shaft_end)
+            context.set_source_rgb(red, green, blue)
+            context.stroke()
+            if tip:
+                normal = (-direction[1], direction[0])
+                context.move_to(*leaf.end)
+                context.line_to(*_add(shaft_end, _mul(normal, tip / 2)))
+                context.line_to(*_sub(shaft_end, _mul(normal, tip / 2)))
+                context.close_path()
+                context.fill()
+            return
+        if leaf.kind == "dot":
+            context.set_source_rgb(red, green, blue)
+            context.fill()
+            return
+        if leaf.fill > 0:
+            context.set_source_rgba(red, green, blue, leaf.fill)
+            context.fill_preserve()
+        context.set_source_rgb(red, green, blue)
+        context.stroke()
+
+    def _paint_text(self, context, leaf: _Mob, rgb):
+        context.set_source_rgb(*rgb)
+        context.select_font_face("Sans")
+        left, _, _, top = leaf.bounds()
+        cursor = top
+        for line, (x_bearing, y_bearing, _, height) in zip(leaf.text.split("\n"), leaf.lines()):
+            # Text is set in y-down font space under the y-up scene transform
+            context.save()
+            context.translate(left - x_bearing * leaf.em, cursor + y_bearing * leaf.em)
+            context.scale(1, -1)
+            context.set_font_size(leaf.em)
+            context.move_to(0, 0)
+            context.show_text(line)
+            context.restore()
+            cursor -= (height + TEXT_LINE_GAP) * leaf.em
+
+    def _reveal_map(self, leaf: _Mob, width: int, height: int, origin_x: float, origin_y: float):
+        """Per-pixel wipe order in [0, 1]: text left to right, lines start to end, shapes around"""
+        np = self.np
+        xs = (origin_x + np.arange(width, dtype=np.float32) + 0.5 - WIDTH / 2) / PIXELS_PER_UNIT
+        ys = (HEIGHT / 2 - origin_y - np.arange(height, dtype=np.float32) - 0.5) / PIXELS_PER_UNIT
+        x, y = np.meshgrid(xs, ys)
+        if leaf.kind == "text":
+            left, _, right, _ = leaf.bounds()
+            return np.clip((x - left) / max(right - left, 1e-6), 0, 1)
+        if leaf.kind in ("line", "arrow"):
+            direction = _sub(leaf.end, leaf.start)
+            length_sq = max(direction[0] ** 2 + direction[1] ** 2, 1e-6)
+            return np.clip(((x - leaf.start[0]) * direction[0] + (y - leaf.start[1]) * direction[1]) / length_sq, 0, 1)
+        # Circles start at the right, squares at the top-right corner, both counterclockwise
+        start = math.pi / 4 if leaf.kind == "square" else 0.0
+        angle = np.arctan2(y - leaf.center[1], x - leaf.center[0]) - start
+        return np.mod(angle, 2 * math.pi) / (2 * math.pi)
+
+
+class _FrameWriter:
+    """One ffmpeg encode fed raw RGB frames, muxing the narration if given"""
+
+    def __init__(self, output_path: Path, audio_path: Optional[str] = None, timeout: float = RENDER_TIMEOUT):
+        cmd = [
+            'ffmpeg', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{WIDTH}x{HEIGHT}', '-r', str(FPS), '-i', 'pipe:0',
+        ]
+        if audio_path:
+            cmd += ['-i', audio_path]
+        cmd += ['-map', '0:v', '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p']
+        if audio_path:
+            cmd += ['-map', '1:a', '-c:a', 'copy' if Path(audio_path).suffix == ".m4a" else 'aac']
+        cmd += ['-movflags', '+faststart', '-y', str(output_path)]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.frames = 0
+        self.timeout = timeout
+        self.expired = False
+        self._last: Optional[bytes] = None
+        # Killing ffmpeg at the deadline also unblocks a write stuck on a full pipe
+        self._watchdog = threading.Timer(timeout, self._expire)
+        self._watchdog.daemon = True
+        self._watchdog.start()
+
+    def write(self, data: bytes, count: int):
+        self._check_deadline()
+        try:
+            self.process.stdin.write(data)
+        except BrokenPipeError:
+            self._check_deadline()
+            raise Exception(f"ffmpeg stopped accepting frames: {self._errors()}")
+        self.frames += count
+        self._last = data[-WIDTH * HEIGHT * 3:]
+
+    def close(self, min_frames: int = 0):
+        # Hold the last frame until the narration ends
+        while self._last is not None and self.frames < min_frames:
+            self.write(self._last, 1)
+        self.process.stdin.close()
+        self.process.wait()
+        self._watchdog.cancel()
+        self._check_deadline()
+        if self.process.returncode != 0:
+            raise Exception(f"ffmpeg failed encoding native render: {self._errors()}")
+
+    def abort(self):
+        self._watchdog.cancel()
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def _expire(self):
+        self.expired = True
+        if self.process.poll() is None:
+            self.process.kill()
+
+    def _check_deadline(self):
+        if self.expired:
+            raise Exception(f"Native render exceeded the {self.timeout:.0f}s wall-clock limit")
+
+    def _errors(self) -> str:
+        try:
+            return self.process.stderr.read().decode(errors="replace")[-2000:]
+        except Exception:
+            return ""
+
+
+class _Animation:
+    def __init__(self, kind: str, mob: _Mob, run_time: float = 1.0, rate: str = "smooth",
+                 target: Optional[_Mob] = None, delta: Vec = (0.0, 0.0)):
+        self.kind = kind
+        self.mob = mob
+        self.run_time = run_time
+        self.rate = rate
+        self.target = target
+        self.delta = delta
+
+
+_REVEALS = {"Create": "smooth", "Write": "linear", "DrawBorderThenFill": "smooth", "GrowFromCenter": "smooth"}
+_CONSTRUCTORS = {
+    # name: (positional parameters, defaults)
+    "Text": (("text",), {"font_size": 48, "color": COLORS["WHITE"]}),
+    "Circle": (("radius",), {"radius": 1.0, "color": COLORS["RED"], "fill_opacity": 0.0, "stroke_width": 4}),
+    "Square": (("side_length",), {"side_length": 2.0, "color": COLORS["WHITE"], "fill_opacity": 0.0, "stroke_width": 4}),
+    "Dot": (("point",), {"point": (0.0, 0.0), "radius": 0.08, "color": COLORS["WHITE"]}),
+    "Line": (("start", "end"), {"start": (-1.0, 0.0), "end": (1.0, 0.0), "color": COLORS["WHITE"], "buff": 0.0,
+                                "stroke_width": 4}),
+    "Arrow": (("start", "end"), {"start": (-1.0, 0.0), "end": (1.0, 0.0), "color": COLORS["WHITE"], "buff": 0.25,
+                                 "stroke_width": 6}),
+}
+
+
+class _SceneInterpreter:
+    """
+    Runs a scene's construct() over the supported subset. With a compositor
+    the frames are drawn; without one it is a dry run that only checks the
+    scene is supported and counts its frames.
+    """
+
+    def __init__(self, compositor: Optional[_Compositor] = None,
+                 on_animation: Optional[Callable[[int], None]] = None):
+        self.compositor = compositor
+        self.on_animation = on_animation
+        self.np = compositor.np if compositor else None
+        self.names: Dict[str, object] = {}
+        self.shown: List[_Mob] = []
+        self.frames = 0
+        # Numbered like Manim's: every play() and wait() counts
+        self.animations = 0
+
+    def run(self, construct: ast.FunctionDef):
+        for statement in construct.body:
+            self._statement(statement)
+        if self.frames == 0:
+            raise NativeUnsupported("scene plays nothing")
+
+    # Statements
+
+    def _statement(self, node: ast.stmt):
+        if isinstance(node, ast.Pass) or (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)):
+            return
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = self._eval(node.value)
+            if not isinstance(value, (_Mob, int, float, tuple)):
+                raise NativeUnsupported("unsupported assignment")
+            self.names[node.targets[0].id] = value
+            return
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            call = node.value
+            func = call.func
+            if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "self":
+                if func.attr == "play":
+                    return self._play(call)
+                if func.attr == "wait":
+                    return self._wait(call)
+                if func.attr in ("add", "remove") and not call.keywords:
+                    mobs = [self._mob(arg) for arg in call.args]
+                    for mob in mobs:
+                        for leaf in mob.leaves():
+                            if leaf in self.shown:
+                                self.shown.remove(leaf)
+                            if func.attr == "add":
+                                self.shown.append(leaf)
+                    return
+                raise NativeUnsupported(f"self.{func.attr}")
+            # In-place method calls such as label.to_edge(UP)
+            self._eval(call)
+            return
+        raise NativeUnsupported(type(node).__name__)
+
+    def _wait(self, call: ast.Call):
+        args = self._arguments(call, ("duration",), {"duration": 1.0})
+        frames = self._reserve(round(self._number(args["duration"]) * FPS))
+        if self.compositor:
+            self.compositor.hold([_Track(leaf) for leaf in self.shown], frames)
+        self.frames += frames
+        self._animation_done()
+
+    def _play(self, call: ast.Call):
+        options = {keyword.arg: keyword.value for keyword in call.keywords}
+        if set(options) - {"run_time", "rate_func"}:
+            raise NativeUnsupported("play options")
+        animations = [self._animation(arg) for arg in call.args]
+        if not animations:
+            raise NativeUnsupported("empty play")
+        if "run_time" in options:
+            run_time = self._number(self._eval(options["run_time"]))
+            for animation in animations:
+                animation.run_time = run_time
+        if "rate_func" in options:
+            rate = self._rate(options["rate_func"])
+            for animation in animations:
+                animation.rate = rate
+
+        total = max(animation.run_time for animation in animations)
+        if total <= 0:
+            raise NativeUnsupported("non-positive run_time")
+        frames = self._reserve(round(total * FPS))
+        if self.compositor:
+            self.compositor.play(self._tracks(animations, frames), frames)
+        self._finish(animations)
+        self.frames += frames
+        self._animation_done()
+
+    def _reserve(self, frames: int) -> int:
+        """Frames for the next animation, refusing scenes longer than MAX_VIDEO_DURATION"""
+        frames = max(1, frames)
+        if self.frames + frames > MAX_FRAMES:
+            raise NativeUnsupported(f"scene runs longer than {MAX_VIDEO_DURATION}s")
+        return frames
+
+    def _animation_done(self):
+        if self.on_animation:
+            self.on_animation(self.animations)
+        self.animations += 1
+
+    def _tracks(self, animations: List[_Animation], frames: int) -> List[_Track]:
+        """Per-object drawing instructions for one play(), in drawing order"""
+        np = self.np
+        # Frames sample t = 0, 1/FPS, ... like Manim; later frames show the end state
+        times = np.arange(frames, dtype=np.float32) / FPS
+        order = list(self.shown)
+        tracks: Dict[int, _Track] = {}
+
+        def track(leaf: _Mob) -> _Track:
+            if id(leaf) not in tracks:
+                tracks[id(leaf)] = _Track(leaf)
+                if leaf not in order:
+                    order.append(leaf)
+            return tracks[id(leaf)]
+
+        for animation in animations:
+            t = np.clip(times / animation.run_time, 0, 1)
+            alpha = t if animation.rate == "linear" else _smooth(np, t)
+            if animation.kind == "reveal":
+                for leaf in animation.mob.leaves():
+                    track(leaf).reveal = alpha
+            elif animation.kind in ("fade_in", "fade_out"):
+                for leaf in animation.mob.leaves():
+                    track(leaf).opacity = alpha if animation.kind == "fade_in" else 1 - alpha
+            elif animation.kind == "move":
+                offset = alpha[:, None] * np.array(animation.delta, dtype=np.float32)[None]
+                for leaf in animation.mob.leaves():
+                    track(leaf).offset = offset
+            else:
+                # Transform: the source fades out as the target fades in, both sliding between them
+                source, target = animation.mob, animation.target
+                travel = np.array(_sub(target.get_center(), source.get_center()), dtype=np.float32)
+                snapshot = source.copy()
+                for leaf in source.leaves():
+                    if leaf in order:
+                        order.remove(leaf)
+                for leaf in snapshot.leaves():
+                    entry = track(leaf)
+                    entry.opacity, entry.offset = 1 - alpha, alpha[:, None] * travel[None]
+                for leaf in target.copy().leaves():
+                    entry = track(leaf)
+                    entry.opacity, entry.offset = alpha, (alpha[:, None] - 1) * travel[None]
+        return [tracks.get(id(leaf)) or _Track(leaf) for leaf in order]
+
+    def _finish(self, animations: List[_Animation]):
+        """Apply each animation's end state to the scene"""
+        for animation in animations:
+            leaves = animation.mob.leaves()
+            if animation.kind in ("reveal", "fade_in"):
+                for leaf in leaves:
+                    if leaf not in self.shown:
+                        self.shown.append(leaf)
+            elif animation.kind == "fade_out":
+                self.shown = [leaf for leaf in self.shown if leaf not in leaves]
+            elif animation.kind == "move":
+                animation.mob.shift(animation.delta)
+            elif animation.kind == "replace":
+                self.shown = [leaf for leaf in self.shown if leaf not in leaves]
+                self.shown.extend(leaf for leaf in animation.target.leaves() if leaf not in self.shown)
+            else:
+                # Transform keeps the source object, now shaped like the target
+                self.shown = [leaf for leaf in self.shown if leaf not in leaves]
+                animation.mob.become(animation.target)
+                self.shown.extend(animation.mob.leaves())
+
+    def _animation(self, node: ast.expr) -> _Animation:
+        if not isinstance(node, ast.Call):
+            raise NativeUnsupported("play() argument is not an animation")
+        func = node.func
+        # mob.animate.move_to(...), .shift(...), .next_to(...), .to_edge(...)
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Attribute) and func.value.attr == "animate":
+            if func.attr not in ("move_to", "shift", "next_to", "to_edge"):
+                raise NativeUnsupported(f"animate.{func.attr}")
+            mob = self._mob(func.value.value)
+            moved = self._method(mob.copy(), func.attr, node)
+            return _Animation("move", mob, delta=_sub(moved.get_center(), mob.get_center()))
+        if not isinstance(func, ast.Name):
+            raise NativeUnsupported("unsupported animation")
+        options = {keyword.arg: keyword.value for keyword in node.keywords}
+        if set(options) - {"run_time", "rate_func"}:
+            raise NativeUnsupported(f"{func.id} options")
+        if func.id in _REVEALS or func.id in ("FadeIn", "FadeOut"):
+            if len(node.args) != 1:
+                raise NativeUnsupported(f"{func.id} arguments")
+            mob = self._mob(node.args[0])
+            if func.id in ("FadeIn", "FadeOut"):
+                animation = _Animation("fade_in" if func.id == "FadeIn" else "fade_out", mob)
+            else:
+                animation = _Animation("reveal", mob, rate=_REVEALS[func.id])
+                if func.id == "Write":
+                    # Manim's Write takes longer for longer text
+                    glyphs = sum(len(leaf.text.replace(" ", "").replace("\n", "")) for leaf in mob.leaves())
+                    animation.run_time = 1.0 if glyphs < 15 else 2.0
+        elif func.id in ("Transform", "ReplacementTransform"):
+            if len(node.args) != 2:
+                raise NativeUnsupported(f"{func.id} arguments")
+            animation = _Animation("replace" if func.id == "ReplacementTransform" else "transform",
+                                   self._mob(node.args[0]), target=self._mob(node.args[1]))
+        else:
+            raise NativeUnsupported(func.id)
+        if "run_time" in options:
+            animation.run_time = self._number(self._eval(options["run_time"]))
+        if "rate_func" in options:
+            animation.rate = self._rate(options["rate_func"])
+        return animation
+
+    @staticmethod
+    def _rate(node: ast.expr) -> str:
+        if isinstance(node, ast.Name) and node.id in ("linear", "smooth"):
+            return node.id
+        raise NativeUnsupported("rate_func")
+
+    # Expressions
+
+    def _eval(self, node: ast.expr):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)) \
+                and not isinstance(node.value, bool):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in self.names:
+                return self.names[node.id]
+            if node.id in DIRECTIONS:
+                return DIRECTIONS[node.id]
+            if node.id in BUFFS:
+                return BUFFS[node.id]
+            if node.id in COLORS:
+                return COLORS[node.id]
+            if node.id == "PI":
+                return math.pi
+            raise NativeUnsupported(f"name {node.id}")
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = self._eval(node.operand)
+            sign = -1 if isinstance(node.op, ast.USub) else 1
+            return _mul(value, sign) if isinstance(value, tuple) else sign * self._number(value)
+        if isinstance(node, ast.BinOp):
+            return self._binop(node.op, self._eval(node.left), self._eval(node.right))
+        if isinstance(node, (ast.List, ast.Tuple)):
+            values = [self._number(self._eval(element)) for element in node.elts]
+            if len(values) not in (2, 3) or (len(values) == 3 and values[2] != 0):
+                raise NativeUnsupported("point")
+            return (float(values[0]), float(values[1]))
+        if isinstance(node, ast.Attribute) and node.attr in ("width", "height"):
+            width, height = self._mob(node.value).size()
+            return width if node.attr == "width" else height
+        if isinstance(node, ast.Call):
+            return self._call(node)
+        raise NativeUnsupported(type(node).__name__)
+
+    def _binop(self, op: ast.operator, left, right):
+        if isinstance(left, tuple) and isinstance(right, tuple) and isinstance(op, (ast.Add, ast.Sub)):
+            return _add(left, right) if isinstance(op, ast.Add) else _sub(left, right)
+        if isinstance(left, tuple) and isinstance(op, (ast.Mult, ast.Div)):
+            right = self._number(right)
+            return _mul(left, right if isinstance(op, ast.Mult) else 1 / right)
+        if isinstance(right, tuple) and isinstance(op, ast.Mult):
+            return _mul(right, self._number(left))
+        left, right = self._number(left), self._number(right)
+        operations = {ast.Add: left + right, ast.Sub: left - right, ast.Mult: left * right}
+        if type(op) in operations:
+            return operations[type(op)]
+        if isinstance(op, ast.Div) and right:
+            return left / right
+        raise NativeUnsupported("operator")
+
+    def _call(self, node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id in _CONSTRUCTORS:
+                return self._construct(func.id, node)
+            if func.id in ("VGroup", "Group") and not node.keywords:
+                group = _Mob("group")
+                group.members = [self._mob(arg) for arg in node.args]
+                return group
+            if func.id in ("min", "max") and not node.keywords and node.args:
+                values = [self._number(self._eval(arg)) for arg in node.args]
+                return min(values) if func.id == "min" else max(values)
+            raise NativeUnsupported(f"call {func.id}")
+        if isinstance(func, ast.Attribute):
+            if isinstance(func.value, ast.Name) and func.value.id == "np" and func.attr == "array" \
+                    and len(node.args) == 1:
+                return self._eval(node.args[0])
+            return self._method(self._mob(func.value), func.attr, node)
+        raise NativeUnsupported("call")
+
+    def _method(self, mob: _Mob, name: str, node: ast.Call):
+        if name == "copy" and not node.args:
+            return mob.copy()
+        if name in ("get_center", "get_top", "get_bottom", "get_left", "get_right") and not node.args:
+            if name == "get_center":
+                return mob.get_center()
+            left, bottom, right, top = mob.bounds()
+            center = mob.get_center()
+            return {"get_top": (center[0], top), "get_bottom": (center[0], bottom),
+                    "get_left": (left, center[1]), "get_right": (right, center[1])}[name]
+        if name == "move_to":
+            args = self._arguments(node, ("point",), {})
+            return mob.move_to(self._point(args["point"]))
+        if name == "shift":
+            if node.keywords:
+                raise NativeUnsupported("shift options")
+            for arg in node.args:
+                mob.shift(self._vector(self._eval(arg)))
+            return mob
+        if name == "next_to":
+            args = self._arguments(node, ("target", "direction"), {"direction": DIRECTIONS["RIGHT"], "buff": 0.25})
+            target, direction = args["target"], self._vector(args["direction"])
+            buff = self._number(args["buff"])
+            if isinstance(target, _Mob):
+                left, bottom, right, top = target.bounds()
+                center = target.get_center()
+                anchor = (right if direction[0] > 0 else left if direction[0] < 0 else center[0],
+                          top if direction[1] > 0 else bottom if direction[1] < 0 else center[1])
+            else:
+                anchor = self._vector(target)
+            width, height = mob.size()
+            offset = (direction[0] * (buff + width / 2), direction[1] * (buff + height / 2))
+            return mob.move_to(_add(anchor, offset))
+        if name == "to_edge":
+            args = self._arguments(node, ("edge",), {"edge": DIRECTIONS["LEFT"], "buff": 0.5})
+            edge, buff = self._vector(args["edge"]), self._number(args["buff"])
+            width, height = mob.size()
+            center = mob.get_center()
+            x = edge[0] * (FRAME_WIDTH / 2 - buff - width / 2) if edge[0] else center[0]
+            y = edge[1] * (FRAME_HEIGHT / 2 - buff - height / 2) if edge[1] else center[1]
+            return mob.move_to((x, y))
+        if name == "surround":
+            args = self._arguments(node, ("mobject",), {})
+            other = self._mob_value(args["mobject"])
+            width, height = other.size()
+            if mob.kind == "circle":
+                # Circle.surround: through the corners of the box, plus 20%
+                mob.radius = math.hypot(width, height) / 2 * 1.2
+            elif mob.kind == "square":
+                mob.side = width + 0.25
+            else:
+                raise NativeUnsupported("surround")
+            mob.version += 1
+            return mob.move_to(other.get_center())
+        if name in ("scale", "scale_to_fit_width", "scale_to_fit_height"):
+            args = self._arguments(node, ("value",), {})
+            value = self._number(args["value"])
+            if name == "scale":
+                return mob.scale(value)
+            width, height = mob.size()
+            current = width if name == "scale_to_fit_width" else height
+            return mob.scale(value / current) if current else mob
+        if name == "set_color":
+            args = self._arguments(node, ("color",), {})
+            return mob.set_color(self._color(args["color"]))
+        if name == "set_fill":
+            args = self._arguments(node, ("color", "opacity"), {"color": None, "opacity": None})
+            color = self._color(args["color"]) if args["color"] is not None else None
+            opacity = self._number(args["opacity"]) if args["opacity"] is not None else None
+            return mob.set_fill(color, opacity)
+        raise NativeUnsupported(f"method {name}")
+
+    def _construct(self, name: str, node: ast.Call) -> _Mob:
+        positional, defaults = _CONSTRUCTORS[name]
+        args = self._arguments(node, positional, defaults)
+        kind = name.lower()
+        mob = _Mob(kind, self._color(args["color"]))
+        if "stroke_width" in args:
+            mob.stroke = self._number(args["stroke_width"]) * STROKE_UNITS
+        if "fill_opacity" in args:
+            mob.fill = min(1.0, max(0.0, self._number(args["fill_opacity"])))
+        if kind == "text":
+            if not isinstance(args.get("text"), str) or not args["text"].strip():
+                raise NativeUnsupported("text")
+            mob.text = args["text"]
+            mob.em = self._number(args["font_size"]) * TEXT_UNITS_PER_POINT
+            mob.size()  # measure now, so missing fonts/cairo fail the dry run
+        elif kind == "circle":
+            mob.radius = self._number(args["radius"])
+        elif kind == "square":
+            mob.side = self._number(args["side_length"])
+        elif kind == "dot":
+            mob.radius = self._number(args["radius"])
+            mob.center = self._point(args["point"])
+        else:
+            start, end = args["start"], args["end"]
+            rough_start, rough_end = self._point(start), self._point(end)
+            direction = _unit(_sub(rough_end, rough_start))
+            # Lines between objects run edge to edge, as in Manim
+            mob.start = start.boundary_point(direction) if isinstance(start, _Mob) else rough_start
+            mob.end = end.boundary_point(_mul(direction, -1)) if isinstance(end, _Mob) else rough_end
+            buff = self._number(args["buff"])
+            if buff:
+                length = math.hypot(*_sub(mob.end, mob.start))
+                if length <= 2 * buff:
+                    raise NativeUnsupported("line shorter than its buff")
+                mob.start, mob.end = _add(mob.start, _mul(direction, buff)), _sub(mob.end, _mul(direction, buff))
+        return mob
+
+    def _arguments(self, node: ast.Call, positional: tuple, defaults: dict) -> dict:
+        if len(node.args) > len(positional) or any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise NativeUnsupported("arguments")
+        values = dict(defaults)
+        for name, arg in zip(positional, node.args):
+            values[name] = self._eval(arg)
+        for keyword in node.keywords:
+            if keyword.arg not in defaults and keyword.arg not in positional:
+                raise NativeUnsupported(f"argument {keyword.arg}")
+            values[keyword.arg] = self._eval(keyword.value)
+        missing = [name for name in positional if name not in values]
+        if missing:
+            raise NativeUnsupported(f"missing {missing[0]}")
+        return values
+
+    def _mob(self, node: ast.expr) -> _Mob:
+        return self._mob_value(self._eval(node))
+
+    @staticmethod
+    def _mob_value(value) -> _Mob:
+        if not isinstance(value, _Mob):
+            raise NativeUnsupported("expected an object")
+        return value
+
+    def _point(self, value) -> Vec:
+        return value.get_center() if isinstance(value, _Mob) else self._vector(value)
+
+    @staticmethod
+    def _vector(value) -> Vec:
+        if not isinstance(value, tuple):
+            raise NativeUnsupported("expected a point")
+        return value
+
+    @staticmethod
+    def _number(value) -> float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise NativeUnsupported("expected a number")
+        return float(value)
+
+    @staticmethod
+    def _color(value) -> str:
+        if isinstance(value, str) and value.startswith("#") and len(value) == 7:
+            return value
+        raise NativeUnsupported("color")
+
+
+def _construct_method(code: str) -> ast.FunctionDef:
+    """construct() of the only Scene in `code`, if the module is otherwise just imports"""
+    tree = ast.parse(code)
+    scenes = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module == "manim":
+            continue
+        if isinstance(node, ast.ClassDef) and [getattr(base, "id", None) for base in node.bases] == ["Scene"] \
+                and not node.decorator_list:
+            scenes.append(node)
+            continue
+        raise NativeUnsupported("module-level code")
+    if len(scenes) != 1:
+        raise NativeUnsupported("expected exactly one Scene")
+    methods = scenes[0].body
+    if len(methods) != 1 or not isinstance(methods[0], ast.FunctionDef) or methods[0].name != "construct":
+        raise NativeUnsupported("scene has more than construct()")
+    return methods[0]
+
+
+class NativeRenderer:
+    """Draws scenes in the supported subset without Manim (see module docstring)"""
+
+    @lru_cache(maxsize=256)
+    def supports(self, code: str) -> bool:
+        """Whether `code` can be rendered natively (a dry run, no drawing)"""
+        try:
+            _numpy()
+            _cairo()
+            _SceneInterpreter().run(_construct_method(code))
+            return True
+        except Exception:
+            # Anything the dry run trips over is left to Manim
+            return False
+
+    def render(self, code: str, output_path: Path, audio_path: Optional[str] = None,
+               audio_duration: float = 0.0, on_animation: Optional[Callable[[int], None]] = None) -> float:
+        """
+        Encode the scene to `output_path`, with `audio_path` muxed in when
+        given (the last frame is held until the narration ends). Returns the
+        video duration in seconds. on_animation(index) is called as each
+        animation's frames are written.
+        """
+        construct = _construct_method(code)
+        writer = _FrameWriter(output_path, audio_path)
+        try:
+            interpreter = _SceneInterpreter(_Compositor(writer), on_animation)
+            interpreter.run(construct)
+            writer.close(min_frames=math.ceil(audio_duration * FPS) if audio_path else 0)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.frames / FPS
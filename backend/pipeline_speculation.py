@@ -0,0 +1,144 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from config import PIPELINE_SPECULATION_WORKERS, MAX_VIDEO_DURATION
+from artifact_catalog import artifact_catalog, content_hash
+from metrics import metrics
+from render_sandbox import cancel_scope
+from structured_output import strip_code_fence
+
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_SPECULATION_WORKERS, thread_name_prefix="speculation")
+
+
+def _submit(fn, *args, **kwargs) -> Future:
+    # Run with a copy of the caller's context so deadlines and stage timings carry over
+    return _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class SpeculativeStart:
+    """
+    Starts narration TTS and rendering from a streamed code+narration reply
+    as soon as each field is complete, so both overlap the rest of
+    generation (and each other).
+
+    Pass on_field to GeminiClient.generate_manim_code_with_narration, then
+    ask for narration_audio() and render() with the final values: work that
+    was started from the same text is reused, anything else (e.g. the reply
+    had to be regenerated) runs then as it would have without speculation.
+    A speculative render whose result goes unused is cancelled and waited for
+    (by render(), or release() if the pipeline fails first), so it never runs
+    past the request's render slot.
+    """
+
+    def __init__(self, tts, renderer, live=None):
+        self.tts = tts
+        self.renderer = renderer
+        self.live = live
+        self._narration: Optional[str] = None
+        self._tts_future: Optional[Future] = None
+        self._code: Optional[str] = None
+        self._render_future: Optional[Future] = None
+        # Set to stop a speculative render whose code turned out not to be final
+        self._render_cancelled = threading.Event()
+        self._render_used = False
+        # Live segments carry narration, so parts wait until it is known
+        self._narration_ready = threading.Event()
+
+    def on_field(self, name: str, value: Any):
+        if not isinstance(value, str):
+            return
+        try:
+            if name == "narration" and self._narration is None:
+                self._narration = value.strip()
+                if self.tts.should_generate_audio(self._narration):
+                    self._tts_future = _submit(self._speak, self._narration)
+                else:
+                    self._narration_ready.set()
+            elif name == "code" and self._code is None:
+                code = strip_code_fence(value)
+                is_valid, _ = self.renderer.validate_manim_code(code)
+                # Not worth rendering if the finished video is already catalogued
+                cached = self._narration is not None and \
+                    artifact_catalog.find("video", content_hash(code, self._narration)) is not None
+                # Natively drawn scenes are quicker to render once, with the narration
+                # muxed in, than to render silently now and mux afterwards
+                if is_valid and not cached and not self.renderer.native_supported(code):
+                    self._code = code
+                    self._render_future = _submit(self._render, code)
+        except Exception as e:
+            # Speculation is an optimisation; the pipeline redoes anything that didn't start
+            print(f"Warning: speculative start of {name} failed: {e}")
+
+    def narration_audio(self, narration: str) -> Optional[str]:
+        """Audio for the final narration, reusing the speculative TTS call if it matches"""
+        if self._narration == narration:
+            metrics.cache_hit("speculation_tts")
+            return self._tts_future.result() if self._tts_future else None
+        metrics.cache_miss("speculation_tts")
+        if not self.tts.should_generate_audio(narration):
+            self._narration_ready.set()
+            return None
+        return self._speak(narration)
+
+    def render(self, code: str, audio_path: Optional[str] = None) -> str:
+        """
+        Video for the final code with `audio_path` muxed in, reusing the
+        speculative render if it matches
+        """
+        if self._code == code:
+            metrics.cache_hit("speculation_render")
+            self._render_used = True
+            video_path, _, _ = self._render_future.result()
+            return self.renderer.combine_video_audio(video_path, audio_path) if audio_path else video_path
+        metrics.cache_miss("speculation_render")
+        self._discard_render()
+        on_part = self._on_part if self.live else None
+        if self._code is not None and self.live:
+            # Segments already published came from the discarded code
+            self.live.stop_segments("Generated code changed after rendering started")
+            on_part = None
+        return self.renderer.render_with_narration(code, self.renderer.extract_scene_name(code), audio_path, on_part)
+
+    def release(self):
+        """
+        Stop a speculative render nobody used and unblock live parts still
+        waiting for narration, once the pipeline is done with them
+        """
+        self._discard_render()
+        self._narration_ready.set()
+
+    def _discard_render(self):
+        if self._render_future is None or self._render_used:
+            return
+        self._render_cancelled.set()
+        # Parts that were waiting for narration must not hold the cancelled render up
+        self._narration_ready.set()
+        self._render_future.cancel()
+        wait([self._render_future])
+
+    def _speak(self, text: str) -> str:
+        try:
+            audio_path = self.tts.generate_speech(text)
+            if self.live:
+                self.live.set_narration(audio_path)
+            return audio_path
+        finally:
+            self._narration_ready.set()
+
+    def _render(self, code: str) -> Tuple[str, float, int]:
+        with cancel_scope(self._render_cancelled):
+            return self.renderer.render_animation(
+                manim_code=code,
+                scene_name=self.renderer.extract_scene_name(code),
+                on_part=self._on_part if self.live else None
+            )
+
+    def _on_part(self, index: int, total: int, path: Path):
+        self._narration_ready.wait(timeout=MAX_VIDEO_DURATION)
+        if self._render_cancelled.is_set():
+            # From the discarded speculative render
+            return
+        self.live.add_part(index, total, path)
@@ -0,0 +1,377 @@
+import math
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from config import PROMPT_MODE
+from metrics import metrics
+
+# Shared Manim rule fragments: (full wording, compact wording).
+# Templates reference them by name so each rule is written exactly once.
+RULES: Dict[str, tuple] = {
+    "manim_version": (
+        "Use ManimCE v0.18+ syntax (not the old Manim syntax)",
+        "ManimCE v0.18+ syntax",
+    ),
+    "text_only": (
+        "ALWAYS use Text() for ALL text, NEVER use Tex() or MathTex() (no LaTeX is installed)",
+        "Text() only, no Tex()/MathTex()",
+    ),
+    "basic_shapes": (
+        "Use ONLY these basic shapes: Circle(), Square(), Line(), Dot(), Arrow(). "
+        "NEVER use ParametricFunction, Axes, Polygon, RegularPolygon or other complex objects",
+        "Shapes: Circle, Square, Line, Dot, Arrow only",
+    ),
+    "wrap_animations": (
+        "CRITICAL: Always wrap objects in animations like Create(), Write(), or DrawBorderThenFill(). "
+        "Use self.play(Create(arrow)) not self.play(arrow), and NEVER put raw objects like Arrow() "
+        "directly in AnimationGroup()",
+        "Wrap objects in Create()/Write() when playing; never self.play(obj) or raw objects in AnimationGroup()",
+    ),
+    "standard_colors": (
+        "Use only standard Manim colors: RED, GREEN, BLUE, YELLOW, WHITE, BLACK, GRAY, ORANGE, PURPLE, PINK. "
+        "NEVER use undefined colors like DARK_GREEN, LIGHT_BLUE, etc.",
+        "Colors: RED GREEN BLUE YELLOW WHITE BLACK GRAY ORANGE PURPLE PINK only",
+    ),
+    "simple_animations": (
+        "Use simple animations like Create(), Write(), Transform(), FadeOut() and position with "
+        "shift() and move_to(); avoid many simultaneous animations",
+        "Simple Create/Write/Transform/FadeOut; position with shift()/move_to()",
+    ),
+    "short_labels": (
+        "Use short, simple text labels (max 3-4 words) and focus on one main concept per animation",
+        "Labels max 4 words; one concept",
+    ),
+    "step_by_step": (
+        "For equations: show the complete step-by-step solution",
+        "Equations: show every solution step",
+    ),
+}
+
+MANIM_RULES = ("manim_version", "text_only", "basic_shapes", "wrap_animations", "standard_colors")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate (~4 characters per token for English prose and
+    code with Gemini's tokenizer), so sizes can be tracked without an API call.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+class PromptTemplate:
+    """
+    A named, versioned prompt. `full` and `compact` are str.format templates;
+    `{rules}` expands to the template's shared rule fragments as a bullet list.
+    Bump `version` whenever the wording changes so metrics stay comparable.
+    """
+
+    def __init__(self, name: str, version: int, full: str, compact: Optional[str] = None,
+                 rules: Iterable[str] = ()):
+        self.name = name
+        self.version = version
+        self.full = full.strip()
+        self.compact = compact.strip() if compact else self.full
+        self.rules = tuple(rules)
+        for rule in self.rules:
+            if rule not in RULES:
+                raise KeyError(f"Unknown rule fragment: {rule}")
+
+    def render(self, compact: bool = False, **values) -> str:
+        return self._format(compact, values)
+
+    def _format(self, compact: bool, values: dict) -> str:
+        values["rules"] = "\n".join(f"- {RULES[rule][1 if compact else 0]}" for rule in self.rules)
+        return (self.compact if compact else self.full).format_map(values).strip()
+
+
+class PromptRegistry:
+    """Templates by name, with per-template prompt size tracking"""
+
+    def __init__(self, mode: str = PROMPT_MODE):
+        self.compact = mode == "compact"
+        self._templates: Dict[str, PromptTemplate] = {}
+        # template name -> [renders, total estimated tokens]
+        self._observed: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        self._templates[template.name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def render(self, name: str, **values) -> str:
+        """Render a template in the configured mode and record its size"""
+        template = self._templates[name]
+        text = template.render(self.compact, **values)
+        tokens = estimate_tokens(text)
+        metrics.prompt_tokens.observe(tokens, template=name, mode="compact" if self.compact else "full")
+        with self._lock:
+            observed = self._observed.setdefault(name, [0, 0])
+            observed[0] += 1
+            observed[1] += tokens
+        return text
+
+    def report(self) -> dict:
+        """Static size of each template in both modes plus what requests actually sent"""
+        templates = {}
+        for name, template in sorted(self._templates.items()):
+            with self._lock:
+                renders, total = self._observed.get(name, [0, 0])
+            # Placeholders render empty so only the fixed template text is counted
+            templates[name] = {
+                "version": template.version,
+                "rules": list(template.rules),
+                "full_tokens": estimate_tokens(template._format(False, _BlankValues())),
+                "compact_tokens": estimate_tokens(template._format(True, _BlankValues())),
+                "renders": renders,
+                "avg_tokens_sent": round(total / renders, 1) if renders else None,
+            }
+        return {"mode": "compact" if self.compact else "full", "templates": templates}
+
+
+class _BlankValues(dict):
+    def __missing__(self, key):
+        return ""
+
+
+prompts = PromptRegistry()
+
+prompts.register(PromptTemplate(
+    "manim_code", 2,
+    full="""
+You are an expert educational content creator who generates Manim animations for mathematical and scientific concepts.
+
+User Question: "{question}"
+
+Create a Manim animation that explains this concept{subject_context}. Break it into clear, step-by-step visual steps using simple visual metaphors, and provide narration text that explains what's happening.
+
+Rules:
+{rules}
+- Keep animations short (10-30 seconds) and the on-screen text short
+- Make sure the code is syntactically correct; test it mentally before answering
+
+Return JSON with "code" (complete Python code starting with "from manim import *"), "narration" (concise but comprehensive, will be converted to speech) and "estimated_duration" (seconds).
+""",
+    compact="""
+Manim animation explaining: "{question}"{subject_context}.
+{rules}
+- Under 30s, short on-screen text
+JSON: code (full Python), narration (for speech), estimated_duration (s).
+""",
+    rules=MANIM_RULES + ("simple_animations", "short_labels"),
+))
+
+prompts.register(PromptTemplate(
+    "manim_code_with_narration", 2,
+    full="""
+Create a ManimCE v0.18+ animation explaining "{topic}".
+
+RULES:
+{rules}
+- 5-8 seconds duration for complex equations, 3-5 seconds for simple topics
+- Simple, educational
+
+Return JSON with two fields:
+- "code": the complete Python code
+- "narration": short script, max 50 words
+""",
+    compact="""
+Manim animation explaining "{topic}", 3-8s.
+{rules}
+JSON: code (full Python), narration (max 50 words).
+""",
+    rules=MANIM_RULES + ("step_by_step",),
+))
+
+prompts.register(PromptTemplate(
+    "scene_spec_with_narration", 1,
+    full="""
+Plan a short educational animation explaining "{topic}" (3-8 seconds).
+
+RULES:
+{rules}
+
+Return JSON with two fields:
+- "scene": the animation as a scene spec
+  - "objects": what to draw. kind is text, circle, square, dot, line or arrow; give each a short unique id.
+    Position with x (-6.5 to 6.5) and y (-3.5 to 3.5). size is the font size for text, the radius for
+    circles and the side for squares. Lines and arrows can join two objects with from_id and to_id;
+    a circle or square can be drawn around another object with around.
+  - "steps": what happens, in order. do is create, write, fade_in, fade_out, transform (ids[0] into
+    the object named by into), move (to x, y), equation (writes lines one under another; ids[0] names
+    the block and its lines become <id>_0, <id>_1, ...) or wait. seconds sets how long a step takes.
+- "narration": short script, max 50 words
+""",
+    compact="""
+Animation explaining "{topic}", 3-8s, as a scene spec.
+{rules}
+scene.objects: id, kind, x -6.5..6.5, y -3.5..3.5, size (font size/radius/side), from_id/to_id join objects, around draws around one.
+scene.steps: do, ids, seconds; transform ids[0]->into; move to x,y; equation lines -> ids <id>_0, <id>_1...
+JSON: scene, narration (max 50 words).
+""",
+    rules=("short_labels", "step_by_step"),
+))
+
+prompts.register(PromptTemplate(
+    "manim_code_with_narration_from_image", 2,
+    full="""
+Create a ManimCE v0.18+ animation explaining this image.
+
+RULES:
+{rules}
+- 5-12 seconds in total for all topics and animations
+- Simple, educational
+
+Return JSON with two fields:
+- "code": the complete Python code
+- "narration": minimum 20 words, max 50 words. Avoid meta phrases like "this educational animation demonstrates key concepts and principles shown in the image".
+{request}
+""",
+    compact="""
+Manim animation explaining this image, 5-12s.
+{rules}
+JSON: code (full Python), narration (20-50 words, no meta phrases about "this animation").
+{request}
+""",
+    rules=MANIM_RULES + ("step_by_step",),
+))
+
+prompts.register(PromptTemplate(
+    "manim_code_from_image", 2,
+    full="""
+You are an expert at creating educational animations with ManimCE v0.18+.
+Analyze this image and create a Manim animation that explains the concept visually, step by step, breaking complex ideas into simple visual steps.
+
+RULES:
+{rules}
+- Make animations 3-5 seconds long
+
+CRITICAL: Return ONLY the raw Python code without any markdown formatting, code blocks, or explanations.
+Start with "from manim import *" and end with the scene class definition.
+{request}
+""",
+    compact="""
+Manim animation explaining this image, 3-5s.
+{rules}
+Return only raw Python code starting "from manim import *", no markdown.
+{request}
+""",
+    rules=MANIM_RULES + ("simple_animations", "short_labels"),
+))
+
+prompts.register(PromptTemplate(
+    "tutor_response", 1,
+    full="""
+You are a knowledgeable, patient AI tutor. Your goal is to provide clear, organized explanations that help students understand concepts efficiently.
+
+User Message: "{question}"
+
+Please provide a well-structured response using proper markdown formatting with bullet points and clear organization.
+
+Guidelines:
+1. Always respond directly to what the user said
+2. Use clear, accessible language
+3. Use markdown formatting for structure:
+   - Use `-` for bullet points
+   - Use `**bold**` for emphasis on key terms
+   - Use `*italic*` for important concepts
+   - Use `##` for section headers when needed
+4. Organize information into logical bullet points
+5. Keep each bullet point concise but informative
+6. Use sub-bullets (indented with spaces) when breaking down complex ideas
+7. Include key examples and analogies where helpful
+8. Be encouraging and supportive
+9. If it's a greeting, be warm and ask what they'd like to learn about
+10. If it's a question, provide a clear, organized explanation
+11. Keep the overall response focused and digestible
+""",
+    compact="""
+You are a patient tutor. Reply to: "{question}"
+Use markdown: `-` bullets, indented sub-bullets, **bold** key terms, `##` headers if needed. Be concise, clear and encouraging; include an example where helpful. If it's a greeting, ask what they'd like to learn.
+""",
+))
+
+prompts.register(PromptTemplate(
+    "analyze_image", 1,
+    full="""
+You are an expert tutor. Analyze this image and provide a helpful explanation.
+
+If this is a mathematical equation or other scientific problem:
+1. Identify the equation or problem
+2. Explain what it represents
+3. If it's solvable, provide the solution step by step
+4. Explain the concepts involved
+
+If this is a diagram or graph:
+1. Describe what the diagram shows
+2. Explain the key elements and relationships
+3. Provide educational context
+
+Be clear, educational, and helpful. Use simple language when possible.
+{request}
+""",
+    compact="""
+As a tutor, explain this image. For a problem: identify it, explain it, solve step by step, name the concepts. For a diagram: describe it, its key elements and context. Use simple language.
+{request}
+""",
+))
+
+prompts.register(PromptTemplate(
+    "mind_map", 2,
+    full="""
+You are an expert educational content creator who generates a main topic node with 2-3 related suggestion titles for a flowchart-style mind map.
+
+Create a main topic node for: "{topic}" with 2-3 related suggestion titles.
+
+Requirements:
+1. Create ONE main topic node (id "main_topic", is_main_topic true) whose title is "{topic}"
+2. Its content is a concise, educational introduction: what it is, why it's important, and its main characteristics or applications - maximum 35 words
+3. Create 2-3 suggestion nodes (ids "suggestion_1".."suggestion_3", parent_id "main_topic", is_suggestion true) for related but distinct subtopics or aspects of the main topic
+4. Suggestions are just clickable titles with empty content
+
+Return the nodes as a JSON array.
+""",
+    compact="""
+Mind map for "{topic}" as a JSON array of nodes:
+- "main_topic" (is_main_topic true, title "{topic}", content: intro in max 35 words)
+- 2-3 "suggestion_N" nodes (parent_id "main_topic", is_suggestion true, distinct subtopic titles, empty content)
+""",
+))
+
+prompts.register(PromptTemplate(
+    "subtopics", 1,
+    full="""
+You are an educational assistant helping to create a concept map for the topic "{topic}".
+
+TASK: Suggest exactly 3 directly related examples, processes, or specific concepts that illustrate or are part of "{topic}". Each suggestion must be a real example or clearly related idea, not a generic label. Keep each example under 5 words.
+
+Return ONLY a valid JSON array of strings.
+
+Example: ["Glucose", "Chlorophyll", "Light Energy"]
+""",
+    compact="""
+3 specific examples or concepts within "{topic}" (real examples, not generic labels, under 5 words each) as a JSON array of strings.
+""",
+))
+
+prompts.register(PromptTemplate(
+    "summary", 1,
+    full="""
+You are an expert educational content creator. Generate a concise 2-3 sentence summary for the topic: "{title}"
+
+Requirements:
+1. Write exactly 2-3 sentences
+2. Provide a clear, educational explanation
+3. Include key concepts and importance
+4. Use simple, accessible language
+5. Make it informative but concise
+
+Example for "Light Reactions":
+"Light reactions are the first stage of photosynthesis that convert light energy into chemical energy. They occur in the thylakoid membranes of chloroplasts and produce ATP and NADPH. These energy carriers are essential for the subsequent Calvin cycle to fix carbon dioxide into glucose."
+""",
+    compact="""
+Summarize "{title}" in 2-3 simple, educational sentences covering the key concepts and why it matters.
+""",
+))
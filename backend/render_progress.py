@@ -0,0 +1,213 @@
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+from config import PROGRESS_TTL_SECONDS, PROGRESS_MAX_ENTRIES
+from scene_segments import DEFAULT_ANIMATION_SECONDS
+
+# Manim's per-animation progress bar, e.g.
+#   Animation 3: Create(Circle):  45%|████▌     | 7/15 [00:01<00:01, 6.20it/s]
+_BAR = re.compile(r"(?:Animation|Waiting)\s+(\d+)\s*:.*?(\d{1,3})%\|")
+# ...and the log line once that animation's partial movie is written
+_DONE = re.compile(r"(?:Animation|Waiting)\s+(\d+)\s*:\s*Partial movie file written")
+
+# Progress of the render running in the current context, if it is being tracked
+_current: contextvars.ContextVar[Optional["RenderProgress"]] = contextvars.ContextVar(
+    "render_progress", default=None
+)
+
+
+class RenderProgress:
+    """
+    Progress of one render, fed from Manim's output as it runs. Each
+    animation is weighted by its estimated length from the scene's timeline,
+    so a 10s animation counts for more than a 1s one; without a timeline
+    (loops, helper methods) only the animations done so far are known.
+    """
+
+    def __init__(self, render_id: str):
+        self.render_id = render_id
+        self.stage = "queued"
+        self.error = None
+        self.version = 0
+        self._weights: Optional[List[float]] = None
+        self._fractions: Dict[int, float] = {}
+        self._created = time.monotonic()
+        self._render_started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("done", "failed")
+
+    def set_stage(self, stage: str):
+        with self._lock:
+            self.stage = stage
+            self.version += 1
+
+    def begin_render(self, timeline: Optional[List[Tuple[float, bool]]]):
+        """Start counting animations; a render that restarts (e.g. new code) starts over"""
+        with self._lock:
+            self.stage = "rendering"
+            self._weights = [seconds for seconds, _ in timeline] if timeline else None
+            self._fractions = {}
+            self._render_started = time.monotonic()
+            self.version += 1
+
+    def observe(self, line: str):
+        """Feed one line of Manim output"""
+        done = _DONE.search(line)
+        if done:
+            self._update(int(done.group(1)), 1.0)
+            return
+        bar = _BAR.search(line)
+        if bar:
+            self._update(int(bar.group(1)), min(int(bar.group(2)), 100) / 100)
+
+    def complete_animation(self, index: int):
+        """Mark one animation done, for renderers that don't go through Manim"""
+        self._update(index, 1.0)
+
+    def _update(self, index: int, fraction: float):
+        with self._lock:
+            # Bars are redrawn many times per animation; never go backwards
+            if fraction > self._fractions.get(index, 0.0):
+                self._fractions[index] = fraction
+                self.version += 1
+
+    def finish(self):
+        with self._lock:
+            self.stage = "done"
+            self._finished = time.monotonic()
+            self.version += 1
+
+    def fail(self, error):
+        with self._lock:
+            self.stage = "failed"
+            self.error = error
+            self._finished = time.monotonic()
+            self.version += 1
+
+    def snapshot(self, render_id: Optional[str] = None) -> dict:
+        """Current progress, reported under `render_id` if given (e.g. an alias)"""
+        with self._lock:
+            now = self._finished or time.monotonic()
+            done = sum(1 for fraction in self._fractions.values() if fraction >= 1.0)
+            total = len(self._weights) if self._weights else None
+            fraction = None
+            eta = None
+            if self.stage == "done":
+                fraction, eta = 1.0, 0.0
+            elif self._weights:
+                weight = lambda i: self._weights[i] if i < len(self._weights) else DEFAULT_ANIMATION_SECONDS
+                fraction = min(1.0, sum(weight(i) * f for i, f in self._fractions.items()) / sum(self._weights))
+                if fraction > 0 and self._render_started is not None:
+                    rendering_for = now - self._render_started
+                    eta = round(rendering_for * (1 - fraction) / fraction, 1)
+            return {
+                "render_id": render_id or self.render_id,
+                "stage": self.stage,
+                "animations_done": done,
+                "animations_total": total,
+                "fraction": None if fraction is None else round(fraction, 3),
+                "eta_seconds": eta,
+                "elapsed_seconds": round(now - self._created, 1),
+                "error": self.error,
+            }
+
+
+class ProgressBus:
+    """
+    In-process registry of tracked renders, written by render threads and
+    read by the progress endpoints. Finished entries are kept for
+    `ttl` seconds so a client polling slightly late still sees the outcome.
+
+    A render shared by several requests (single-flight) is tracked once;
+    each request's own id is an alias for it. An alias binds to the render
+    in flight when it is made, or to the next one opened under the target id.
+    """
+
+    def __init__(self, ttl: float = PROGRESS_TTL_SECONDS, max_entries: int = PROGRESS_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, RenderProgress]" = OrderedDict()
+        # Alias -> its render, or the target id while that render hasn't opened yet
+        self._aliases: "OrderedDict[str, Union[str, RenderProgress]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, render_id: str) -> RenderProgress:
+        progress = RenderProgress(render_id)
+        with self._lock:
+            self._evict()
+            self._entries.pop(render_id, None)
+            self._entries[render_id] = progress
+            for alias, target in self._aliases.items():
+                if target == render_id:
+                    self._aliases[alias] = progress
+        return progress
+
+    def alias(self, alias: str, render_id: str):
+        """Publish the progress of `render_id` under `alias` as well"""
+        with self._lock:
+            self._evict()
+            progress = self._entries.get(render_id)
+            self._aliases.pop(alias, None)
+            self._aliases[alias] = progress if progress is not None and not progress.finished else render_id
+
+    def get(self, render_id: str) -> Optional[RenderProgress]:
+        with self._lock:
+            self._evict()
+            progress = self._entries.get(render_id)
+            if progress is None:
+                aliased = self._aliases.get(render_id)
+                progress = aliased if isinstance(aliased, RenderProgress) else None
+            return progress
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl
+        for render_id, progress in list(self._entries.items()):
+            if progress._finished is not None and progress._finished < cutoff:
+                del self._entries[render_id]
+        # Oldest first; only in-flight renders beyond the cap are dropped
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        for alias, progress in list(self._aliases.items()):
+            if isinstance(progress, RenderProgress) and progress._finished is not None \
+                    and progress._finished < cutoff:
+                del self._aliases[alias]
+        while len(self._aliases) > self.max_entries:
+            self._aliases.popitem(last=False)
+
+
+@contextmanager
+def track(render_id: Optional[str]):
+    """Publish progress of the enclosed render under `render_id` (a no-op without one)"""
+    if not render_id:
+        yield None
+        return
+    progress = progress_bus.open(render_id)
+    token = _current.set(progress)
+    try:
+        yield progress
+        progress.finish()
+    except Exception as e:
+        progress.fail(e.detail if isinstance(e, HTTPException) else str(e))
+        raise
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[RenderProgress]:
+    """Progress tracker of the render running in this context, if any"""
+    return _current.get()
+
+
+# Global instance
+progress_bus = ProgressBus()
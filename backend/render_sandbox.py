@@ -0,0 +1,245 @@
+import codecs
+import contextvars
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+
+from config import (
+    RENDER_CPU_SECONDS, RENDER_MEMORY_MB, RENDER_MAX_FILE_MB, RENDER_MAX_PROCESSES,
+    RENDER_OUTPUT_BUFFER_KB,
+)
+
+_EXEC_SCRIPT = Path(__file__).with_name("sandbox_exec.py")
+# How often a running process is checked for cancellation
+_CANCEL_POLL_SECONDS = 0.25
+
+# Set to stop sandboxed processes started from the current context. Lives in a
+# contextvar so it follows a render into its segment threads.
+_cancel: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("render_cancel", default=None)
+
+# What each kind of limit violation looks like in the error response
+LIMIT_MESSAGES = {
+    "cpu_time": "Render used more CPU time than allowed",
+    "memory": "Render ran out of memory",
+    "file_size": "Render tried to write a file larger than allowed",
+    "process_count": "Render tried to start more processes than allowed",
+    "wall_clock": "Render took longer than allowed",
+}
+
+# Output markers for violations that surface as an ordinary error exit
+_OUTPUT_MARKERS = [
+    ("memory", re.compile(r"MemoryError|Cannot allocate memory|std::bad_alloc|out of memory", re.I)),
+    # EFBIG when SIGXFSZ is ignored; the shell's report when a child is killed by it
+    ("file_size", re.compile(r"File too large|File size limit exceeded")),
+    ("process_count", re.compile(r"Resource temporarily unavailable|BlockingIOError|can't start new thread")),
+]
+
+
+class RenderLimitExceeded(HTTPException):
+    """A render was stopped for exceeding one of its resource limits"""
+
+    def __init__(self, limit: str, output: str = ""):
+        self.limit = limit
+        self.output = output
+        super().__init__(status_code=422, detail={
+            "error": "render_limit_exceeded",
+            "limit": limit,
+            "message": LIMIT_MESSAGES.get(limit, "Render exceeded a resource limit"),
+            # The end of the output is usually where the cause is
+            "output_tail": output[-2000:],
+        })
+
+
+class RenderCancelled(Exception):
+    """A sandboxed process was stopped because its render was cancelled"""
+
+
+@contextmanager
+def cancel_scope(event: threading.Event):
+    """Kill sandboxed processes started in the enclosed block once `event` is set"""
+    token = _cancel.set(event)
+    try:
+        yield
+    finally:
+        _cancel.reset(token)
+
+
+class RingBuffer:
+    """Keeps the last `capacity` characters written to it"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._chunks = deque()
+        self._size = 0
+        self.truncated = False
+
+    def append(self, text: str):
+        if not text:
+            return
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.capacity and self._chunks:
+            excess = self._size - self.capacity
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                self._size -= len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                self._size -= excess
+            self.truncated = True
+
+    def text(self) -> str:
+        body = "".join(self._chunks)
+        return f"[... earlier output truncated ...]\n{body}" if self.truncated else body
+
+
+@dataclass
+class SandboxResult:
+    returncode: int
+    output: str
+    # Which limit stopped the process, if one did
+    limit: Optional[str]
+    elapsed: float
+
+
+def limit_args() -> List[str]:
+    return [
+        "--cpu", str(RENDER_CPU_SECONDS),
+        "--memory-mb", str(RENDER_MEMORY_MB),
+        "--file-mb", str(RENDER_MAX_FILE_MB),
+        "--processes", str(RENDER_MAX_PROCESSES),
+    ]
+
+
+def classify(returncode: int, output: str, elapsed: float = 0.0) -> Optional[str]:
+    """The limit a finished process ran into, judged by how it exited and what it printed"""
+    if returncode == 0:
+        return None
+    # Killed by a signal: negative for the process itself, 128 + signal when a
+    # shell in between reports its child's death
+    sig = -returncode if returncode < 0 else returncode - 128 if returncode > 128 else None
+    if sig is not None:
+        if sig == getattr(signal, "SIGXCPU", None):
+            return "cpu_time"
+        if sig == getattr(signal, "SIGXFSZ", None):
+            return "file_size"
+        if sig == getattr(signal, "SIGKILL", None):
+            # RLIMIT_CPU's hard limit ends in SIGKILL when SIGXCPU was ignored; a
+            # kill before the process could have used that much CPU is the OOM killer
+            cpu_possible = elapsed * (os.cpu_count() or 1)
+            if RENDER_CPU_SECONDS > 0 and cpu_possible >= RENDER_CPU_SECONDS:
+                return "cpu_time"
+            return "memory"
+    for limit, marker in _OUTPUT_MARKERS:
+        if marker.search(output):
+            return limit
+    return None
+
+
+def _pump(stream, output: RingBuffer, on_line: Optional[Callable[[str], None]]):
+    # Progress bars redraw with \r, so both \r and \n end a line
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    for chunk in iter(lambda: stream.read1(8192), b""):
+        text = decoder.decode(chunk)
+        output.append(text)
+        if on_line is None:
+            continue
+        pending += text
+        *lines, pending = re.split(r"[\r\n]", pending)
+        for line in lines:
+            if line.strip():
+                _emit(on_line, line)
+    rest = decoder.decode(b"", final=True)
+    output.append(rest)
+    tail = pending + rest
+    if on_line is not None and tail.strip():
+        _emit(on_line, tail)
+
+
+def _emit(on_line: Callable[[str], None], line: str):
+    try:
+        on_line(line)
+    except Exception as e:
+        # A broken listener must not stop the output being drained
+        print(f"Warning: render output listener failed: {e}")
+
+
+def _kill_group(proc: subprocess.Popen):
+    """Kill the process and everything it started (ffmpeg, LaTeX, ...)"""
+    if os.name == 'nt':
+        proc.kill()
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_sandboxed(cmd: List[str], timeout: float,
+                  on_line: Optional[Callable[[str], None]] = None) -> SandboxResult:
+    """
+    Run `cmd` under the configured resource limits, in its own process group.
+    stdout and stderr are merged into a bounded ring buffer (and passed to
+    `on_line` line by line as they arrive) instead of being held in memory
+    whole. The process group is killed after `timeout` seconds, or as soon
+    as the enclosing cancel_scope() is cancelled (raising RenderCancelled).
+    """
+    cancel = _cancel.get()
+    if cancel is not None and cancel.is_set():
+        raise RenderCancelled("Render cancelled before it started")
+    output = RingBuffer(RENDER_OUTPUT_BUFFER_KB * 1024)
+    if os.name == 'nt':
+        # No rlimits on Windows; only the timeout and the bounded output apply
+        args = ' '.join(f'"{arg}"' if ' ' in arg else arg for arg in cmd)
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)
+    else:
+        args = [sys.executable, str(_EXEC_SCRIPT), *limit_args(), "--", *cmd]
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True)
+
+    started = time.monotonic()
+    reader = threading.Thread(target=_pump, args=(proc.stdout, output, on_line), daemon=True)
+    reader.start()
+    timed_out = cancelled = False
+    try:
+        while True:
+            left = started + timeout - time.monotonic()
+            try:
+                returncode = proc.wait(timeout=max(0.0, min(left, _CANCEL_POLL_SECONDS) if cancel else left))
+                break
+            except subprocess.TimeoutExpired:
+                timed_out = time.monotonic() - started >= timeout
+                cancelled = cancel is not None and cancel.is_set()
+                if timed_out or cancelled:
+                    _kill_group(proc)
+                    returncode = proc.wait()
+                    break
+    finally:
+        # Stragglers left in the group would hold the pipe open
+        _kill_group(proc)
+        reader.join(timeout=5)
+        if not reader.is_alive():
+            proc.stdout.close()
+
+    if cancelled and not timed_out:
+        raise RenderCancelled("Render cancelled")
+    text = output.text()
+    elapsed = time.monotonic() - started
+    return SandboxResult(
+        returncode=returncode,
+        output=text,
+        limit="wall_clock" if timed_out else classify(returncode, text, elapsed),
+        elapsed=elapsed,
+    )
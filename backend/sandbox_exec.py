@@ -0,0 +1,55 @@
+"""
+Exec a command under resource limits. POSIX only.
+
+render_sandbox launches Manim through this script so the limits are set in
+the child itself, between fork and exec, without preexec_fn (unsafe in a
+threaded server). Kept free of app imports so it starts quickly.
+
+    python sandbox_exec.py --cpu 600 --memory-mb 4096 --file-mb 1024 --processes 0 -- manim ...
+"""
+import argparse
+import os
+import resource
+import signal
+import sys
+
+# Seconds between SIGXCPU (soft limit) and SIGKILL (hard limit)
+CPU_GRACE_SECONDS = 5
+
+
+def _limit(kind: int, soft: int, hard: int = None):
+    if soft > 0:
+        resource.setrlimit(kind, (soft, soft if hard is None else hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a command under rlimits")
+    parser.add_argument("--cpu", type=int, default=0, help="CPU seconds")
+    parser.add_argument("--memory-mb", type=int, default=0, help="Address space")
+    parser.add_argument("--file-mb", type=int, default=0, help="Largest file the command may write")
+    parser.add_argument("--processes", type=int, default=0, help="Processes for this user")
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("no command given")
+
+    _limit(resource.RLIMIT_CPU, args.cpu, args.cpu + CPU_GRACE_SECONDS if args.cpu > 0 else None)
+    _limit(resource.RLIMIT_AS, args.memory_mb * 1024 * 1024)
+    _limit(resource.RLIMIT_FSIZE, args.file_mb * 1024 * 1024)
+    _limit(resource.RLIMIT_NPROC, args.processes)
+
+    # Python ignores these and exec keeps ignored signals; restore them as subprocess does
+    for sig in (signal.SIGPIPE, signal.SIGXFSZ):
+        signal.signal(sig, signal.SIG_DFL)
+
+    try:
+        os.execvp(command[0], command)
+    except OSError as e:
+        print(f"sandbox_exec: cannot run {command[0]}: {e}", file=sys.stderr)
+        sys.exit(127)
+
+
+if __name__ == "__main__":
+    main()
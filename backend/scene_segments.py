@@ -0,0 +1,105 @@
+import ast
+from typing import List, Optional, Tuple
+
+# Manim's default run_time for play() and duration for wait()
+DEFAULT_ANIMATION_SECONDS = 1.0
+
+
+def _is_self_call(node: ast.AST, names: set) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "self"
+        and node.func.attr in names
+    )
+
+
+def _estimate_seconds(call: ast.Call) -> float:
+    """run_time / duration when given as a literal, else Manim's default"""
+    for keyword in call.keywords:
+        if keyword.arg in ("run_time", "duration") and isinstance(keyword.value, ast.Constant) \
+                and isinstance(keyword.value.value, (int, float)):
+            return float(keyword.value.value)
+    if call.func.attr == "wait" and call.args and isinstance(call.args[0], ast.Constant) \
+            and isinstance(call.args[0].value, (int, float)):
+        return float(call.args[0].value)
+    return DEFAULT_ANIMATION_SECONDS
+
+
+def animation_timeline(code: str, scene_name: str) -> Optional[List[Tuple[float, bool]]]:
+    """
+    Estimated length of each top-level self.play()/self.wait() in the
+    scene's construct(), paired with whether a self.next_section() precedes it.
+
+    Returns None when the scene can't be split safely: unparseable code,
+    randomness that would differ between processes, or animations played
+    from loops, branches or helper methods (their count isn't static, so
+    ranges wouldn't line up with the statements they were planned from).
+    """
+    if "random" in code:
+        return None
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    scene = next((node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == scene_name), None)
+    if scene is None:
+        return None
+    construct = next((node for node in scene.body
+                      if isinstance(node, ast.FunctionDef) and node.name == "construct"), None)
+    if construct is None:
+        return None
+
+    animating = {"play", "wait", "next_section"}
+    for method in scene.body:
+        if method is not construct and any(_is_self_call(node, animating) for node in ast.walk(method)):
+            return None
+
+    timeline = []
+    section_pending = False
+    for statement in construct.body:
+        if isinstance(statement, ast.Expr) and _is_self_call(statement.value, {"play", "wait"}):
+            timeline.append((_estimate_seconds(statement.value), section_pending))
+            section_pending = False
+        elif isinstance(statement, ast.Expr) and _is_self_call(statement.value, {"next_section"}):
+            section_pending = True
+        elif any(_is_self_call(node, animating) for node in ast.walk(statement)):
+            return None
+    return timeline
+
+
+def plan_segments(timeline: List[Tuple[float, bool]], max_segments: int,
+                  min_segment_seconds: float) -> List[Tuple[int, Optional[int]]]:
+    """
+    Split a timeline into animation-number ranges [start, end) of roughly
+    equal duration, cutting only at section starts when the scene has
+    sections. The last range is open-ended (end None).
+    """
+    total = sum(seconds for seconds, _ in timeline)
+    count = min(max_segments, len(timeline), int(total // min_segment_seconds) if min_segment_seconds > 0 else len(timeline))
+    if count < 2:
+        return [(0, None)]
+
+    starts = []
+    elapsed = 0.0
+    for seconds, _ in timeline:
+        starts.append(elapsed)
+        elapsed += seconds
+
+    # Never cut after the first animation: Manim reads an upper bound of 0 as "no bound"
+    sections = [i for i, (_, new_section) in enumerate(timeline) if new_section and i > 1]
+    candidates = sections or list(range(2, len(timeline)))
+    if not candidates:
+        return [(0, None)]
+
+    cuts = []
+    for k in range(1, count):
+        target = total * k / count
+        best = min(candidates, key=lambda i: abs(starts[i] - target))
+        if not cuts or best > cuts[-1]:
+            cuts.append(best)
+
+    bounds = [0] + cuts
+    return [(start, end) for start, end in zip(bounds, cuts)] + [(bounds[-1], None)]
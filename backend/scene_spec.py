@@ -0,0 +1,220 @@
+"""
+Compiles the compact scene spec the model writes (models.SceneSpec) into a
+ManimCE Scene.
+
+The spec only covers what the prompts allowed in hand-written code anyway:
+Text, Circle, Square, Dot, Line and Arrow, shown with Create/Write/FadeIn,
+removed with FadeOut, changed with a transform or a move, step-by-step
+equation lines and waits. Anything the spec gets wrong (unknown ids,
+objects shown twice, positions off screen) is dropped or clamped here
+instead of failing, so the output always compiles and always plays at
+least one animation.
+"""
+import re
+from typing import Dict, List, Optional, Set
+
+from models import SceneObject, SceneSpec, SceneStep
+
+# Keep everything inside Manim's default 14.2 x 8 frame
+FRAME_HALF_WIDTH = 6.5
+FRAME_HALF_HEIGHT = 3.5
+MAX_TEXT_WIDTH = 12.0
+MAX_STEPS = 40
+MAX_EQUATION_LINES = 8
+
+_SHOW = {"create": "Create", "write": "Write", "fade_in": "FadeIn"}
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+def _num(value: float) -> str:
+    return repr(round(float(value), 2))
+
+
+def _point(x: float, y: float) -> str:
+    return f"[{_num(_clamp(x, -FRAME_HALF_WIDTH, FRAME_HALF_WIDTH))}, " \
+           f"{_num(_clamp(y, -FRAME_HALF_HEIGHT, FRAME_HALF_HEIGHT))}, 0]"
+
+
+def _unique(ids: List[str]) -> List[str]:
+    return list(dict.fromkeys(ids))
+
+
+class _SceneCompiler:
+    def __init__(self, spec: SceneSpec, fallback_text: str):
+        self.objects: Dict[str, SceneObject] = {}
+        for obj in spec.objects:
+            self.objects.setdefault(obj.id, obj)
+        self.steps = spec.steps[:MAX_STEPS]
+        self.fallback_text = fallback_text
+        # Spec id -> Python variable, for everything declared so far
+        self.names: Dict[str, str] = {}
+        # Equation blocks -> the ids of their lines
+        self.members: Dict[str, List[str]] = {}
+        self.on_screen: Set[str] = set()
+        self.body: List[str] = []
+        self.played = False
+        self._declaring: Set[str] = set()
+
+    def compile(self) -> List[str]:
+        for index, step in enumerate(self.steps):
+            self._step(index, step)
+        if not self.played:
+            # Nothing usable in the steps: show the objects, or at least a title
+            self._play([self._show(obj_id, "create") for obj_id in self.objects])
+        if not self.played:
+            self._play([self._show(self._text_line("title", self.fallback_text or "Explanation", None), "write")])
+        if not self.body[-1].startswith("self.wait("):
+            self.body.append("self.wait(1)")
+        return self.body
+
+    def _new_name(self, spec_id: str) -> str:
+        name = f"m{len(self.names)}"
+        self.names[spec_id] = name
+        return name
+
+    def _declare(self, spec_id: Optional[str]) -> Optional[str]:
+        """Variable for an object, emitting its declaration on first use"""
+        if spec_id is None:
+            return None
+        if spec_id in self.names:
+            return self.names[spec_id]
+        obj = self.objects.get(spec_id)
+        if obj is None or spec_id in self._declaring:
+            return None
+        self._declaring.add(spec_id)
+        try:
+            expression = self._expression(obj)
+        finally:
+            self._declaring.discard(spec_id)
+        if expression is None:
+            return None
+        name = self._new_name(spec_id)
+        self.body.append(f"{name} = {expression}")
+        if obj.kind == "text":
+            self.body.append(f"{name}.scale_to_fit_width(min({name}.width, {_num(MAX_TEXT_WIDTH)}))")
+        return name
+
+    def _expression(self, obj: SceneObject) -> Optional[str]:
+        color = f", color={obj.color}" if obj.color else ""
+        at = f".move_to({_point(obj.x, obj.y)})"
+        if obj.kind == "text":
+            text = (obj.text or "").strip()
+            if not text:
+                return None
+            return f"Text({text!r}, font_size={_num(_clamp(obj.size or 36, 12, 72))}{color}){at}"
+        if obj.kind in ("circle", "square"):
+            fill = f", fill_opacity={_num(_clamp(obj.fill, 0, 1))}" if obj.fill is not None else ""
+            cls = "Circle" if obj.kind == "circle" else "Square"
+            around = self._declare(obj.around) if obj.around else None
+            if around:
+                return f"{cls}({(color + fill).lstrip(', ')}).surround({around})"
+            if obj.kind == "circle":
+                return f"Circle(radius={_num(_clamp(obj.size or 1, 0.1, 3.5))}{color}{fill}){at}"
+            return f"Square(side_length={_num(_clamp(obj.size or 2, 0.2, 7))}{color}{fill}){at}"
+        if obj.kind == "dot":
+            return f"Dot({_point(obj.x, obj.y)}{color})"
+        # Line or arrow, between objects (edge to edge) or points
+        start = self._declare(obj.from_id) if obj.from_id else None
+        end = self._declare(obj.to_id) if obj.to_id else None
+        if start is not None and start == end:
+            return None
+        to_x = obj.to_x if obj.to_x is not None else obj.x + 2
+        to_y = obj.to_y if obj.to_y is not None else obj.y
+        if start is None and end is None and _point(obj.x, obj.y) == _point(to_x, to_y):
+            to_x = obj.x + (1 if obj.x < FRAME_HALF_WIDTH else -1)
+        start = start or _point(obj.x, obj.y)
+        end = end or _point(to_x, to_y)
+        cls = "Arrow" if obj.kind == "arrow" else "Line"
+        return f"{cls}({start}, {end}{color})"
+
+    def _text_line(self, spec_id: str, text: str, placement: Optional[str]) -> str:
+        name = self._new_name(spec_id)
+        self.body.append(f"{name} = Text({text!r}, font_size=40){placement or ''}")
+        self.body.append(f"{name}.scale_to_fit_width(min({name}.width, {_num(MAX_TEXT_WIDTH)}))")
+        return spec_id
+
+    def _show(self, spec_id: str, how: str) -> Optional[str]:
+        if spec_id in self.on_screen:
+            return None
+        name = self._declare(spec_id)
+        if name is None:
+            return None
+        self.on_screen.add(spec_id)
+        return f"{_SHOW[how]}({name})"
+
+    def _play(self, animations: List[Optional[str]], seconds: Optional[float] = None):
+        animations = [animation for animation in animations if animation]
+        if not animations:
+            return
+        run_time = f", run_time={_num(_clamp(seconds, 0.3, 5))}" if seconds else ""
+        self.body.append(f"self.play({', '.join(animations)}{run_time})")
+        self.played = True
+
+    def _hide(self, spec_id: str):
+        self.on_screen.discard(spec_id)
+        for member in self.members.get(spec_id, []):
+            self.on_screen.discard(member)
+
+    def _step(self, index: int, step: SceneStep):
+        ids = _unique(step.ids)
+        if step.do == "wait":
+            self.body.append(f"self.wait({_num(_clamp(step.seconds or 1, 0.1, 5))})")
+        elif step.do in _SHOW:
+            self._play([self._show(spec_id, step.do) for spec_id in ids], step.seconds)
+        elif step.do == "fade_out":
+            shown = [spec_id for spec_id in ids if spec_id in self.on_screen]
+            self._play([f"FadeOut({self.names[spec_id]})" for spec_id in shown], step.seconds)
+            for spec_id in shown:
+                self._hide(spec_id)
+        elif step.do == "transform":
+            source = next((spec_id for spec_id in ids if spec_id in self.on_screen), None)
+            if source is None or step.into is None or step.into in self.on_screen or step.into == source:
+                return
+            target = self._declare(step.into)
+            if target is None:
+                return
+            self._play([f"ReplacementTransform({self.names[source]}, {target})"], step.seconds)
+            self._hide(source)
+            self.on_screen.add(step.into)
+        elif step.do == "move":
+            point = _point(step.x or 0.0, step.y or 0.0)
+            shown = [spec_id for spec_id in ids if spec_id in self.on_screen]
+            self._play([f"{self.names[spec_id]}.animate.move_to({point})" for spec_id in shown], step.seconds)
+        elif step.do == "equation":
+            self._equation(index, ids, step)
+
+    def _equation(self, index: int, ids: List[str], step: SceneStep):
+        lines = [line.strip() for line in step.lines if line.strip()][:MAX_EQUATION_LINES]
+        if not lines:
+            return
+        block = ids[0] if ids and ids[0] not in self.names and ids[0] not in self.objects else f"equation{index}"
+        line_ids = []
+        placement = f".move_to({_point(step.x if step.x is not None else 0.0, step.y if step.y is not None else 2.0)})"
+        for number, line in enumerate(lines):
+            line_id = f"{block}_{number}"
+            if line_id in self.names:
+                line_id = f"equation{index}_{number}"
+            line_ids.append(self._text_line(line_id, line, placement))
+            placement = f".next_to({self.names[line_id]}, DOWN)"
+            self._play([self._show(line_id, "write")], step.seconds)
+        group = self._new_name(block)
+        self.body.append(f"{group} = VGroup({', '.join(self.names[line_id] for line_id in line_ids)})")
+        self.members[block] = line_ids
+        self.on_screen.add(block)
+
+
+def compile_scene(spec: SceneSpec, scene_name: str = "Explanation", fallback_text: str = "") -> str:
+    """
+    ManimCE source for a scene spec. Deterministic, so the same spec always
+    compiles to the same code (and so hits the same render cache entries).
+    """
+    scene_name = re.sub(r"\W", "", scene_name) or "Explanation"
+    if scene_name[0].isdigit():
+        scene_name = f"Scene{scene_name}"
+    body = _SceneCompiler(spec, fallback_text.strip()[:60]).compile()
+    lines = ["from manim import *", "", "", f"class {scene_name}(Scene):", "    def construct(self):"]
+    lines += [f"        {statement}" for statement in body]
+    return "\n".join(lines)
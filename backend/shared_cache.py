@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from config import SHARED_CACHE_DB_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_entries_namespace_created ON cache_entries (namespace, created_at);
+"""
+
+
+class SharedCache:
+    """
+    Namespaced key/value cache that every worker process on the host shares.
+
+    Values are stored as JSON in SQLite (WAL mode), so each write is atomic,
+    readers never block the writer, and a worker sees entries written by the
+    others straight away instead of keeping its own partial copy. Connections
+    are opened lazily, one per thread.
+    """
+
+    def __init__(self, db_path: str = SHARED_CACHE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store `value` (JSON-serializable), replacing any entry under the same key"""
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now, now + ttl if ttl else None)
+        )
+
+    def add(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store `value` only if the key is absent (or expired); True if this call
+        stored it. Usable as a cross-process claim on a piece of work.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at <= ?",
+            (namespace, key, now)
+        )
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO cache_entries (namespace, key, value, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), now, now + ttl if ttl else None)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, namespace: str, key: str):
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def recent(self, namespace: str, limit: int = 1000) -> List[Tuple[str, Any]]:
+        """Newest live (key, value) pairs in a namespace"""
+        rows = self._connection().execute(
+            "SELECT key, value FROM cache_entries WHERE namespace = ? "
+            "AND (expires_at IS NULL OR expires_at > ?) ORDER BY created_at DESC LIMIT ?",
+            (namespace, time.time(), limit)
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def purge_expired(self) -> int:
+        cursor = self._connection().execute(
+            "DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yield a temporary sibling of `path` to write to; on success it is renamed
+    over `path` in one step, so other processes see either no file or a
+    complete one, never a partial write.
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = target.with_name(f".{target.stem}.{uuid.uuid4().hex[:8]}.tmp{target.suffix}")
+    try:
+        yield temp
+        os.replace(temp, target)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+# Global instance
+shared_cache = SharedCache()
@@ -0,0 +1,58 @@
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict
+
+
+def normalize_request_key(endpoint: str, **fields) -> str:
+    """
+    Build a stable key for a request so that trivially different spellings
+    of the same question (case, extra whitespace) map to the same computation
+    """
+    normalized = {}
+    for name, value in fields.items():
+        if isinstance(value, str):
+            value = re.sub(r'\s+', ' ', value).strip().lower()
+        normalized[name] = value
+
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:16]
+    return f"{endpoint}:{digest}"
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one computation.
+
+    The first caller for a key runs the work; every caller that arrives while
+    it is still in flight awaits the same future and receives the same result
+    or the same exception. Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() once per key among concurrent callers and share its outcome"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["followers"] += 1
+        else:
+            self.stats["leaders"] += 1
+            # Run the work as its own task so a disconnecting caller
+            # (leader or follower) doesn't cancel it for everyone else
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._in_flight.pop(k, None))
+
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        """Number of distinct computations currently running"""
+        return len(self._in_flight)
+
+
+# Global instance
+single_flight = SingleFlight()
@@ -0,0 +1,191 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+# Keys Gemini's response_schema understands; anything else is rejected
+_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+class StructuredOutputError(Exception):
+    """The model's reply could not be parsed into the expected shape"""
+
+
+def gemini_schema(target: Any) -> dict:
+    """
+    Derive a Gemini response_schema from a pydantic model or typing annotation
+    (e.g. ManimCodeResponse, List[str], List[MindMapNodeDraft]).
+
+    Pydantic's JSON schema is flattened ($refs inlined, Optional[X] turned
+    into nullable X) and stripped to the subset Gemini accepts.
+    """
+    schema = TypeAdapter(target).json_schema()
+    defs = schema.pop("$defs", {})
+
+    def convert(node: dict) -> dict:
+        if "$ref" in node:
+            node = defs[node["$ref"].split("/")[-1]]
+
+        any_of = node.get("anyOf")
+        if any_of:
+            options = [option for option in any_of if option.get("type") != "null"]
+            converted = convert(options[0]) if options else {"type": "string"}
+            if len(options) < len(any_of):
+                converted["nullable"] = True
+            return converted
+
+        result = {key: value for key, value in node.items() if key in _SCHEMA_KEYS}
+        if "properties" in node:
+            result["properties"] = {name: convert(prop) for name, prop in node["properties"].items()}
+        if "items" in node:
+            result["items"] = convert(node["items"])
+        return result
+
+    return convert(schema)
+
+
+def strip_code_fence(text: str) -> str:
+    """Remove a surrounding ```python / ``` fence if the model added one anyway"""
+    text = text.strip()
+    if text.startswith("```"):
+        first_newline = text.find("\n")
+        text = text[first_newline + 1:] if first_newline != -1 else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+class IncrementalJSONParser:
+    """
+    Tolerant JSON extractor that can be fed a response in chunks.
+
+    It skips any prose or code fences before the first object/array, tracks
+    string and nesting state as text arrives, and knows when the top-level
+    value is complete, so it never needs a regex over the whole reply. A
+    truncated reply can still be recovered with partial().
+
+    When the top-level value is an object, each member is appended to
+    `fields` as (key, value) as soon as it is complete, so a streamed reply
+    can be acted on field by field before the whole object has arrived.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._pos = 0
+        self.fields: List[Tuple[str, Any]] = []
+        self._member_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._key: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, chunk: str) -> bool:
+        """Add more text; returns True once the top-level value has closed"""
+        self.buffer += chunk
+        text = self.buffer
+        while self._pos < len(text) and self.end is None:
+            ch = text[self._pos]
+            if self.start is None:
+                if ch in "{[":
+                    self.start = self._pos
+                    self._stack.append("}" if ch == "{" else "]")
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif self._stack == ["}"] and ch == ":":
+                self._key = self._member(self._member_start)
+                self._value_start = self._pos + 1
+            elif self._stack == ["}"] and ch == ",":
+                self._close_member()
+                self._member_start = self._pos + 1
+            elif ch in "{[":
+                self._stack.append("}" if ch == "{" else "]")
+            elif ch in "}]":
+                if self._stack == ["}"] and ch == "}":
+                    self._close_member()
+                if self._stack and self._stack[-1] == ch:
+                    self._stack.pop()
+                if not self._stack:
+                    self.end = self._pos + 1
+            self._pos += 1
+        return self.complete
+
+    def _member(self, start: Optional[int]) -> Any:
+        try:
+            return json.loads(self.buffer[start:self._pos])
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    def _close_member(self):
+        if isinstance(self._key, str) and self._value_start is not None:
+            text = self.buffer[self._value_start:self._pos]
+            try:
+                self.fields.append((self._key, json.loads(text)))
+            except json.JSONDecodeError:
+                pass
+        self._key = None
+        self._value_start = None
+
+    def result(self) -> Any:
+        """The parsed top-level value; raises if it is missing or malformed"""
+        if self.start is None:
+            raise StructuredOutputError("No JSON value found in response")
+        if self.end is None:
+            raise StructuredOutputError("JSON value in response is incomplete")
+        try:
+            return json.loads(self.buffer[self.start:self.end])
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"Malformed JSON in response: {e}")
+
+    def partial(self) -> Any:
+        """
+        Best-effort value for an unfinished reply: close any open string and
+        containers and drop a dangling key or trailing comma.
+        """
+        if self.complete:
+            return self.result()
+        if self.start is None:
+            return None
+
+        text = self.buffer[self.start:]
+        if self._in_string:
+            text = text[:-1] if self._escape else text
+            text += '"'
+        text = text.rstrip()
+        if text.endswith(","):
+            text = text[:-1]
+        elif text.endswith(":"):
+            text += " null"
+        try:
+            return json.loads(text + "".join(reversed(self._stack)))
+        except json.JSONDecodeError:
+            return None
+
+
+def parse_structured(text: str, target: Any) -> Any:
+    """Parse a model reply into `target` (a pydantic model or typing annotation)"""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return validate_structured(parser.result(), target)
+
+
+def validate_structured(data: Any, target: Any) -> Any:
+    """Validate already-decoded JSON against `target`"""
+    try:
+        return TypeAdapter(target).validate_python(data)
+    except ValidationError as e:
+        raise StructuredOutputError(f"Response did not match expected schema: {e}")
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Keep the catalog, shared cache and rendered media out of the real output dir
+os.environ.setdefault("MANIM_OUTPUT_DIR", tempfile.mkdtemp(prefix="tutor_tests_"))
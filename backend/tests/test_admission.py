@@ -0,0 +1,22 @@
+import ipaddress
+
+from admission import client_id
+
+PROXIES = [ipaddress.ip_network("10.0.0.0/8")]
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies():
+    assert client_id("203.0.113.7", "198.51.100.1", networks=[]) == "203.0.113.7"
+
+
+def test_forwarded_for_is_ignored_from_an_untrusted_peer():
+    assert client_id("203.0.113.7", "198.51.100.1", networks=PROXIES) == "203.0.113.7"
+
+
+def test_spoofed_entries_left_of_the_real_client_are_ignored():
+    # The client sent "1.2.3.4" itself; the proxy appended the address it saw
+    assert client_id("10.0.0.2", "1.2.3.4, 198.51.100.1", networks=PROXIES) == "198.51.100.1"
+
+
+def test_trusted_hops_are_skipped():
+    assert client_id("10.0.0.2", "198.51.100.1, 10.0.0.5", networks=PROXIES) == "198.51.100.1"
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from artifact_catalog import artifact_catalog, content_hash
+from elevenlabs_client import ElevenLabsClient
+
+
+class _FakeSDK:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, text, voice, model):
+        self.calls += 1
+        return b"audio"
+
+    def save(self, audio, path):
+        Path(path).write_bytes(audio)
+
+
+def test_catalogued_audio_missing_from_disk_is_regenerated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = ElevenLabsClient()
+    client.output_dir.mkdir(parents=True)
+    client._sdk = sdk = _FakeSDK()
+    voice_id = "voice"
+    stale = tmp_path / "elsewhere.mp3"
+    artifact_catalog.record("audio", stale, source_hash=content_hash("Hello", voice_id), file_size=5)
+
+    path = client.generate_speech("Hello", voice_id)
+    assert sdk.calls == 1
+    assert Path(path).read_bytes() == b"audio"
+    assert artifact_catalog.get(stale) is None
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+from deadlines import DeadlineExceeded
+from gemini_client import GeminiClient
+
+
+class _Router:
+    def __init__(self):
+        self.recorded = []
+
+    def candidates(self, method):
+        return SimpleNamespace(timeout=30.0), ["primary", "fallback"]
+
+    def latency_percentile(self, model, q):
+        return None
+
+    def record(self, model, latency, ok):
+        self.recorded.append((model, ok))
+
+
+def test_generate_does_not_fail_over_once_the_deadline_has_passed():
+    client = GeminiClient()
+    client.router = _Router()
+    called = []
+
+    class Model:
+        def __init__(self, name):
+            self.name = name
+
+        def generate_content(self, *args, **kwargs):
+            called.append(self.name)
+            raise DeadlineExceeded("Upstream call timed out")
+
+    client._model_factory = Model
+
+    with pytest.raises(DeadlineExceeded):
+        client._generate("prompt", "generate_manim_code")
+    assert called == ["primary"]
+    assert client.router.recorded == [("primary", False)]
+
+
+def test_on_field_failure_does_not_reissue_the_request(monkeypatch):
+    client = GeminiClient()
+    reply = '{"code": "print(1)", "narration": "Hi"}'
+    monkeypatch.setattr(client, "_generate_stream", lambda *args, **kwargs: iter([reply[:20], reply[20:]]))
+
+    def reissue(*args, **kwargs):
+        raise AssertionError("re-issued without streaming")
+
+    monkeypatch.setattr(client, "_generate_structured", reissue)
+    seen = []
+
+    def on_field(key, value):
+        seen.append(key)
+        raise RuntimeError("kickoff failed")
+
+    result = client._generate_structured_stream("prompt", dict, "generate_manim_code", on_field)
+    assert result == {"code": "print(1)", "narration": "Hi"}
+    assert seen == ["code", "narration"]
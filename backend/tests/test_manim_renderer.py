@@ -0,0 +1,141 @@
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from artifact_catalog import artifact_catalog
+from manim_renderer import ManimRenderer
+from render_progress import track
+
+CODE = '''from manim import *
+
+
+class Explanation(Scene):
+    def construct(self):
+        label = Text("Hi")
+        self.play(Write(label))
+        self.wait(1)
+'''
+
+
+def test_native_render_reports_animation_total(monkeypatch):
+    renderer = ManimRenderer()
+
+    def fake_render(code, output_path, audio_path=None, audio_duration=0.0, on_animation=None):
+        output_path.write_bytes(b"video")
+        for index in range(2):
+            on_animation(index)
+        return 2.0
+
+    monkeypatch.setattr(renderer.native, "render", fake_render)
+    scene_name = renderer.extract_scene_name(CODE)
+    with track("native-progress") as progress:
+        assert renderer._render_native(CODE, scene_name) is not None
+        snapshot = progress.snapshot()
+
+    assert snapshot["animations_total"] == 2
+    assert snapshot["animations_done"] == 2
+    assert snapshot["fraction"] == 1.0
+
+
+def test_native_failure_falls_back_to_manim_once_with_original_audio(monkeypatch):
+    renderer = ManimRenderer()
+    calls = []
+    monkeypatch.setattr(renderer, "native_supported", lambda code: True)
+    monkeypatch.setattr(renderer, "mux_ready_audio", lambda path: ("narration.m4a", 3.0))
+    monkeypatch.setattr(renderer, "_render_native", lambda *args: calls.append("native"))
+    monkeypatch.setattr(renderer, "render_animation", lambda *args: pytest.fail("native tried twice"))
+    monkeypatch.setattr(renderer, "_render_with_manim",
+                        lambda code, scene, on_part: calls.append("manim") or ("video.mp4", 2.0, 10))
+    monkeypatch.setattr(renderer, "combine_video_audio",
+                        lambda video, audio: calls.append(("combine", video, audio)) or video)
+
+    assert renderer.render_with_narration(CODE, "Explanation_1", "narration.mp3") == "video.mp4"
+    assert calls == ["native", "manim", ("combine", "video.mp4", "narration.mp3")]
+
+
+def test_every_manim_process_takes_a_slot(monkeypatch):
+    import manim_renderer
+    from render_sandbox import SandboxResult
+
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fake_run(cmd, timeout, on_line=None):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return SandboxResult(0, "", None, 0.05)
+
+    monkeypatch.setattr(manim_renderer, "_manim_slots", threading.BoundedSemaphore(2))
+    monkeypatch.setattr(manim_renderer, "run_sandboxed", fake_run)
+    renderer = ManimRenderer()
+    threads = [threading.Thread(target=renderer._run_manim, args=(["manim"],)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+@pytest.mark.parametrize("partial", [False, True])
+def test_failed_aac_transcode_falls_back_without_publishing_a_file(tmp_path, monkeypatch, partial):
+    renderer = ManimRenderer()
+    audio_path = tmp_path / "speech.mp3"
+    audio_path.write_bytes(b"mp3")
+
+    def failing_ffmpeg(cmd, **kwargs):
+        if partial:
+            # ffmpeg died partway through writing
+            Path(cmd[-1]).write_bytes(b"half")
+        return subprocess.CompletedProcess(cmd, 1, "", "Conversion failed!")
+
+    monkeypatch.setattr("manim_renderer.subprocess.run", failing_ffmpeg)
+    monkeypatch.setattr(renderer, "_get_audio_duration", lambda path: 3.0)
+
+    assert renderer.mux_ready_audio(str(audio_path)) == (str(audio_path), 3.0)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["speech.mp3"]
+
+
+def test_lessons_with_the_same_titles_but_different_clips_hash_apart(tmp_path):
+    renderer = ManimRenderer()
+    first, second = tmp_path / "first.mp4", tmp_path / "second.mp4"
+    artifact_catalog.record("video", first, source_hash="code-a")
+    artifact_catalog.record("video", second, source_hash="code-b")
+    titles = ["What is 5x = 25?"]
+
+    assert renderer.clips_hash([str(first)], titles) != renderer.clips_hash([str(second)], titles)
+    assert renderer.clips_hash([str(first)], titles, "math") != renderer.clips_hash([str(first)], titles, "physics")
+    assert renderer.clips_hash([str(first)], titles, "math") == renderer.clips_hash([str(first)], titles, "math")
+
+
+def test_concat_leaves_cached_clips_without_audio_untouched(tmp_path, monkeypatch):
+    renderer = ManimRenderer()
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"silent clip")
+    joined = []
+
+    def ffmpeg(cmd, **kwargs):
+        Path(cmd[-1]).write_bytes(b"clip with silent track")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    def concat_files(paths, output_path, stream_copy, metadata_path):
+        joined.extend(paths)
+        output_path.write_bytes(b"lesson")
+
+    monkeypatch.setattr("manim_renderer.subprocess.run", ffmpeg)
+    monkeypatch.setattr(renderer, "_has_audio", lambda path: False)
+    monkeypatch.setattr(renderer, "_get_video_duration", lambda path: 1.0)
+    monkeypatch.setattr(renderer, "_probe_streams", lambda path: (("codec_type", "video"),))
+    monkeypatch.setattr(renderer, "_concat_files", concat_files)
+
+    renderer.concat_videos([str(clip)], ["Intro"], tmp_path / "lesson.mp4")
+
+    assert clip.read_bytes() == b"silent clip"
+    assert joined and joined[0] != clip
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["clip.mp4", "lesson.mp4"]
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+import native_renderer
+from native_renderer import NativeRenderer, NativeUnsupported, _FrameWriter, _SceneInterpreter, _construct_method
+
+
+def scene(*statements: str) -> str:
+    body = "\n".join(f"        {statement}" for statement in statements)
+    return f"from manim import *\n\n\nclass Explanation(Scene):\n    def construct(self):\n{body}\n"
+
+
+def test_dry_run_counts_frames():
+    interpreter = _SceneInterpreter()
+    interpreter.run(_construct_method(scene("c = Circle()", "self.play(Create(c))", "self.wait(2)")))
+    assert interpreter.frames == 3 * native_renderer.FPS
+
+
+@pytest.mark.parametrize("statement", ["self.wait(100000)", "self.play(Create(Circle()), run_time=100000)"])
+def test_scenes_longer_than_the_video_limit_are_unsupported(statement):
+    code = scene("self.play(Create(Circle()))", statement)
+    with pytest.raises(NativeUnsupported):
+        _SceneInterpreter().run(_construct_method(code))
+    assert not NativeRenderer().supports(code)
+
+
+def test_frame_writer_is_killed_at_its_deadline(monkeypatch, tmp_path):
+    # A stand-in encoder that never reads its input, so writes block once the pipe fills
+    stalled = [sys.executable, "-c", "import time; time.sleep(60)"]
+    real_popen = subprocess.Popen
+    monkeypatch.setattr(native_renderer.subprocess, "Popen", lambda cmd, **kwargs: real_popen(stalled, **kwargs))
+
+    writer = _FrameWriter(tmp_path / "out.mp4", timeout=0.5)
+    frame = bytes(native_renderer.WIDTH * native_renderer.HEIGHT * 3)
+    started = time.monotonic()
+    with pytest.raises(Exception, match="wall-clock limit"):
+        for _ in range(1000):
+            writer.write(frame, 1)
+    assert time.monotonic() - started < 10
+    writer.abort()
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from pipeline_speculation import SpeculativeStart
+from render_sandbox import RenderCancelled, run_sandboxed
+
+
+class FakeRenderer:
+    """Speculative renders run a long sandboxed process; final renders return at once"""
+
+    def __init__(self):
+        self.final_renders = []
+
+    def validate_manim_code(self, code):
+        return True, ""
+
+    def native_supported(self, code):
+        return False
+
+    def extract_scene_name(self, code):
+        return "Explanation_1"
+
+    def render_animation(self, manim_code, scene_name, on_part=None):
+        run_sandboxed(["sleep", "30"], timeout=60)
+        return "speculative.mp4", 30.0, 1
+
+    def render_with_narration(self, code, scene_name, audio_path=None, on_part=None):
+        self.final_renders.append(code)
+        return "final.mp4"
+
+
+class FakeTTS:
+    def should_generate_audio(self, text):
+        return False
+
+
+def test_discarded_speculative_render_is_stopped_before_render_returns():
+    speculation = SpeculativeStart(FakeTTS(), FakeRenderer())
+    speculation.on_field("code", "speculated code")
+    time.sleep(0.5)
+
+    started = time.monotonic()
+    assert speculation.render("final code") == "final.mp4"
+    assert time.monotonic() - started < 10
+    assert speculation._render_future.done()
+    with pytest.raises(RenderCancelled):
+        speculation._render_future.result()
+
+
+def test_release_stops_an_unused_speculative_render():
+    speculation = SpeculativeStart(FakeTTS(), FakeRenderer())
+    speculation.on_field("code", "speculated code")
+    time.sleep(0.5)
+
+    started = time.monotonic()
+    speculation.release()
+    assert time.monotonic() - started < 10
+    assert speculation._render_future.done()
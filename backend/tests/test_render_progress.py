@@ -0,0 +1,22 @@
+from render_progress import ProgressBus
+
+
+def test_alias_made_before_the_render_opens_follows_it():
+    bus = ProgressBus()
+    bus.alias("follower", "flight")
+    assert bus.get("follower") is None
+
+    progress = bus.open("flight")
+    assert bus.get("follower") is progress
+    assert progress.snapshot("follower")["render_id"] == "follower"
+
+
+def test_alias_stays_with_its_render_when_the_key_is_reused():
+    bus = ProgressBus()
+    first = bus.open("flight")
+    bus.alias("early", "flight")
+    first.finish()
+
+    second = bus.open("flight")
+    assert bus.get("early") is first
+    assert bus.get("flight") is second
@@ -0,0 +1,39 @@
+import os
+import signal
+import sys
+
+import pytest
+
+import render_sandbox
+from render_sandbox import classify, run_sandboxed
+
+posix_only = pytest.mark.skipif(os.name == "nt", reason="rlimits are POSIX only")
+
+
+@pytest.mark.parametrize("returncode, output", [
+    (-signal.SIGXFSZ, ""),
+    (128 + signal.SIGXFSZ, ""),
+    (1, "sh: line 1: 42 File size limit exceeded (core dumped) ffmpeg ..."),
+    (1, "OSError: [Errno 27] File too large"),
+])
+def test_file_size_deaths_are_classified(returncode, output):
+    assert classify(returncode, output) == "file_size"
+
+
+def test_ordinary_failures_are_not_limits():
+    assert classify(1, "SyntaxError: invalid syntax") is None
+
+
+@posix_only
+@pytest.mark.parametrize("writer", [
+    # Python ignores SIGXFSZ, so the write fails with EFBIG
+    [sys.executable, "-c", "open('big.bin', 'wb').write(bytes(3 * 1024 * 1024))"],
+    # head is killed by SIGXFSZ; the shell exits 128 + SIGXFSZ and reports it
+    ["sh", "-c", "head -c 3000000 /dev/zero > big.bin"],
+])
+def test_file_size_limit_is_reported(monkeypatch, tmp_path, writer):
+    monkeypatch.setattr(render_sandbox, "RENDER_MAX_FILE_MB", 1)
+    monkeypatch.chdir(tmp_path)
+    result = run_sandboxed(writer, timeout=30)
+    assert result.returncode != 0
+    assert result.limit == "file_size"
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+
+import main
+from artifact_catalog import artifact_catalog
+
+client = TestClient(main.app)
+
+
+def _video(name: str):
+    video_path = main.manim_renderer.output_dir / "videos" / name
+    video_path.parent.mkdir(parents=True, exist_ok=True)
+    video_path.write_bytes(b"video")
+    return video_path
+
+
+def test_catalogued_video_deleted_from_disk_is_a_404():
+    video_path = _video("gone.mp4")
+    artifact_catalog.record("video", video_path, file_size=5)
+    video_path.unlink()
+
+    response = client.get("/videos/videos/gone.mp4")
+    assert response.status_code == 404
+    # The stale row is dropped
+    assert artifact_catalog.get(video_path) is None
+
+
+def test_existing_video_is_served():
+    _video("here.mp4")
+
+    response = client.get("/videos/videos/here.mp4")
+    assert response.status_code == 200
+    assert response.content == b"video"
+
+
+def test_video_outside_output_dir_is_a_404():
+    response = client.get("/videos/..%2F..%2Fetc%2Fpasswd")
+    assert response.status_code == 404
+
+
+def test_catalogued_audio_deleted_from_disk_is_a_404(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    audio_path = tmp_path / "output" / "audio" / "speech_gone.mp3"
+    audio_path.parent.mkdir(parents=True)
+    audio_path.write_bytes(b"audio")
+    artifact_catalog.record("audio", audio_path, file_size=5)
+    audio_path.unlink()
+
+    response = client.get("/audio/speech_gone.mp3")
+    assert response.status_code == 404
+    assert artifact_catalog.get(audio_path) is None